@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Restores the punctuation of a paragraph or title from its TETML words, in which
+## punctuation is a word of its own: ['“', 'It', '’', 's', 'a', 'house', '.', '”']
+## becomes '“It’s a house.”'. The words are read in a single pass with a lookahead of
+## two words. Every word is classified against the character classes below and the
+## rules of the language are applied in order, the first matching rule wins:
+##     1   quote      opening punctuation, word, closing punctuation -> glued together
+##     2   glue       punctuation between two words, e.g. she ' ll, 600 ' 000, l ' amour
+##     3   attach     punctuation appended to the previous word
+##     4   open       opening punctuation prepended to the following word
+##     5   attach     word starting with punctuation appended to the previous word
+## The language tables in RULES hold what differs between the languages:
+##     restore_punctuation(words, "fr")
+## A word merged into the following word also absorbs the following word, which is then
+## skipped, until a word is reached that matches no rule.
+###############################################################################
+
+from collections import namedtuple
+
+# normal punctuation -- should be appended to previous word
+PUNCTUATION = frozenset(['!', '"', '#', '$', '%', ')', '*', ',', '-', '.', '»',
+ ':', ';', '=', '>', '?', '@', '\\', ']', '^', '_', '}', '~', '°', '…', '”', '’'])
+# punctuation that opens new sentence -- should be appended to following word
+OPENING = frozenset(['(', '<', '[', '{', '«', '“', '‘', '‹'])
+CLOSING = frozenset(['’', '”', '›'])
+# punctuation that is between two words -- should be concatenated with previous and following word
+BOTH = frozenset(['`', '|', '&', '+', '\'', '/', '’'])
+
+CONTRACTIONS = frozenset(['ll', 're', 's', 't', 've', 'd', 'm'])
+FR_CONTRACTIONS = frozenset(['c', 'l', 'd', 'j', 'm', 'n', 's', 'qu', 'lorsqu', 'aujourd', 'jusqu'])
+
+# words that can match a rule other than rule 1
+SPECIAL = PUNCTUATION | OPENING | BOTH
+
+# Rules of a language:
+#   quote_contractions: contractions glued to a quoted word with rule 1, e.g. “ It ’ s -> “It’s, None to not look at the second next word
+#   contractions: following words glued to punctuation between words with rule 2, e.g. she ' ll
+#   digits: rule 2 glues punctuation between two numbers, e.g. 600 ' 000
+#   elisions: lower case previous words glued to punctuation between words with rule 2, e.g. l ' amour
+#   skip_none: missing words (None) neither end the skipping of merged words nor are kept
+#   attach_final: punctuation left as the last word is appended to the word before it
+Rules = namedtuple("Rules", ["quote_contractions", "contractions", "digits", "elisions", "skip_none", "attach_final"])
+
+EN_RULES = Rules(quote_contractions=CONTRACTIONS, contractions=CONTRACTIONS, digits=True, elisions=None, skip_none=True, attach_final=True)
+FR_RULES = Rules(quote_contractions=None, contractions=None, digits=False, elisions=FR_CONTRACTIONS, skip_none=False, attach_final=False)
+
+RULES = {"de": EN_RULES, "en": EN_RULES, "fr": FR_RULES}
+
+# marks that the next word was not merged into
+_UNCHANGED = object()
+
+def restore_punctuation(text, lang="en"):
+    """
+    Joins the words of a paragraph or title into a string with restored punctuation.
+
+    Args:
+        text (list or string): words of a paragraph, or a title, which is split at whitespace
+        lang (string): language code, e.g. de, en or fr, other languages use the rules of en
+
+    Returns:
+        newstring (string): words joined by spaces, punctuation attached to its words
+    """
+    if isinstance(text, str): # processing a title, convert to list and treat as normal
+        text = text.split()
+
+    # TODO: In the 1930s and’ 50s --> In the 1930s and’50s
+    # 3R­-Grundsätze --> 3R­Grundsätze but should remain 3R­-Grundsätze !!
+
+    rules = RULES.get(lang, EN_RULES)
+    quote_contractions = rules.quote_contractions
+    contractions = rules.contractions
+    elisions = rules.elisions
+
+    n = len(text)
+    current = []
+    found = False # the current word was merged into the previous one
+    merged = _UNCHANGED # the current word as merged with the previous word
+    prev = text[-1] if n else None # the first word is preceded by the last one
+
+    for index in range(n):
+        if merged is _UNCHANGED:
+            word = text[index]
+        else:
+            word = merged
+            merged = _UNCHANGED
+
+        if word is None and rules.skip_none:
+            prev = word
+            continue
+
+        has_next = index+1 < n
+        following = text[index+1] if has_next else None
+        rule = 0
+
+        # 1: concat between word and prev./follow. punctuation (usually quotation) -> ' good ' glued together as 'good'
+        if prev in OPENING and (not has_next or not following or following[0] in CLOSING):
+            if has_next and following:
+                if quote_contractions is None:
+                    rule = 1
+                # look ahead to see if pattern is followed by a contraction character that also needs to be appended. e.g. “ It ’ s ... ” -> “It’s ...”
+                elif index+2 < n:
+                    rule = 12 if text[index+2] in quote_contractions else 1
+
+        elif word in SPECIAL or word and word[0] in PUNCTUATION:
+            # 2: concat between punctuation with prev. and follow. word -> she ' ll / 600 ' 000 / l ' amour glued together
+            if word in BOTH:
+                if elisions is None:
+                    if not has_next:
+                        rule = -1
+                    elif following in contractions or rules.digits and following.isdigit() and prev.isdigit():
+                        rule = 2
+                elif prev.lower() in elisions:
+                    if current and not has_next:
+                        del current[-1] # the previous word is dropped
+                    rule = 2 if current and has_next else -1
+
+            if rule:
+                pass
+            # 3: append other punctuation to previous word -> house . as house.
+            elif word in PUNCTUATION:
+                rule = 3
+            # 4: append sentence opening punctuation to following word -> << She said as <<She said
+            elif word in OPENING:
+                rule = 4 if has_next else -1
+            # 5: append word starting with punctuation to previous word -> house .” as house.”
+            elif word and word[0] in PUNCTUATION:
+                rule = 5
+
+        if rule == 4:
+            merged = word+following
+            current.append(merged)
+            found = True # next word was already appended
+            prev = word
+            continue
+        elif rule > 0 and current:
+            if rule == 12:
+                current[-1] = prev+word[1:]+following+text[index+2]
+                found = True
+            elif rule == 1:
+                merged = prev+word[1:]+following
+                current[-1] = merged
+                found = True # next word was already appended
+            elif rule == 2:
+                merged = prev+word+following
+                current[-1] = merged
+                found = True # next word was already appended
+            else:
+                word = prev+word
+                current[-1] = word
+            prev = word
+            continue
+
+        prev = word
+
+        # if the current word was already appended move on
+        if found:
+            found = False
+            continue
+
+        # append all other words as they are
+        if word:
+            current.append(word)
+
+    # if we somehow left out content e.g. - - + use original
+    if not current:
+        return ' '.join(text)
+
+    # Hack to ensure that nothing is missed: e.g. <div>'Crime and Punishments '<\div> -> <div>'Crime and Punishments'<\div>
+    if rules.attach_final and len(current) > 1 and current[-1] in PUNCTUATION:
+        current[-2] = current[-2] + current[-1]
+        del current[-1]
+
+    return ' '.join(current)
@@ -1,33 +1,54 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from subprocess import call
 from lxml import etree
 import argparse
 import pathlib
 import re
 import os
 import time
+import sys
+from collections import Counter
+import itertools
+from punctuation import restore_punctuation
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tools.glyph_layer import GlyphLayer
+from tools.page_numbers import PageNumberMap
+from tools import page_ranges
+from tools.xml_writer import write_xml, XmlStreamWriter
 
 ###############################################################################
 ## ToRun: pyhton3 text_extractor.py -i <input_file_path> -o <output_file_path>
 ###############################################################################
 
 bad_punct = ['◂', '▸']
-# normal punctuation -- should be appended to previous word
-punctuation = ['!', '"', '#', '$', '%', ')', '*', ',', '-', '.', '»',
- ':', ';', '=', '>', '?', '@', '\\', ']', '^', '_', '}', '~', '°', '…', '”', '’', '’']
-# punctuation that opens new sentence -- should be appended to following word
-opening = ['(', '<', '[','{','«','“','‘', '‹']
-closing = ['’', '”', '›']
-# punctuation that is between two words -- should be concatenated with previous and following word
-both = ['`', '|', '&', '+', '\'', '/','’']
 
-contractions = ['ll','re','s','t','ve','d','m']
-# special = ['html', 'com', 'ch']
-fr_contractions = ['c','l','d','j','m','n','s','qu','lorsqu','aujourd','jusqu']
+# abbreviations split at their dots (lower case) --> restored form, per language
+# the abbreviations of all languages are restored in every language, those of the language of the text take precedence
+abbr = {
+    'de': {'z. b.': 'z.B.', 'd. h.': 'd.h.'},
+    'en': {'e. g.': 'e.g.', 'i. e.': 'i.e.'},
+    'fr': {},
+    }
+
+abbr_patterns = {} # language --> (compiled pattern, replacements), built on first use
+
+# pages with numbers in their header or footer band from which the offset of the printed page numbers is decided
+FOLIO_PAGES = 12
 
-abbr = {'e. g.': 'e.g.', 'i. e.': 'i.e.', 'z. b.': 'z.B.', 'd. h.': 'd.h.'}
+# fallback for documents whose page numbers cannot be located by position
+page_num_pattern = re.compile("^[0-9]{1,2}$")
+
+# email and web addresses split at their punctuation, e.g. 'info@ snf. ch', 'www. snf. ch / de / index. html'
+email_pattern = re.compile(r"\w+@ ?[\w-]+(?: ?\. ?[\w-]+)*? ?\. ?[a-z]{2,3}\b")
+# words after a spaced slash which end a web address, as in 'www. snf. ch / Forschung / und mehr'; language codes such as 'de' are left out, they are common path segments
+url_function_words = ['und', 'oder', 'bzw', 'mit', 'von', 'für', 'auf', 'bei', 'zum', 'zur', 'der', 'die', 'das', 'den', 'dem', 'ein', 'eine',
+    'et', 'ou', 'avec', 'pour', 'par', 'sur', 'dans', 'le', 'la', 'les', 'du', 'des', 'un', 'une',
+    'and', 'or', 'with', 'for', 'from', 'the', 'of', 'to', 'at', 'on', 'a', 'an']
+url_segment = r"[\w%~-]+(?: ?\. ?(?:html?|php|aspx?|jsp|pdf)\b)?"
+# a path segment follows an unspaced slash, or a spaced slash if it starts in lower case and is no function word
+url_pattern = re.compile(r"\bwww ?\. ?(?:[\w-]+ ?\. ?)+?[a-z]{2,3}\b(?:/" + url_segment + r"|(?: / ?|/ )(?!(?:" + "|".join(url_function_words) + r")\b)(?=[a-z\d%~-])" + url_segment + r")*(?:/(?![\w%~-]))?")
 
 ###############################################################################
 
@@ -37,223 +58,73 @@ ap.add_argument("-i", "--input",  required=True, type=str, help="Path to a singl
 
 ap.add_argument("-o", "--outpath", required=True, type=str, help="path to directory for output files.")
 
-args = ap.parse_args()
-
 ###############################################################################
 
-def restore_punctuation(text):
-
-    if isinstance(text, str): # processing a title, convert to list and treat as normal
-        text = text.split()
-
-    # TODO: In the 1930s and’ 50s --> In the 1930s and ’50s
-    # 3R­-Grundsätze --> 3R­Grundsätze but should remain 3R­-Grundsätze !!
-
-    # fixed
-    # ‹ aufgezogen ›, --> ‹aufgezogen›
-    # 660’ 000 --> 660’000, 13’ 807 --> 13’807
-    # It’ s our future – now we’re talking’. --> ‘It’s our future – now we’re talking’.
-    # ‘Crimes and Punishments ’ --> ‘Crimes and Punishments’ HACK
-
-    found = False
-    current=[]
-
-    for index in range(0,len(text)):
-        word = text[index]
-
-        try:
-
-            if word == None:
-                continue
-
-            # concat between word and prev./follow. punctuation (usually quotation) -> ' good ' glued together as 'good'
-            elif text[index-1] in opening and text[index+1][0] in closing: #1
-                # look ahead to see if pattern is followed by a contraction character that also needs to be appended. e.g. “ It ’ s ... ” -> “It’s ...”
-                if text[index+2] in contractions:
-                    # print("RULE 1.2:", text[index-1], word, text[index+1], text[index+2])
-
-                    del current[-1]
-                    word = text[index-1]+word[1:]+text[index+1]+text[index+2]
-                    current.append(word)
-                    found = True
-                    continue
-
-                else:
-                    # print("RULE 1.1:", text[index-1], word[1:], text[index+1])
-                    del current[-1]
-                    word = text[index-1]+word[1:]+text[index+1]
-                    text[index+1] = word
-                    current.append(word)
-                    found = True # next word was already appended
-                    continue
-
-            # concat between punctuation with prev. and follow. word -> she ' ll glued together as she'll / 600 ' 000 -> 600'000
-            elif (word in both or word.encode('utf-8') == '\xe2\x80\x99') and (text[index+1] in contractions or (text[index+1].isdigit() and text[index-1].isdigit())):
-                # print("RULE 2:", text[index-1], word, text[index+1])
-                del current[-1]
-                word = text[index-1]+word+text[index+1]
-                text[index+1] = word
-                current.append(word)
-                found = True # next word was already appended
-                continue
-
-            # append other punctuation to previous word -> house . as house.
-            elif word in punctuation:
-                # print("RULE 3:", text[index-1], word)
-                del current[-1]
-                word = text[index-1]+word
-                text[index] = word
-                current.append(word)
-                continue
-
-            # append sentence opening punctuation to following word -> << She said as <<She said
-            elif word in opening:
-                # print("RULE 4:", word, text[index+1])
-                word = word+text[index+1]
-                text[index+1] = word
-                current.append(word)
-                found = True # next word was already appended
-                continue
-
-            # append other punctuation to previous word -> house . as house.
-            elif word[0] in punctuation:
-                # print("RULE 5:", text[index-1], word)
-                # print(word)
-                del current[-1]
-                word = text[index-1]+word
-                text[index] = word
-                current.append(word)
-                continue
-
-        except IndexError:
-            pass
-
-
-        # if the current word was already apended move on
-        if found:
-            # print("FOUND")
-            # print(word)
-            # print(current)
-            found = False
-            continue
-
-        # append all other words as they are
-        if word:
-            current.append(word)
-            # print(current)
-    # if we somehow left out content e.g. - - + use original
-    if current == []:
-        current = text
-
-    # Hack to ensure that nothing is missed: e.g. <div>'Crime and Punishments '<\div> -> <div>'Crime and Punishments'<\div>
-    try:
-        if current[-1] in punctuation:
-            current[-2] = current[-2] + current[-1]
-            del current[-1]
-    except IndexError:
-        pass
-
-    return ' '.join(current)
-
-def restore_french_punctuation(text):
-
-    if isinstance(text, str): # processing a title, convert to list and treat as normal
-        text = text.split()
-
-    found = False
-    current=[]
-    for index in range(0,len(text)):
-        word = text[index]
-        try:
-            # concat between word and prev./follow. punctuation (usually quotation) -> ' good ' glued together as 'good'
-            if text[index-1] in opening and text[index+1][0] in closing :
-                    del current[-1]
-                    word = text[index-1]+word[1:]+text[index+1]
-                    text[index+1] = word
-                    current.append(word)
-                    found = True # next word was already appended
-                    continue
-            # concat between punctuation with prev. and follow. word -> l ' amour glued together as l'amour
-            elif word and (word in both or word.encode('utf-8') == '\xe2\x80\x99') and text[index-1].lower() in fr_contractions:
-                del current[-1]
-                word = text[index-1]+word+text[index+1]
-                text[index+1] = word
-                current.append(word)
-                found = True # next word was already appended
-                continue
-            # append other punctuation to previous word -> house . as house.
-            elif word in punctuation:
-                del current[-1]
-                word = text[index-1]+word
-                text[index] = word
-                current.append(word)
-                continue
-            # append sentence opening punctuation to following word -> << She said as <<She said
-            elif word in opening:
-                word = word+text[index+1]
-                text[index+1] = word
-                current.append(word)
-                found = True # next word was already appended
-                continue
-            # append other punctuation to previous word -> house . as house.
-            elif word and word[0] in punctuation:
-                del current[-1]
-                word = text[index-1]+word
-                text[index] = word
-                current.append(word)
-                continue
-        except IndexError:
-            pass
-
-        # if the current word was already apended move on
-        if found:
-            found = False
-            continue
-
-        # append all other words as they are
-        if word:
-            current.append(word)
-
-    # if we somehow left out content e.g. - - + use original
-    if current == []:
-        current = text
-
-
-    return ' '.join(current)
+def _remove_spaces(match):
+    return match.group().replace(" ", "")
 
 def fix_urls_emails(newstring):
-
+    """
+    Reassembles the email addresses and web addresses of a paragraph, which restore_punctuation leaves split at their punctuation,
+    e.g. 'info@ snf. ch' --> 'info@snf.ch' and 'www. snf. ch / de / index. html' --> 'www.snf.ch/de/index.html'.
+    Parentheses around an address are kept, '(www. snf. ch)' --> '(www.snf.ch)'. Earlier versions removed all parentheses of a
+    paragraph containing '(www', only to keep the matched text, used as a pattern, from raising re.error.
+    """
     if "@" in newstring:
-        m = re.search(r"\w+@ \w+\. [a-z]{2,3}",newstring)
-        if m:
-            temp=newstring[m.start():m.end()]
-            temp=re.sub(" ","",temp)
-            newstring = re.sub(newstring[m.start():m.end()],temp,newstring)
+        newstring = email_pattern.sub(_remove_spaces, newstring)
     if "www" in newstring:
-        if ("(www") in newstring:
-            newstring = re.sub("[()]","",newstring)
-        # m = re.search(r"www\. (.+?) ?\. ?([a-z]{2,3}) ?/ ?([^\.]+)", newstring)
-        # added this to fix web endings not being attached to address, e.g. '. php', '. html'
-        m = re.search(r"www\. (.+?) ?\. ?([a-z]{2,3}) ?/ ?([^\.]+)\.? ?(html?|php|com|ch|uk|co|au)?", newstring)
-        if m:
-            # print(m.groups())
-            temp=newstring[m.start():m.end()]
-            temp=re.sub(" ","",temp)
-            newstring = re.sub(newstring[m.start():m.end()],temp,newstring)
-        try:
-            newstring = re.sub(r'www\. (.+?) ?\. ?([a-z]{2,3})', r'www.\1.\2.\3', newstring)
-        except re.error:
-            newstring = re.sub(r'www\. (.+?) ?\. ?([a-z]{2,3})', r'www.\1.\2.', newstring)
+        newstring = url_pattern.sub(_remove_spaces, newstring)
 
     return newstring
 
-def restore_abbreviations(newstring):
-    # restores i. e. --> i.e.
-    for i in abbr:
-        if i in newstring.lower():
-            newstring = newstring.replace(i, abbr[i])
-            print("abbreviation replaced:", i, "-->", abbr[i])
-    return newstring
+def _trie_regex(node):
+    # regex of a character trie, so that matching costs the length of an abbreviation, not the number of abbreviations
+    branches = [re.escape(char) + _trie_regex(node[char]) for char in sorted(node) if char]
+    if not branches:
+        return ""
+    if len(branches) == 1 and "" not in node:
+        return branches[0]
+    return "(?:{}){}".format("|".join(branches), "?" if "" in node else "")
+
+def abbr_pattern(lang):
+    """
+    Returns the compiled case-insensitive pattern matching the abbreviations to restore in a language, the longest one at a position,
+    and the dictionary of their replacements.
+    """
+    if lang not in abbr_patterns:
+        replacements = {}
+        for table_lang, table in abbr.items():
+            if table_lang != lang:
+                replacements.update(table)
+        replacements.update(abbr.get(lang, {}))
+
+        trie = {}
+        for abbreviation in replacements:
+            node = trie
+            for char in abbreviation:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        pattern = re.compile(r"(?<!\w)" + _trie_regex(trie), re.IGNORECASE) if trie else None
+        abbr_patterns[lang] = (pattern, replacements)
+    return abbr_patterns[lang]
+
+def restore_abbreviations(newstring, lang, abbr_counts=None):
+    # restores i. e. --> i.e. and I. e. --> I.e., and counts the replacements per abbreviation in abbr_counts (Counter) if given
+    pattern, replacements = abbr_pattern(lang)
+    if pattern is None:
+        return newstring
+
+    def replace(match):
+        found = match.group()
+        abbreviation = found.lower()
+        if abbr_counts is not None:
+            abbr_counts[abbreviation] += 1
+        restored = replacements[abbreviation]
+        if found[0].isupper():
+            restored = restored[0].upper() + restored[1:]
+        return restored
+
+    return pattern.sub(replace, newstring)
 
 def denoise(newstring):
     newstring = newstring.replace('◂ ', '')
@@ -261,12 +132,13 @@ def denoise(newstring):
     # newstring = newstring.strip()
     return newstring.strip()
 
-def remove_page_nums(article_content, document_content):
+def remove_page_nums(article_content, document_content, is_page_num=page_num_pattern.search):
+    #is_page_num tells whether a line is a page number, by default any number of one or two digits
     #remove page numbers occuring right before or right after the article boundary
     try:
-        if re.search("^[0-9]{1,2}$",article_content[1]):
+        if is_page_num(article_content[1]):
             del(article_content[1])
-        if re.search("^[0-9]{1,2}$",article_content[-1]):
+        if is_page_num(article_content[-1]):
             del(article_content[-1])
     except IndexError:
         pass
@@ -283,7 +155,7 @@ def remove_page_nums(article_content, document_content):
             article_content[idx] = line + article_content[0] + " "+ article_content[idx+1]
             del(article_content[idx+1])
             del(article_content[0])
-        if re.search("^[0-9]{1,2}$",line) and len(document_content)>2:
+        if is_page_num(line) and len(document_content)>2:
             if idx<len(article_content)-1 and article_content[idx+1] and article_content[idx+1][0].islower() and not re.search("[\.\?\!]$",article_content[idx-1]):
                 article_content[idx-1]=article_content[idx-1]+" "+article_content[idx+1]
                 del(article_content[idx+1])
@@ -297,110 +169,245 @@ def remove_page_nums(article_content, document_content):
 
     return article_content
 
-def extract_text(xml_file, lang):
+def iter_articles(xml_file):
+    """
+    Yields the Article elements of an xml file read with iterparse, or of a page range file with their pages read from the TETML.
+    A page range file is recognised by the root element of its first article, so that an xml file is opened only once.
+    """
+    for _, elem in etree.iterparse(xml_file, tag="Article"):
+        if page_ranges.TETML_ATTRIB in elem.getparent().attrib:
+            break
+        yield elem
+    else:
+        return
 
-    document_content = []
+    for article in page_ranges.iter_articles(xml_file):
+        yield article
 
-    for _, elem in etree.iterparse(xml_file, tag="Article"):
-        paras = elem.xpath(".//Para")
-        article_content = []
-
-        for para in paras:
-            para_content = []
-            tokens = para.xpath(".//Text")
-            for token in tokens:
-                if float(token.getnext().getchildren()[0].attrib["size"]) >= 8:
-                    para_content.append(token.text)
-
-            if lang == 'fr':
-                newstring = restore_french_punctuation(para_content) # newstring is paragraph text as string
-            else:
-                newstring = restore_punctuation(para_content)
+def document_root(xml_file):
+    """
+    Returns the tag and attributes of the root element of an xml file or a page range file, without reading the articles.
+    """
+    if page_ranges.is_page_ranges(xml_file):
+        for _, elem in etree.iterparse(xml_file, events=("start",)):
+            return elem.tag, {"document_id": elem.attrib["document_id"]}
+    else:
+        for _, elem in etree.iterparse(xml_file, events=("start",)):
+            return elem.tag, dict(elem.attrib)
+
+def article_root(article):
+    """
+    Returns the tag and attributes of the root element of an article read with iter_articles, without the TETML reference of a page range file.
+    """
+    root = article.getparent()
+    return root.tag, {k: v for k, v in root.attrib.items() if k != page_ranges.TETML_ATTRIB}
 
-            newstring = fix_urls_emails(newstring)
-            newstring = restore_abbreviations(newstring)
-            newstring = denoise(newstring)
+def locate_folios(articles, n_pages=FOLIO_PAGES):
+    """
+    Locates the printed page numbers of a document while its articles are read: the articles are buffered until n_pages pages
+    with numbers in their header or footer band have been read, or the document ends, and the offset is decided from these pages.
 
-            article_content.append(newstring)
-            para_content = []
+    Args:
+        articles (iterable): Article elements in document order
+        n_pages (int): number of pages with candidate page numbers the offset is decided from
 
+    Yields:
+        (article, folios): Article element and the printed page numbers of the document (PageNumberMap, to which extract_article
+            adds the pages of the article), folios is None if the page numbers cannot be located
+    """
+    articles = iter(articles)
+    buffered = []
+    first_pages = PageNumberMap()
+    for article in articles:
+        buffered.append(article)
+        for page in article.iter("Page"):
+            first_pages.add_page(page)
+        if first_pages.candidate_pages >= n_pages:
+            break
+
+    folios = PageNumberMap(offset=first_pages.offset) if first_pages.located else None
+
+    for article in itertools.chain(buffered, articles):
+        yield article, folios
+
+def extract_article(elem, lang, folios, document_content, abbr_counts=None):
+    """
+    Extracts the paragraph strings of an Article element.
+
+    Args:
+        elem (_Element): Article element
+        lang (string): language code, e.g. de, en or fr
+        folios (PageNumberMap): printed page numbers of the document (see locate_folios), the pages of the article are added.
+            If None, page numbers are told apart by page_num_pattern.
+        document_content (list): paragraph strings of the preceding articles
+        abbr_counts (Counter): if given, the abbreviations restored are counted in it
+
+    Returns:
+        article_content (list): paragraph strings of the article
+    """
+    paras = elem.xpath(".//Para")
+    words = GlyphLayer(elem)
+    if folios is not None:
+        for page in elem.iter("Page"):
+            folios.add_page(page)
+    article_content = []
+    folio_lines = set() # paragraphs consisting of a page number only
+
+    for para in paras:
+        para_content = []
+        tokens = para.xpath(".//Text")
+        para_folio = bool(tokens)
+        for token in tokens:
+            if words[token].size >= 8:
+                para_content.append(token.text)
+                para_folio = para_folio and folios is not None and folios.is_folio(token)
+
+        newstring = restore_punctuation(para_content, lang) # newstring is paragraph text as string
+
+        newstring = fix_urls_emails(newstring)
+        newstring = restore_abbreviations(newstring, lang, abbr_counts)
+        newstring = denoise(newstring)
+
+        article_content.append(newstring)
+        if para_folio and para_content:
+            folio_lines.add(newstring)
+        para_content = []
+
+    if folios is not None:
+        article_content = remove_page_nums(article_content, document_content, folio_lines.__contains__)
+    else:
         article_content = remove_page_nums(article_content, document_content)
 
-        article_content = list(filter(None, article_content))
+    article_content = list(filter(None, article_content))
+
+    return article_content
+
+def extract_text(xml_file, lang, abbr_counts=None):
+
+    document_content = []
+
+    for elem, folios in locate_folios(iter_articles(xml_file)):
+        article_content = extract_article(elem, lang, folios, document_content, abbr_counts)
         document_content.append(article_content)
 
     return document_content
 
+def restore_article(attrib, article, lang):
+    """
+    Builds the output article element from the attributes of an Article element and its paragraph strings.
+
+    Args:
+        attrib (list): attribute items of the Article element, in order
+        article (list): paragraph strings of the article
+        lang (string): language code, e.g. de, en or fr
+
+    Returns:
+        new_article (_Element): article element with a div per paragraph, or an empty article element if there is no text
+    """
+    new_article = etree.Element("article")
+    if not article:
+        return new_article
+
+    for k,v in attrib:
+        new_article.set(k,v)
+    new_article.attrib["id"] = new_article.attrib.pop("article_id")
+
+    #split long titles
+    current_title=restore_punctuation(new_article.attrib["title"], lang)
+    mt=re.search("[\.\?\!]",current_title)
+    if mt and mt.start()<len(current_title)-1 or len(current_title.split())>8:
+        splittitle = re.split("[\.\?\!]",current_title)
+        if len(article[0])>10 and article[0] in current_title:
+            new_article.set("title",article[0])
+        elif len(article[1])>10 and article[1] in current_title:
+            new_article.set("title",article[1])
+        else:
+            if mt:
+                new_article.set("title",splittitle[0]+current_title[mt.start()])
+
+    consec_blank_lines=0
+    max_consec_blank=-1
+    for pidx,paras in enumerate(article):
+        if paras:
+            new = etree.SubElement(new_article,"div")
+            new.text=paras
+        if not paras:
+            consec_blank_lines+=1
+        else:
+            if consec_blank_lines>0:
+                prev_max =max_consec_blank
+                if consec_blank_lines>prev_max:
+                    max_consec_blank=consec_blank_lines
+            consec_blank_lines=0
+
+    if max_consec_blank>5:
+        new_article.attrib["potential_errors"] = "true"
+        print("potential_errors set to true")
+
+    return new_article
+
 def restore_xml_tree(xml_file, document_content, lang):
     #start "refactoring" the xml tree
 
-    newtree = etree.parse(xml_file)
+    newtree = page_ranges.parse(xml_file)
+    root = newtree.getroot()
 
     for idx, article in enumerate(document_content):
-        if not article:
-            newtree.getroot()[idx].tag="article"
-            newtree.getroot()[idx].clear()
-            continue
-        copy=newtree.getroot()[idx].items()
-        newtree.getroot()[idx].clear()
-        for k,v in copy:
-            newtree.getroot()[idx].set(k,v)
-
-        newtree.getroot()[idx].tag="article"
-        newtree.getroot()[idx].attrib["id"] = newtree.getroot()[idx].attrib.pop("article_id")
-
-        #split long titles
-        if lang == 'fr':
-            current_title=restore_french_punctuation(newtree.getroot()[idx].attrib["title"])
-        else:
-            current_title=restore_punctuation(newtree.getroot()[idx].attrib["title"])
-        mt=re.search("[\.\?\!]",current_title)
-        if mt and mt.start()<len(current_title)-1 or len(current_title.split())>8:
-            splittitle = re.split("[\.\?\!]",current_title)
-            if len(article[0])>10 and article[0] in current_title:
-                newtree.getroot()[idx].set("title",article[0])
-            elif len(article[1])>10 and article[1] in current_title:
-                newtree.getroot()[idx].set("title",article[1])
-            else:
-                if mt:
-                    newtree.getroot()[idx].set("title",splittitle[0]+current_title[mt.start()])
-
-        consec_blank_lines=0
-        max_consec_blank=-1
-        for pidx,paras in enumerate(article):
-            if paras:
-                new = etree.SubElement(newtree.getroot()[idx],"div")
-                new.text=paras
-            if not paras:
-                consec_blank_lines+=1
-            else:
-                if consec_blank_lines>0:
-                    prev_max =max_consec_blank
-                    if consec_blank_lines>prev_max:
-                        max_consec_blank=consec_blank_lines
-                consec_blank_lines=0
-
-        if max_consec_blank>5:
-            newtree.getroot()[idx].attrib["potential_errors"] = "true"
-            print("potential_errors set to true")
+        root.replace(root[idx], restore_article(root[idx].items(), article, lang))
 
-    output_tree = etree.ElementTree(newtree.getroot())
+    output_tree = etree.ElementTree(root)
     return output_tree
 
+def extract_and_restore(xml_file, outfile, lang):
+    """
+    Extracts the text of an xml file and writes the output file in a single streaming pass: every Article element
+    is read, turned into its output article element and written before the next one is read. Same output as
+    write_output(restore_xml_tree(xml_file, extract_text(xml_file, lang), lang), outfile).
+
+    Args:
+        xml_file (string): input xml or page range file
+        outfile (string): output file
+        lang (string): language code, e.g. de, en or fr
+
+    Returns:
+        abbr_counts (Counter): number of replacements per abbreviation restored in the file
+    """
+    document_content = []
+    abbr_counts = Counter()
+
+    # the printed page numbers are located on the first articles, which are buffered until then
+    articles = locate_folios(iter_articles(xml_file))
+    first = next(articles, None)
+
+    tag, attrib = document_root(xml_file) if first is None else article_root(first[0])
+
+    with XmlStreamWriter(outfile, tag, attrib) as writer:
+        for elem, folios in itertools.chain([first] if first else [], articles):
+            article_content = extract_article(elem, lang, folios, document_content, abbr_counts)
+            document_content.append(article_content)
+            writer.write(restore_article(elem.items(), article_content, lang))
+
+            # free the article, and the articles before it when the file is read with iterparse
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+    return abbr_counts
+
 def write_output(tree, outfile):
     """
     Write the new tree to the output file.
     :param tree: collection of article elements in valid xml (_ElementTree)
     :output_file: output file for writing (file_object)
     """
-    tree.write(outfile, pretty_print=True, xml_declaration=True, encoding="utf-8")
-
-    call(["xmllint", "--format", outfile, "--output", outfile[:-4]+".tmp.xml", "--encode", "utf-8"])
-    call(["mv", outfile[:-4]+".tmp.xml", outfile])
+    # formatted as by xmllint --format and written atomically
+    write_xml(tree, outfile)
 
 ##############################################################################
 
-def main():
+def main(args):
 
     if not pathlib.Path(args.outpath).exists() and not pathlib.Path(args.outpath).is_dir():
         pathlib.Path(args.outpath).mkdir(parents=True)
@@ -412,12 +419,12 @@ def main():
                 start_time = time.time() # start timer
                 infile = str(f)
                 file_name = infile.split("/")[-1]
-                file_lang = re.search(r'_(de|en|fr).xml', file_name).group(1)
+                file_lang = re.search(r'_(de|en|fr)\.xml', file_name).group(1)
                 print("\ncurrently processing {}...".format(file_name))
-                document_content = extract_text(infile, file_lang)
-                outfile = str(pathlib.Path(args.outpath) / file_name)
-                newtree = restore_xml_tree(infile, document_content, file_lang)
-                write_output(newtree, outfile)
+                outfile = str(pathlib.Path(args.outpath) / (file_name.rsplit(".", 1)[0] + ".xml"))
+                abbr_counts = extract_and_restore(infile, outfile, file_lang)
+                if abbr_counts:
+                    print("\tabbreviations replaced: {}".format(", ".join("{} ({})".format(a, n) for a, n in abbr_counts.most_common())))
                 elapsed_time = time.time() - start_time
                 print("\t{0} processed in {1:.2f} seconds".format(file_name, elapsed_time))
 
@@ -425,14 +432,15 @@ def main():
         infile = str(pathlib.Path(args.input))
         start_time = time.time() # start timer
         file_name = infile.split("/")[-1]
-        file_lang = re.search(r'_(de|en|fr).xml', file_name).group(1)
+        file_lang = re.search(r'_(de|en|fr)\.xml', file_name).group(1)
         print("\nProcessing {}...".format(file_name))
-        document_content = extract_text(infile, file_lang)
-        outfile = str(pathlib.Path(args.outpath) / file_name)
-        newtree = restore_xml_tree(infile, document_content, file_lang)
-        write_output(newtree, outfile)
+        outfile = str(pathlib.Path(args.outpath) / (file_name.rsplit(".", 1)[0] + ".xml"))
+        abbr_counts = extract_and_restore(infile, outfile, file_lang)
+        if abbr_counts:
+            print("\tabbreviations replaced: {}".format(", ".join("{} ({})".format(a, n) for a, n in abbr_counts.most_common())))
         elapsed_time = time.time() - start_time
         print("\t{0} processed in {1:.2f} seconds".format(file_name, elapsed_time))
 
 if __name__ == "__main__":
-    main()
+    args = ap.parse_args()
+    main(args)
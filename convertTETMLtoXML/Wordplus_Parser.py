@@ -4,6 +4,13 @@
 from lxml import etree
 import operator
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tools.tetml import iter_pages
+from tools.tetml_cache import PageIndex
+from tools.glyph_layer import GlyphLayer
+from tools.page_lines import PageLines
 
 class TetmlFile(object):
     "Class storing SNF_tetml_pages_files"
@@ -14,37 +21,79 @@ class TetmlFile(object):
 
     ###################################################
 
-    def __init__(self, tetml_file):
-        "initialises Object of Class tetml_file"
+    def __init__(self, tetml_file, cache=None, digest=None):
+        """initialises Object of Class tetml_file
+        :param cache: optional tools.tetml_cache.TetmlCache, parsed files are loaded from and stored in it
+        :param digest: optional content_hash of tetml_file, so that the cache does not hash it again
+        """
         # read file with lxml, get root and find all pages
         # self.tetml = etree.parse(tetml_file, TetmlFile.parser)
         self.filename = tetml_file.split("/")[-1][:-6]
-        self.tetml = self._parse_NNS(tetml_file)
-        self.root = self.tetml.getroottree()
-        self.pages = self.root.xpath("//Page")
+        self.pages = []
+        self.page_index = {} # maps page number to Page element, built while loading
+        self.tetml = self._load(tetml_file, cache, digest)
+        self.root = etree.ElementTree(self.tetml)
         self.num_of_pages = len(self.pages)
 
+    def _load(self, tetml_file, cache, digest):
+        """
+        Returns the parsed Document element, from the cache if possible.
+        Pages loaded from the cache are parsed on first access and are not attached to the Document element.
+        """
+        if cache is None:
+            return self._parse_NNS(tetml_file)
+
+        key = cache.key(tetml_file, digest)
+        cached_pages = cache.load(key)
+
+        if cached_pages is not None:
+            self.pages = cached_pages
+            self.page_index = PageIndex(cached_pages)
+            return cached_pages.document
+
+        parsed_dom = self._parse_NNS(tetml_file)
+        cache.store(key, parsed_dom, self.pages)
+
+        return parsed_dom
+
+    def _add_page(self, page):
+        self.pages.append(page)
+        try:
+            self.page_index[int(page.attrib["number"])] = page
+        except KeyError: # page has no attrib "number"
+            pass
+
     def _parse_NNS(self, tetml_file):
         """
         Parses tetml file removing namespace and declaration.
+        Pages are streamed one at a time with iterparse, so the file is never held in memory as a string.
         """
-        with open(tetml_file) as f:
-            # read lines from xml skipping <TET> and <Creation> tags.
-            xml_lines = f.readlines()[8:-1]
-
-        # xml_lines = [line.strip() for line in xml_lines]
-        xml_string = " ".join(xml_lines)
+        document = []
 
-        # output xml file with no namespace declaration.
-        # root = etree.ElementTree(etree.fromstring(xml_string))
-        # root.write(open(self.filename+"_NNS.xml", 'wb'), pretty_print=True, xml_declaration=True, encoding="utf-8")
+        for page in iter_pages(tetml_file, document):
+            self._add_page(page)
 
-        # initialise parser that removes whitespace and
-        parser = etree.XMLParser(remove_blank_text=True)
+        # detach <Document> from <TET> so that it becomes the root, as before
+        parsed_dom = document[0]
+        tet = parsed_dom.getparent()
+        if tet is not None:
+            tet.remove(parsed_dom)
+        etree.cleanup_namespaces(parsed_dom)
 
-        parsed_dom = etree.XML(xml_string, parser=parser)
         return parsed_dom
 
+    def get_page(self, number):
+        """
+        Returns the Page element with the given page number, or None if there is no such page.
+        """
+        return self.page_index.get(number)
+
+    def get_page_range(self, start, stop):
+        """
+        Returns the Page elements numbered start to stop-1 (like range) in page order. Missing pages are skipped.
+        """
+        return [self.page_index[num] for num in range(start, stop) if num in self.page_index]
+
     def _front_matter_NEW(self):
         """
         Finds and returns a contents pages of issues > 96.
@@ -123,11 +172,13 @@ class TetmlFile(object):
 
             page_number_elems = []
 
+            words = GlyphLayer(page)
+
             text_elems = page.xpath(".//Text")
 
             for elem in text_elems:
                 if elem.text != None:
-                    if elem.text.isdigit() and float(elem.getnext().xpath("./Glyph/@size")[0]) >= min_font_size:
+                    if elem.text.isdigit() and words[elem].size >= min_font_size:
 
                         if int(elem.text) != 5: # assumed second contents page
                             if int(elem.text) < len(self.pages):
@@ -140,12 +191,12 @@ class TetmlFile(object):
                 if len(elem.getparent().getparent().getchildren()) > 1:
 
                     # if title text is in same para
-                    text_elems = [token.text for token in elem.getparent().getparent().xpath(".//Text") if float(token.getnext().xpath("./Glyph/@size")[0]) >= min_font_size and token.text != None]
+                    text_elems = [token.text for token in elem.getparent().getparent().xpath(".//Text") if words[token].size >= min_font_size and token.text != None]
                     content_dict[int(elem.text)] = " ".join(text_elems[1:])
 
                 else:
                     # title is assumed to be in the following para tag
-                    text_elems = [token.text for token in elem.getparent().getparent().getnext().xpath(".//Text") if float(token.getnext().xpath("./Glyph/@size")[0]) >= min_font_size and token.text != None]
+                    text_elems = [token.text for token in elem.getparent().getparent().getnext().xpath(".//Text") if words[token].size >= min_font_size and token.text != None]
                     content_dict[int(elem.text)] = " ".join(text_elems)
 
         content_dict[int(editorial.attrib["number"])] = "Editorial/Editorial/Éditorial"
@@ -155,9 +206,13 @@ class TetmlFile(object):
 
     ##########################################################################
 
-    def parse_contents_MID(self, min_font_size=float(8.00)):
-
-        offset = input("Is a page offset required? ((y)es / (n)o)\n")
+    def parse_contents_MID(self, min_font_size=float(8.00), offset=None, interactive=True):
+        """
+        Parses the contents page of issues 81 - 95.
+        :param offset: page offset between printed and pdf page numbers (-1 or 0). If None, the offset is detected automatically.
+        :param interactive: if True, the user is asked for the offset when automatic detection is not confident
+        :return: sorted list of (page number, title) tuples
+        """
 
         editorial, contents_page = self._front_matter_MID()
 
@@ -165,13 +220,15 @@ class TetmlFile(object):
 
         page_number_elems = []
 
+        words = GlyphLayer(contents_page)
+
         text_elems = contents_page.xpath(".//Text")
 
         for elem in text_elems:
             if elem.text != None:
-                if elem.text.isdigit() and float(elem.getnext().xpath("./Glyph/@size")[0]) >= min_font_size:
+                if elem.text.isdigit() and words[elem].size >= min_font_size:
 
-                    if offset == "y":
+                    if offset == -1:
                         if int(elem.text) < len(self.pages) + 2:
                             page_number_elems.append(elem)
                             content_dict[int(elem.text)] = ''
@@ -187,7 +244,7 @@ class TetmlFile(object):
 
                 text_elems = []
                 for i, token in enumerate(elem.getparent().getparent().xpath(".//Text")):
-                    if float(token.getnext().xpath("./Glyph/@size")[0]) >= min_font_size and token.text != None:
+                    if words[token].size >= min_font_size and token.text != None:
                         text_elems.append(token.text)
                     if i == len(elem.getparent().getparent().xpath(".//Text"))-1:
                         try:
@@ -204,32 +261,34 @@ class TetmlFile(object):
             else:
                 # title is assumed to be in the following para tag
                 try:
-                    text_elems = [token.text for token in elem.getparent().getparent().getnext().xpath(".//Text") if float(token.getnext().xpath("./Glyph/@size")[0]) >= min_font_size and token.text != None]
+                    text_elems = [token.text for token in elem.getparent().getparent().getnext().xpath(".//Text") if words[token].size >= min_font_size and token.text != None]
                     content_dict[int(elem.text)] = " ".join(text_elems)
                 except AttributeError:
                     pass
 
 
+        if offset is None:
+            offset = self._choose_offset(content_dict, -1, interactive)
+            if offset == -1: # page numbers beyond the buffer for an offset of -1 are not valid
+                content_dict = {k: v for k, v in content_dict.items() if k < len(self.pages) + 2}
+
         content_dict[int(editorial.attrib["number"])] = "Editorial/Editorial/Éditorial"
         content_dict[int(contents_page.attrib["number"])] = "Inhalt/Sommaire/Contents"
 
-        if offset == "y": # assumes an offset of -1
-            offset_dict = {}
-            for k, v in content_dict.items():
-                if not k in offset_dict:
-                    if k == 1 or k == 2:
-                        offset_dict[k] = v
-                    else:
-                        offset_dict[k-1] = v
-            return sorted(offset_dict.items(), key=operator.itemgetter(0))
+        if offset:
+            content_dict = self._shift_contents(content_dict, offset)
 
         return sorted(content_dict.items(), key=operator.itemgetter(0))
 
     ##########################################################################
 
-    def parse_contents_OLD(self, min_font_size=float(8.00)):
-
-        offset = input("Is a page offset required? ((y)es / (n)o)\n")
+    def parse_contents_OLD(self, min_font_size=float(8.00), offset=None, interactive=True):
+        """
+        Parses the contents page of issues up to 80.
+        :param offset: page offset between printed and pdf page numbers (0 or +1). If None, the offset is detected automatically.
+        :param interactive: if True, the user is asked for the offset when automatic detection is not confident
+        :return: sorted list of (page number, title) tuples
+        """
 
         editorial, contents_page = self._front_matter_OLD()
 
@@ -240,19 +299,21 @@ class TetmlFile(object):
 
         page_number_elems = []
 
+        words = GlyphLayer(contents_page)
+        lines = PageLines(contents_page, words)
+
         text_elems = contents_page.xpath(".//Text")
 
         for elem in text_elems:
             if elem.text != None:
-                if elem.text.isdigit() and float(elem.getnext().xpath("./Glyph/@size")[0]) >= min_font_size and int(elem.text) < len(self.pages) and int(elem.text) > 1:
-                    y_pos = float(elem.getnext().attrib["lly"])
-                    page_number_elems.append((elem, y_pos))
+                if elem.text.isdigit() and words[elem].size >= min_font_size and int(elem.text) < len(self.pages) and int(elem.text) > 1:
+                    page_number_elems.append(elem)
                     # add page number to content dictionary
                     content_dict[int(elem.text)] = ''
 
         # print([i for i in page_number_elems])
 
-        for elem, y_pos in page_number_elems:
+        for elem in page_number_elems:
             text_elems = []
             current_size = 0
 
@@ -265,31 +326,27 @@ class TetmlFile(object):
 
 
             elif len(elem.getparent().getparent().getchildren()) > 1:
-                for i, token in enumerate(elem.getparent().getparent().xpath(".//Text")):
-                    if float(token.getnext().attrib["lly"]) == y_pos and token.text != None:
-                        current_size = float(elem.getnext().xpath(".//Glyph/@size")[0])
+                para_tag = elem.getparent().getparent()
+                row = lines.line_of(elem)
+
+                # words of the para on the same line as the page number, in document order
+                for token in para_tag.iter("Text"):
+                    if lines.line_of(token) == row and token.text != None:
+                        current_size = words[elem].size
                         text_elems.append(token.text)
 
-                    ## check for continuation of title in following para
-                    if i == len(elem.getparent().getparent().xpath(".//Text"))-1:
-                        para_tag = elem.getparent().getparent()
-                        try:
-                            ## look for subtitle in the following para
-                            if para_tag.getnext().xpath(
-                                ".//Text")[0].text.isalpha()\
-                            and len(para_tag.getnext().xpath(
-                                ".//Text")[0].text) > 1\
-                            and float(
-                                para_tag.getnext().xpath(
-                                    ".//Word/Box/Glyph/@size"
-                                    )[0]
-                                ) <= current_size\
-                            and\
-                            float(para_tag.getnext().xpath(".//Word/Box/Glyph/@size")[0]) > min_font_size:
-                                for token in para_tag.getnext().xpath(".//Text"):
-                                    text_elems.append(token.text)
-                        except (AttributeError, IndexError):
-                            print("Error raised")
+                ## check for continuation of title in following para
+                try:
+                    ## look for subtitle in the following para
+                    next_initial = para_tag.getnext().xpath(".//Text")[0]
+                    if next_initial.text.isalpha()\
+                    and len(next_initial.text) > 1\
+                    and words[next_initial].size <= current_size\
+                    and words[next_initial].size > min_font_size:
+                        for token in para_tag.getnext().xpath(".//Text"):
+                            text_elems.append(token.text)
+                except (AttributeError, IndexError):
+                    print("Error raised")
 
                 ## if page has multiple titles, split with " / "
                 if content_dict[int(elem.text)] and not content_dict[int(elem.text)].isdigit():
@@ -298,6 +355,9 @@ class TetmlFile(object):
                     content_dict[int(elem.text)] = " ".join(text_elems[1:])
 
 
+        if offset is None:
+            offset = self._choose_offset(content_dict, +1, interactive)
+
         content_dict[int(editorial.attrib["number"])] = "Editorial/Editorial/Éditorial"
         content_dict[int(contents_page.attrib["number"])] = "Inhalt/Sommaire/Contents"
 
@@ -314,15 +374,8 @@ class TetmlFile(object):
         #     if str(k) + " )" in v:
         #         content_dict.pop()
 
-        if offset == "y": # assumes an offset of +1
-            offset_dict = {}
-            for k, v in content_dict.items():
-                if not k in offset_dict:
-                    if k == 1 or k == 2:
-                        offset_dict[k] = v
-                    else:
-                        offset_dict[k+1] = v
-            return sorted(offset_dict.items(), key=operator.itemgetter(0))
+        if offset:
+            return sorted(self._shift_contents(content_dict, offset).items(), key=operator.itemgetter(0))
 
 
         print(content_dict)
@@ -331,6 +384,75 @@ class TetmlFile(object):
 
     ##########################################################################
 
+    def _shift_contents(self, content_dict, offset):
+        """
+        Shifts all page numbers of a contents dictionary by offset. Pages 1 and 2 are never shifted.
+        """
+        offset_dict = {}
+        for k, v in content_dict.items():
+            if not k in offset_dict:
+                if k == 1 or k == 2:
+                    offset_dict[k] = v
+                else:
+                    offset_dict[k+offset] = v
+        return offset_dict
+
+    def _title_match(self, title, page, n_paras=3):
+        """
+        Returns the share of title words found in the first paragraphs of a page.
+        :param title: title string from the contents page
+        :param page: Page element the title points to
+        :param n_paras: number of paragraphs at the top of the page to compare against
+        """
+        title_words = {word.lower() for word in title.split() if len(word) > 2 and word.isalpha()}
+        if not title_words or page is None:
+            return 0.0
+
+        page_words = set()
+        for i, para in enumerate(page.iter("Para")):
+            if i == n_paras:
+                break
+            page_words.update(token.text.lower() for token in para.iter("Text") if token.text)
+
+        return len(title_words & page_words) / len(title_words)
+
+    def _detect_offset(self, content_dict, candidates=(-1, 0, 1)):
+        """
+        Scores candidate page offsets by matching each contents title against the first paragraphs of the page it points to.
+        :param content_dict: dictionary of page numbers and titles parsed from the contents page
+        :return: best offset, its score and the score of the runner-up. Ties are broken toward the offset closest to 0.
+        """
+        scores = {}
+        for offset in candidates:
+            matches = [self._title_match(title, self.get_page(num+offset)) for num, title in content_dict.items() if title]
+            scores[offset] = sum(matches) / len(matches) if matches else 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], abs(item[0])))
+        best, best_score = ranked[0]
+        runner_up_score = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best, best_score, runner_up_score
+
+    def _choose_offset(self, content_dict, default_offset, interactive, min_score=0.5, min_margin=0.2):
+        """
+        Chooses the page offset for a contents dictionary. Falls back to asking the user if the detected offset is not confident,
+        or to no offset with a warning if the user cannot be asked.
+        :param default_offset: offset applied if the user answers that an offset is required
+        :return: page offset
+        """
+        offset, score, runner_up_score = self._detect_offset(content_dict)
+
+        if score < min_score or score - runner_up_score < min_margin:
+            if interactive:
+                answer = input("Is a page offset required? ((y)es / (n)o)\n")
+                return default_offset if answer == "y" else 0
+            print("Warning: page offset of {} not detected confidently (offset {:+d}, score {:.2f}, runner-up {:.2f}), no offset applied.".format(self.filename, offset, score, runner_up_score))
+            return 0
+
+        print("Page offset {:+d} detected (score {:.2f}).".format(offset, score))
+        return offset
+
+    ##########################################################################
+
 def main():
     pass
     ## test MID
@@ -3,20 +3,155 @@
 
 import sys
 from Wordplus_Parser import TetmlFile
+from collections import defaultdict
 import datetime
+import json
+import os
+import re
 
-def check_inventory(contents, filename):
+class PageNgramIndex(object):
+    """
+    Character n-gram index over the pages of a tetml file, built once per file. Maps each n-gram to the set of page numbers containing it.
+    """
+
+    def __init__(self, tetml, n=3):
+        self.n = n
+        self.index = defaultdict(set)
+        for num, page in tetml.page_index.items():
+            page_text = " ".join(token.text for token in page.iter("Text") if token.text)
+            for ngram in self.ngrams(page_text):
+                self.index[ngram].add(num)
+
+    def ngrams(self, text):
+        "Returns the set of character n-grams of a lowercased text with collapsed whitespace."
+        text = re.sub(r"\s+", " ", text.lower()).strip()
+        return {text[i:i+self.n] for i in range(len(text) - self.n + 1)}
+
+    def score(self, title, num):
+        """
+        Returns the share of the title's n-grams found on page num. Titles made of several parts, e.g. 'Editorial/Editorial/Éditorial', score as their best part.
+        """
+        best = 0.0
+        for part in title.split("/"):
+            ngrams = self.ngrams(part)
+            if ngrams:
+                best = max(best, sum(1 for ngram in ngrams if num in self.index.get(ngram, ())) / len(ngrams))
+        return best
+
+def auto_validate(contents, index, threshold=0.8):
+    """
+    Splits an extracted contents list into pairs whose title is found on its page and doubtful pairs.
+        Args: contents list of tuples, PageNgramIndex of the tetml file, minimum score for accepting a pair.
+        Returns: list of accepted pairs, list of doubtful pairs
+    """
+    accepted, doubtful = [], []
+    for num, title in contents:
+        if index.score(title, num) >= threshold:
+            accepted.append((num, title))
+        else:
+            doubtful.append((num, title))
+    return accepted, doubtful
+
+class ValidationJournal(object):
+    """
+    Append-only journal of the decisions made while validating the contents of an issue, one JSON object per line.
+    Records are keyed by the content hash of the tetml file, records of other versions of the file are ignored.
+
+    Actions:
+        accept: {"page", "title"} pair is valid
+        fix: {"page", "title"} pair is replaced by {"true_page", "true_title"}
+        delete: {"page", "title"} pair is removed
+        add: {"page", "title"} pair was missing from the contents
+        final: the final control was answered, with the additions recorded before it
+    """
+
+    def __init__(self, path, tetml_hash):
+        self.path = path
+        self.tetml_hash = tetml_hash
+        self.decisions = {} # (page, title) --> latest record
+        self.additions = []
+        self.finalised = False
+
+        if os.path.exists(path):
+            with open(path, encoding="utf8") as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _apply(self, record):
+        if record.get("tetml") != self.tetml_hash:
+            return
+        action = record["action"]
+        if action in ("accept", "fix", "delete"):
+            self.decisions[(record["page"], record["title"])] = record
+        elif action == "add":
+            if (record["page"], record["title"]) not in self.additions:
+                self.additions.append((record["page"], record["title"]))
+        elif action == "final":
+            self.finalised = True
+
+    def record(self, action, page=None, title=None, **fields):
+        """
+        Appends a decision to the journal file immediately, so that nothing is lost if the session is aborted.
+        """
+        record = {"tetml": self.tetml_hash, "action": action, "time": datetime.datetime.now().isoformat(timespec="seconds")}
+        if page is not None:
+            record["page"] = page
+            record["title"] = title
+        record.update(fields)
+
+        with open(self.path, "a", encoding="utf8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        self._apply(record)
+
+    def replay(self, num, title):
+        """
+        Returns the validated pair for a contents pair, None if it was deleted, or False if the journal doesn't cover it.
+        """
+        record = self.decisions.get((num, title))
+        if record is None:
+            return False
+        if record["action"] == "accept":
+            return (num, title)
+        if record["action"] == "fix":
+            return (record["true_page"], record["true_title"])
+        return None
+
+def check_inventory(contents, filename, index=None, threshold=0.8, journal=None):
     """
     Allows user to validate list of contents extracted from Wordplus_Parser
-        Args: automatically extracted contents list of tuples.
+        Args: automatically extracted contents list of tuples. If a PageNgramIndex is given, pairs scoring at least threshold are accepted without prompting.
+            If a ValidationJournal is given, its decisions are applied first and new decisions are recorded in it.
         Returns: validated contents list of tuples
     """
     validated_contents = []
+
+    if journal is not None:
+        unresolved = []
+        for num, title in contents:
+            pair = journal.replay(num, title)
+            if pair is False:
+                unresolved.append((num, title))
+            elif pair is not None:
+                validated_contents.append(pair)
+        print("{} of {} pairs resolved from the journal of {}.".format(len(contents) - len(unresolved), len(contents), filename))
+        contents = unresolved
+
+    if index is not None:
+        accepted, contents = auto_validate(contents, index, threshold)
+        print("{} of {} pairs validated automatically in {}.".format(len(accepted), len(accepted) + len(contents), filename))
+        validated_contents.extend(accepted)
+
+    prompted = bool(contents)
+
     for i, (num, title) in enumerate(contents):
         print("Currently processing {}\n".format(filename))
         valid_pair = input("Valid page number and title? ((y)es/(n)o)\n\t{}\t{}\n".format(num, title))
         if valid_pair != "n":
             validated_contents.append((num, title))
+            if journal is not None:
+                journal.record("accept", num, title)
         else:
             valid_page = input("Valid page number?\n\t{}\t\n((y)es/(n)o)\n".format(num))
             if valid_page == "n":
@@ -33,6 +168,8 @@ def check_inventory(contents, filename):
                             sys.exit("Process aborted.")
                 else:
                     # del contents[i]
+                    if journal is not None:
+                        journal.record("delete", num, title)
                     continue
             else:
                 true_page = num
@@ -45,21 +182,36 @@ def check_inventory(contents, filename):
 
 
             validated_contents.append((true_page, true_title))
+            if journal is not None:
+                journal.record("fix", num, title, true_page=true_page, true_title=true_title)
+
+    # additions from earlier sessions
+    if journal is not None:
+        validated_contents.extend(pair for pair in journal.additions if pair not in validated_contents)
 
-    # catch all
-    print("{} articles found".format(len(validated_contents)))
-    final_control = input("Anything missing?\n\t((y)es/(n)o)\n")
+    # catch all, asked again only if new pairs were prompted since the last final control
+    replay_final = journal is not None and journal.finalised and not prompted
+    if replay_final:
+        print("{} articles found, final control taken from the journal.".format(len(validated_contents)))
+        final_control = "n"
+    else:
+        print("{} articles found".format(len(validated_contents)))
+        final_control = input("Anything missing?\n\t((y)es/(n)o)\n")
     if final_control == "y":
         additions_pg_numbers = input("Enter page numbers of all missing items separated by '|'.\n")
         additions_titles = input("Enter titles of missing all items separated by '|'.\n")
         for num, title in zip(additions_pg_numbers.split("|"), additions_titles.split("|")):
             try:
                 validated_contents.append((int(num), str(title)))
+                if journal is not None:
+                    journal.record("add", int(num), str(title))
                 # validated_contents.append((int(additions[i]), additions[i+1]))
             except TypeError:
                 print("Invalid page number entered. Process aborted.")
     else:
         pass
+    if journal is not None and not replay_final:
+        journal.record("final")
     # resort validated contents and return
     validated_contents.sort(key=lambda tup: tup[0])
     # print(validated_contents)
@@ -5,8 +5,14 @@ from lxml import etree
 import sys, operator, os
 from Wordplus_Parser import TetmlFile
 import contents_control # necessary for validating contents list
-from copy import deepcopy
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tools.page_ranges import write_page_ranges
+from tools.tetml_cache import TetmlCache, DEFAULT_CACHE_DIR, content_hash
+from itertools import groupby
 import argparse
+import bisect
+import multiprocessing
+import traceback
 import time
 import re
 
@@ -20,52 +26,118 @@ ap.add_argument("-i", "--input",  required=True, help="TETML input file")
 
 ap.add_argument("-wc", "--without_control", required=False, default=False, action="store_true", help="whether article headings should be confirmed manually")
 
-args = ap.parse_args()
+ap.add_argument("-at", "--auto_threshold", required=False, default=0.8, type=float, help="minimum share of title character trigrams found on the target page for a contents pair to be validated without prompting. Values above 1 prompt for every pair.")
+
+ap.add_argument("-pr", "--page_ranges", required=False, default=False, action="store_true", help="write article ids, titles and page ranges only, the pages are read from the TETML file by the later pipeline stages")
+
+ap.add_argument("-c", "--cache", required=False, default=None, nargs="?", const=DEFAULT_CACHE_DIR, help="cache parsed TETML files in this directory (default: $HORIZONTE_TETML_CACHE or ~/.cache/horizonte_tetml), so that later runs over the same issue load faster")
+
+ap.add_argument("-j", "--jobs", required=False, default=1, type=int, help="number of worker processes for a directory of TETML files. With more than one job, files are processed without manual control.")
 
 ##############################################################################
 
+def assign_pages(pages, starts):
+    """Assigns pages to articles by a sorted range lookup. Article i covers pages starts[i] to starts[i+1]-1, the last article only its first page.
+        Args: pages in page order, sorted list of first page numbers of the articles
+        Yields: (article index, page element) in page order
+        """
+    last = len(starts)-1
+
+    for page in pages:
+        try:
+            num = int(page.attrib["number"])
+        except KeyError: # page has no attrib "number"
+            continue
+
+        i = bisect.bisect_right(starts, num)-1
+        if i < 0 or (i == last and num != starts[last]):
+            continue
+
+        yield i, page
+
 def add_article_boundaries(tetml_obj, content_list):
     """Creates new XML file with article boundaries.
-        Args: tetml_obj from Wordplus_Parser, content_list (manually validated or automatically extracted)
+        Pages are walked once in page order and streamed into their Article elements, each page is cleared once written.
+        Neither the output tree nor copies of the pages are built, but the pages come from tetml_obj, which holds the parsed
+        TETML file until then: memory is bounded by the input tree, not by one page. The pages written are left empty.
+        Args: tetml_obj from Wordplus_Parser, content_list (manually validated or automatically extracted), sorted by page number
         Effects: New XML file
         """
 
     outfile = tetml_obj.filename + "_NNS_article_boundaries.xml"
 
-    outtree = etree.Element("Document", attrib={"document_id": outfile})
+    starts = [num for num, title in content_list]
+    pages = tetml_obj.get_page_range(starts[0], starts[-1]+1) if starts else []
+
+    def article_attrib(i):
+        return {"article_id": "a"+str(i+1), "title": content_list[i][1]}
+
+    with open(outfile, "wb") as outf, etree.xmlfile(outf, encoding="UTF-8") as xf:
+        xf.write_declaration()
+
+        with xf.element("Document", attrib={"document_id": outfile}):
+            xf.write("\n")
+
+            next_article = 0
+
+            for i, group in groupby(assign_pages(pages, starts), key=operator.itemgetter(0)):
+                # articles without pages of their own
+                for j in range(next_article, i):
+                    xf.write("  ", etree.Element("Article", attrib=article_attrib(j)), "\n")
+
+                xf.write("  ")
+                with xf.element("Article", attrib=article_attrib(i)):
+                    xf.write("\n")
+                    for _, page in group:
+                        page.tail = None
+                        etree.indent(page, level=2)
+                        xf.write("    ", page, "\n")
+                        page.clear()
+                    xf.write("  ")
+                xf.write("\n")
+
+                next_article = i+1
+
+            for j in range(next_article, len(content_list)):
+                xf.write("  ", etree.Element("Article", attrib=article_attrib(j)), "\n")
+
+        xf.flush()
+        outf.write(b"\n")
+
+    c = len(content_list)
+
+    print("{} article boundaries created in {}.".format(c, outfile))
+
+    return c
+
+def add_page_ranges(tetml_obj, content_list, tetml_file):
+    """Creates new page range file with article boundaries, which references the TETML file instead of copying its pages (see tools/page_ranges.py).
+        Args: tetml_obj from Wordplus_Parser, content_list (manually validated or automatically extracted), sorted by page number, path to the TETML file
+        Effects: New XML file
+        """
+
+    outfile = tetml_obj.filename + "_NNS_article_boundaries.xml"
 
-    c = 0
+    articles = []
 
     for i, (num, title) in enumerate(content_list):
         if i != len(content_list)-1: # not last item in list
-            # get list of page numbers for a given article
-            # print(content_list)
-            x = [d for d in range(content_list[i][0], content_list[i+1][0])]
+            first, last = num, content_list[i+1][0]-1
         else:
-            x = [content_list[-1][0]]
-
-        # create article element in outtree
-        article_elem = etree.SubElement(outtree, "Article", attrib={"article_id": "a"+str(i+1), "title": title})
+            first, last = num, num
 
-        c += 1
+        if last < first: # next article starts on the same page
+            first, last = None, None
 
-        for l in x:
-            # for each page number relevant to an article, add the page elements to the article element.
-            for _, elem in etree.iterwalk(tetml_obj.tetml, tag="Page"):
+        articles.append(({"article_id": "a"+str(i+1), "title": title}, first, last))
 
-                try:
-                    if int(elem.attrib["number"]) == l:
-                        article_elem.append(deepcopy(elem))
-                        elem.clear()
-                except KeyError: # page has no attrib "number"
-                    pass
+    write_page_ranges(outfile, tetml_file, outfile, articles)
 
-    outtree = etree.ElementTree(outtree)
+    c = len(content_list)
 
-    # for some reason, \n is missing after the Article SubElements.
-    outtree.write(open(outfile, 'wb'), pretty_print=True, xml_declaration=True, encoding="utf-8")
+    print("{} article page ranges created in {}.".format(c, outfile))
 
-    print("{} article boundaries created in {}.".format(c, outfile))
+    return c
 
 def write_contents(contents, filename):
     now = time.localtime(time.time())
@@ -78,8 +150,15 @@ def write_contents(contents, filename):
         for i in contents:
             outf.write("{}\t{}\n".format(i[0], i[1]))
 
-def process_file(file, without_control):
-    tetml = TetmlFile(file)
+def process_file(file, without_control, auto_threshold=0.8, page_ranges=False, cache_dir=None):
+    """Extracts the contents of a TETML file and writes its article boundaries.
+        With without_control, nothing is prompted, page offsets included.
+        Returns: number of articles
+        """
+    cache = TetmlCache(cache_dir) if cache_dir else None
+    # hashed once for both the cache key and the validation journal
+    digest = content_hash(file) if cache or not without_control else None
+    tetml = TetmlFile(file, cache, digest)
     # get issue number from filename
     issue_num = int(re.search("_(\d\d\d?)_[de|en|fr]", tetml.filename).group(1))
     # if issue number is 96+ process as a NEW issue.
@@ -89,28 +168,70 @@ def process_file(file, without_control):
     # if issue number is 81 - 95 process as a MID issue.
     elif issue_num < 96 and issue_num > 80:
         print("Processing MID issue...")
-        contents = tetml.parse_contents_MID()
+        contents = tetml.parse_contents_MID(interactive=not without_control)
     # otherwise, process as an OLD issue.
     else:
         print("Processing OLD issue...")
-        contents = tetml.parse_contents_OLD()
+        contents = tetml.parse_contents_OLD(interactive=not without_control)
 
     if without_control == True: # process contents without validating manually
-        add_article_boundaries(tetml, contents)
+        validated_contents = contents
     else:
-        validated_contents = contents_control.check_inventory(contents, tetml.filename)
+        index = contents_control.PageNgramIndex(tetml)
+        journal = contents_control.ValidationJournal(tetml.filename + "_validation_journal.jsonl", digest)
+        validated_contents = contents_control.check_inventory(contents, tetml.filename, index, auto_threshold, journal)
         write_contents(validated_contents, tetml.filename)
-        add_article_boundaries(tetml, validated_contents)
+
+    if page_ranges:
+        return add_page_ranges(tetml, validated_contents, file)
+    else:
+        return add_article_boundaries(tetml, validated_contents)
+
+def _batch_worker(task):
+    """Processes one file of a batch without manual control. Errors are caught so that they do not stop the other files.
+        Returns: (file, number of articles or None, error message or None)
+        """
+    file, auto_threshold, page_ranges, cache_dir = task
+    try:
+        return file, process_file(file, True, auto_threshold, page_ranges, cache_dir), None
+    except Exception:
+        return file, None, traceback.format_exc()
+
+def process_batch(files, jobs, auto_threshold=0.8, page_ranges=False, cache_dir=None):
+    """Processes TETML files in a pool of worker processes without manual control and prints a summary.
+        Output files are named after their input files, as in process_file.
+        Returns: list of (file, number of articles or None, error message or None) in the order of files
+        """
+    tasks = [(f, auto_threshold, page_ranges, cache_dir) for f in files]
+
+    with multiprocessing.Pool(jobs) as pool:
+        results = pool.map(_batch_worker, tasks, chunksize=1)
+
+    print("\n## Summary")
+    for file, c, error in results:
+        if error is None:
+            print("{}\t{} articles".format(os.path.basename(file), c))
+        else:
+            print("{}\tFAILED\n{}".format(os.path.basename(file), error))
+
+    failed = sum(1 for _, _, error in results if error is not None)
+    print("{} files processed, {} articles found, {} failed.".format(len(results)-failed, sum(c for _, c, _ in results if c), failed))
+
+    return results
 
 def main(args):
     if os.path.isdir(args.input):
         filepath = args.input
-        for f in os.listdir(filepath):
-            wordplus_tetml = os.path.join(filepath, f)
-            process_file(wordplus_tetml, args.without_control)
+        files = [os.path.join(filepath, f) for f in sorted(os.listdir(filepath)) if f.endswith(".tetml")]
+        if args.jobs > 1:
+            process_batch(files, args.jobs, args.auto_threshold, args.page_ranges, args.cache)
+        else:
+            for wordplus_tetml in files:
+                process_file(wordplus_tetml, args.without_control, args.auto_threshold, args.page_ranges, args.cache)
     else:
-        process_file(args.input, args.without_control)
+        process_file(args.input, args.without_control, args.auto_threshold, args.page_ranges, args.cache)
 
 
 if __name__ == "__main__":
+    args = ap.parse_args()
     main(args)
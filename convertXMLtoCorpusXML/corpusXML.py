@@ -18,8 +18,12 @@ from lxml import etree
 import langdetect # language identification
 import Cutter # https://pub.cl.uzh.ch/wiki/public/cutter/start
 import treetaggerwrapper as TT # https://treetaggerwrapper.readthedocs.io/en/latest/
-from subprocess import call
 import time
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tools.xml_writer import write_xml
 
 ###############################################################################
 
@@ -231,10 +235,8 @@ def write_output(tree, outfile):
     :output_file: output file for writing (file_object)
     """
     # tree_element = etree.ElementTree(tree)
-    tree.write(outfile, pretty_print=True, xml_declaration=True, encoding="utf-8")
-
-    call(["xmllint", "--format", outfile, "--output", outfile[:-4]+".tmp.xml", "--encode", "utf-8"])
-    call(["mv", outfile[:-4]+".tmp.xml", outfile])
+    # formatted as by xmllint --format and written atomically
+    write_xml(tree, outfile)
 
 def main():
 
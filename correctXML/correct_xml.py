@@ -5,12 +5,13 @@
 # Horizonte SNF PDF Corpus
 
 ###############################################################################
-## To run: python3 correct_xml.py [input xml] [directory path for output]
-## For efficient processing of multiple files, use a bash loop
-## for f in /Users/tannon/switchdrive/Horizonte/SNF_xml_files/horizonte_validated_article_boundaries/en/*.xml; do python3 merge_broken_xml_paras_v5.py $f merged_para_xmls_en/; done
+## To run: python3 correct_xml.py -i [input xml files, directories or globs] -o [directory path for output]
+## e.g. python3 correct_xml.py -i /Users/tannon/switchdrive/Horizonte/SNF_xml_files/horizonte_validated_article_boundaries/en/ -o merged_para_xmls_en/ -j 4
+## Multiple files are processed in one interpreter, with -j in a pool of worker processes,
+## one file per worker, or with -a one article per worker, as articles are corrected independently.
+## The old call python3 correct_xml.py [input xml] [directory path for output] still works.
 ###############################################################################
 
-from subprocess import call
 from lxml import etree
 from copy import deepcopy
 from collections import Counter
@@ -18,36 +19,60 @@ import sys
 import re
 import os
 import math
-from pre_noun_words_de import pre_noun_words
-
-final_punctuation = ['.', '?', '!', '…']
-
-def denoise(article_tag):
+import io
+import glob
+import time
+import argparse
+import contextlib
+import multiprocessing
+import traceback
+import bisect
+from para_features import ParaFeatures
+from merge_trace import MergeTrace, NULL_TRACE, RULE_DROPCAP, RULE_DENOISE, RULE_CONSECUTIVE, RULE_SKIP, RULE_ODD_DROPCAP
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tools.glyph_layer import GlyphLayer
+from tools.page_numbers import PageNumberMap
+from tools.xml_writer import write_xml
+from tools import page_ranges
+
+
+def denoise(article_tag, words=None, prepass=None, trace=NULL_TRACE):
     """
     Removes noisey text from paragraphs and if necessary entire paragraph elements.
 
     Args:
         article_tag (_Element): article element for processing
+        words (GlyphLayer): precomputed glyph attributes for the article
+        prepass (ArticlePrepass): if given, only the noise tokens found by the prepass and the words refreshed since are checked
+        trace (MergeTrace): records every word removed
     """
 
+    if words is None:
+        words = GlyphLayer(article_tag)
+
     c = 0
     denoised = []
 
-    paras = article_tag.xpath(".//Para")
-
-    for i, para in enumerate(paras):
-        tokens = para.xpath(".//Text")
-
-        for token in tokens:
-            if token != None:
-                # print(token.text)
-                glyph_info = token.getnext().xpath('./Glyph')[0]
-                # print(glyph_info.tag)
-                if float(glyph_info.attrib["size"]) < 8.00 or ("alpha" in glyph_info.attrib and "beta" in glyph_info.attrib):
-                    word_elem = token.getparent()
-                    denoised.append(token.text)
-                    word_elem.getparent().remove(word_elem)
-                    c += 1
+    if prepass is not None:
+        # paragraphs removed since the prepass, e.g. merged dropcaps, are left alone
+        paras = [para for para in prepass.paras if para.getparent() is not None]
+        tokens = [token for token in dict.fromkeys(prepass.noise_tokens + prepass.refreshed) if next(token.iterancestors("Para")).getparent() is not None]
+    else:
+        paras = article_tag.xpath(".//Para")
+        tokens = [token for para in paras for token in para.xpath(".//Text")]
+
+    for token in tokens:
+        if token != None:
+            # print(token.text)
+            word_info = words[token]
+            if word_info.size < 8.00 or word_info.hidden:
+                if trace.enabled:
+                    trace.record(RULE_DENOISE, article_tag, [token], words)
+                word_elem = token.getparent()
+                denoised.append(token.text)
+                word_elem.getparent().remove(word_elem)
+                c += 1
 
     for i, para in enumerate(paras):
         if len(para.getchildren()) == 0:
@@ -60,12 +85,13 @@ def denoise(article_tag):
 
     return article_tag
 
-def inspect_next_para(p):
+def inspect_next_para(p, words):
     """
     Performs a lookahead opertaion on given p argument
 
     Args:
         p (_Element): paragraph node
+        words (GlyphLayer): precomputed glyph attributes for the article
 
     Returns:
         para_initial (string): first word of paragraph
@@ -74,8 +100,8 @@ def inspect_next_para(p):
     """
     try:
         para_initial = p.xpath(".//Text")[0]
-        font = int(para_initial.getnext().xpath("Glyph/@font")[0][1:])
-        size = float(para_initial.getnext().xpath("Glyph/@size")[0])
+        font = words[para_initial].font
+        size = words[para_initial].size
         return para_initial, font, size
     except IndexError:
         return None, None, None
@@ -95,48 +121,81 @@ def merge_para_elems(elem1, elem2):
         elem1.append(e)
     return elem1
 
-def merge_dropcaps(article_tag, verbose=True):
+def dropcap_paras(paras):
+    """
+    Finds the paragraphs consisting of a single dropcap glyph.
+
+    Args:
+        paras (list): paragraph elements in document order
+
+    Returns:
+        indices (list): indices into paras
+    """
+    indices = []
+    for i, para in enumerate(paras):
+        para_glyphs = para.xpath(".//Glyph")
+        if len(para_glyphs) == 1 and para_glyphs[0].get("dropcap") == "true":
+            indices.append(i)
+    return indices
+
+def merge_dropcaps(article_tag, words=None, verbose=False, prepass=None, trace=NULL_TRACE):
     """
     Finds loose dropcaps and appends them to the following word.
 
     Args:
         article_tag (_Element): article element for processing
+        words (GlyphLayer): precomputed glyph attributes for the article, updated for the words receiving a dropcap
+        verbose (bool): if set to True, merges found are printed to stdout
+        prepass (ArticlePrepass): if given, its paragraphs and dropcap paragraphs are used and the words receiving a dropcap are added to its refreshed words
+        trace (MergeTrace): records every dropcap merged
     """
 
-    paras = article_tag.xpath(".//Para")
+    if words is None:
+        words = GlyphLayer(article_tag)
 
-    for i, para in enumerate(paras):
-        para_glyphs = para.xpath(".//Glyph")
+    if prepass is not None:
+        paras = prepass.paras
+        candidates = prepass.dropcap_paras
+    else:
+        paras = article_tag.xpath(".//Para")
+        candidates = dropcap_paras(paras)
 
-        if i < len(paras)-1 and len(para_glyphs) == 1:
-            try:
-                if para_glyphs[0].attrib["dropcap"] == "true":
+    merged = None # index of the last paragraph merged with its successor
 
-                    dropcap_char = para_glyphs[0]
-                    # get following paragraph elem for manipulation
-                    follow_para = paras[i+1]
-                    # get the first word of para
-                    para_initial = follow_para.xpath("./Word/Text")[0]
-                    # list of glyph elements in first word of following para
+    for i in candidates:
+        para = paras[i]
 
-                    para_initial_glyphs = para_initial.getnext().xpath("./Glyph")
-                    # insert the dropcap glyph element into list
-                    para_initial.getnext().insert(0, dropcap_char) # gets 'Box' element of first word and inserts the dropcap character element into the first position.
+        # the last paragraph has no successor, and a paragraph which has just received a dropcap has two glyphs
+        if i >= len(paras)-1 or merged == i-1:
+            continue
 
-                    # replace the text of the first word in para
-                    para_initial.text = dropcap_char.text + para_initial.text
+        dropcap_char = para.find(".//Glyph")
+        # get following paragraph elem for manipulation
+        follow_para = paras[i+1]
+        # get the first word of para
+        para_initial = follow_para.xpath("./Word/Text")[0]
 
-                    # remove the paragraph containing only the dropcap character
-                    para.getparent().remove(para)
+        # insert the dropcap glyph element into list
+        para_initial.getnext().insert(0, dropcap_char) # gets 'Box' element of first word and inserts the dropcap character element into the first position.
 
-                    if verbose:
+        # replace the text of the first word in para
+        para_initial.text = dropcap_char.text + para_initial.text
+        words.refresh(para_initial)
+        if prepass is not None:
+            prepass.refreshed.append(para_initial)
 
-                        new_para_text = [t.text for t in paras[i+1].xpath(".//Text")]
+        # remove the paragraph containing only the dropcap character
+        para.getparent().remove(para)
+        merged = i
 
-                        print("Dropcap merged in {}, '{}', p. {}: {}".format(article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"], ' '.join(new_para_text[:5])))
+        if trace.enabled:
+            trace.record(RULE_DROPCAP, article_tag, [para_initial], words)
 
-            except KeyError:
-                pass
+        if verbose:
+
+            new_para_text = [t.text for t in paras[i+1].xpath(".//Text")]
+
+            print("Dropcap merged in {}, '{}', p. {}: {}".format(article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"], ' '.join(new_para_text[:5])))
 
     return article_tag
 
@@ -151,41 +210,43 @@ def mark_potential_errors(article_tag):
     article_tag.attrib["potential_errors"] = "true"
     return article_tag
 
-def check_for_odd_dropcaps(article_tag):
+def check_for_odd_dropcaps(article_tag, features=None, trace=NULL_TRACE):
     """
     If a dropcap doesn't occur in the first 5 paragraphs of an article, but does occur elsewhere, the article is marked for potential errors.
+    Only the first paragraph starting with a dropcap matters.
 
     Args:
         article_tag (_Element): article element for processing
+        features (ParaFeatures): feature table of the paragraphs of the article, read instead of the paragraphs
+        trace (MergeTrace): records the article if it is marked, with the initial word of the first dropcap paragraph (only with features)
     """
 
-    pages = article_tag.xpath(".//Page")
-
-    for page in pages:
-        paras = article_tag.xpath(".//Para")
-
-        odd_dropcap_found = False
-
-        for i, para in enumerate(paras):
-            para_initial_glyph = para.xpath('./Word/Box/Glyph')[0]
-
-            try:
-                if para_initial_glyph.attrib["dropcap"] == "true" and i <= 5:
-                    # A dropcap appears in the first 5 paragraphs, so it's ok
-                    return article_tag
-
-                elif para_initial_glyph.attrib["dropcap"] == "true" and i > 5:
-                    # there's no dropcap in the first five paras, mark as potential error
-                    article_tag = mark_potential_errors(article_tag)
-
-            except KeyError:
-                pass
+    if article_tag.find(".//Page") is None:
+        return article_tag
+
+    if features is not None:
+        initial_dropcaps = [features.initial_dropcap[r] for r in live_rows(features)]
+    else:
+        initial_dropcaps = [para.xpath('./Word/Box/Glyph')[0].get("dropcap") == "true" for para in article_tag.xpath(".//Para")]
+
+    for i, dropcap in enumerate(initial_dropcaps):
+        if dropcap:
+            if i > 5:
+                # there's no dropcap in the first five paras, mark as potential error
+                article_tag = mark_potential_errors(article_tag)
+                if trace.enabled and features is not None:
+                    trace.record(RULE_ODD_DROPCAP, article_tag, [features.initial[live_rows(features)[i]]], features.words)
+            # otherwise a dropcap appears in the first 5 paragraphs, so it's ok
+            return article_tag
 
     return article_tag
 
-def consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=False):
+def consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=False, words=None, features=None, trace=NULL_TRACE):
     """
-    Performs consecutive paragraph merging.
+    Performs consecutive paragraph merging in a single pass over the paragraphs.
+    The rule is evaluated for all neighbouring paragraphs at once into a mask. After a merge, only the mask entry
+    of the merged paragraph and its new successor is recomputed, and the merged paragraph is checked again.
+    Paragraphs before it cannot become mergeable, since a merge only changes the final word of the merged paragraph.
 
     Args:
         article_tag (_Element): article element for processing
@@ -194,122 +255,46 @@ def consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbo
         main_font (int): most common font number for relevant article
         main_size (float): most common font size for relevant article
         verbose (bool): if set to True, merges found are printed to stdout
+        words (GlyphLayer): precomputed glyph attributes for the article
+        features (ParaFeatures): feature table of the paragraphs of the article, updated with every merge
+        trace (MergeTrace): records every merge
 
     Returns:
         article_tag (_Element): article element containining merged paragraphs
     """
-    paras = article_tag.xpath(".//Para")
+    if features is None:
+        features = article_features(article_tag, lang, page_nums, main_font, main_size, words)
 
-    for i, para in enumerate(paras):
+    rows = live_rows(features)
+    mask = features.mask(features.consecutive, 1, rows)
 
-        eligible = False
+    i = 0
 
-        if i != len(paras)-1:
+    while i < len(mask):
 
-            try:
-                para_final = para.xpath(".//Text")[-1] # get final word of para
-                para_final_token = para_final.text
-                current_font = int(para_final.getnext().xpath("Glyph/@font")[0][1:]) # get font style of final word (as integer)
-                current_size = float(para_final.getnext().xpath("Glyph/@size")[0]) # get size of final word
-            except IndexError:
-                continue
+        if not mask[i]:
+            i += 1
+            continue
 
-            # ignore None values
-            if not para_final.text:
-                # print(para_final.text)
-                continue
+        r1, r2 = rows[i], rows[i+1]
 
-            # ignore paras with fontsize smaller than 8.00
-            elif current_size < 8.00:
-                continue
+        # merge matching paragraphs
+        if verbose:
+            print("Consecutive merge found in {}, '{}', p. {}:".format(article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"]), features.final[r1].text, features.initial[r2].text)
+        if trace.enabled:
+            trace.record(RULE_CONSECUTIVE, article_tag, [features.final[r1], features.initial[r2]], features.words)
 
-            # 'Vor Ort : Die Stärke...', p. 33: Asmara Addis (Hidden text)
-            elif "alpha" in para_final.getnext().xpath('./Glyph')[0].attrib and "beta" in para_final.getnext().xpath('./Glyph')[0].attrib:
-                continue
+        merge_rows(features, r1, r2)
 
-            # ignore page numbers
-            # ignore page numbers
-            elif para_final.text.isdigit():
-                try:
-                    if int(para_final.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
-                        eligible = False
-                        continue
-                    else:
-                        eligible = True
-
-                except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
-                    continue
-
-            # if the final paragraph char is punctuation, check to see if it's sentence final. If not, paragraph is eligible for merge.
-            elif not para_final.text.isalpha():
-                for char in para_final.text.strip():
-                    if char in final_punctuation:
-                        eligible = False
-                        break
-                    else:
-                        eligible = True
+        # the merged paragraph stays at i and is compared with its new successor
+        del rows[i+1]
+        del mask[i]
+        if i < len(mask):
+            mask[i] = features.consecutive(rows[i], rows[i+1])
 
-            else:
-                eligible = True
-
-            if eligible == True:
-
-                eligible = False
-
-                # check the initial word of following paragraph for font size and style.
-                para_initial, fol_font, fol_size = inspect_next_para(paras[i+1])
-
-                # if the following paragraph is no good, don't merge
-                if para_initial is None:
-                    continue
-
-                # if the following paragraph starts with a potential page number, don't merge
-                elif para_initial.text.isdigit():
-                    try:
-                        if int(para_initial.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
-                            eligible = False
-                            continue
-                        else:
-                            eligible = True
-                    except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
-                        continue
-
-                # avoid consecutive merges is initial word is capitalised in EN and FR '• A rapist The general' --> No merge. But "L ' Aucun" --> merge.
-                elif lang != 'de' and (para_final.text.isalpha() or para_final.text.isdigit()) and para_initial.text[0].isupper():
-                    # print("******************", para_final.text, para_initial.text, article_tag.attrib["article_id"])
-                    continue
-
-                # otherwise, perform merge and call the function again
-                else:
-                    eligible = True
-
-                if eligible == True:
-                    if current_font == fol_font and current_size == fol_size:
-
-                        # merge matching paragraphs
-                        if verbose:
-                            print("Consecutive merge found in {}, '{}', p. {}:".format(article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"]), para_final.text, para_initial.text)
-
-                        p1 = para_final.getparent().getparent()
-                        p2 = para_initial.getparent().getparent()
-                        merged = merge_para_elems(p1, p2)
-                        p1.getparent().replace(p1, merged)
-                        p2.getparent().remove(p2)
-
-                        if verbose:
-                            consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=True)
-                        else:
-                            consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=False)
-                    else:
-                        continue
-            # else:
-            #     continue
-
-        # if no more merges are to be performed, return the updated article elem
-        else:
-            return article_tag
+    return article_tag
 
-def skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=False):
+def skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=False, words=None, features=None, trace=NULL_TRACE):
     """
     Performs skip paragraph merging.
 
@@ -321,125 +306,158 @@ def skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verb
         n_skip (int): number of paragraphs to skip
         page_nums (set): set of relevant page numbers for the article which will be ignored when merging
         verbose (bool): if set to True, merges found are printed to stdout
+        words (GlyphLayer): precomputed glyph attributes for the article
+        features (ParaFeatures): feature table of the paragraphs of the article, updated with every merge
+        trace (MergeTrace): records every merge
 
     Returns:
         article_tag (_Element): article element containining merged paragraphs
     """
+    return multi_skip_merger(article_tag, lang, page_nums, main_font, main_size, [n_skip], verbose, words, features, trace)
 
-    paras = article_tag.xpath(".//Para")
+def multi_skip_merger(article_tag, lang, page_nums, main_font, main_size, skips=range(1, 8), verbose=False, words=None, features=None, trace=NULL_TRACE):
+    """
+    Performs skip paragraph merging for several numbers of skipped paragraphs in turn, with the same result as
+    calling skip_merger for each of them. The merge rules are evaluated on the feature table of the paragraphs,
+    which is updated with every merge instead of querying the paragraphs again with XPath.
 
-    for i, para in enumerate(paras):
+    Each number of skipped paragraphs is processed as a series of scans instead of recursive calls: after a merge,
+    a new scan of the current paragraphs starts, and when it ends, the interrupted scan resumes on its own, older
+    paragraph list, as the recursive calls did. A new scan starts at the first paragraph whose partner paragraph
+    is affected by the merge, since all pairs before it were already checked without result.
 
-        eligible = False
+    The rule is evaluated into a mask for all pairs of the current paragraphs once per number of skipped paragraphs,
+    each scan takes a copy. After a merge, only the entries of the merged paragraphs and of the pairs spanning the
+    removed paragraph are recomputed, in the mask of the current paragraphs and in the masks of the interrupted scans.
 
-        # ensure there are enough paragraph elements in article
-        if i != len(paras)-(n_skip+1) and len(paras) > n_skip:
-            try:
-                para_final = para.xpath(".//Text")[-1] # get final word of para
-                current_font = int(para_final.getnext().xpath("Glyph/@font")[0][1:]) # get font style of final word (as integer)
-                current_size = float(para_final.getnext().xpath("Glyph/@size")[0]) # get size of final word
+    Args:
+        article_tag (_Element): article element for processing
+        lang (string): language code of relevant article, e.g. de, en or fr
+        page_nums (set): set of relevant page numbers for the article which will be ignored when merging
+        main_font (int): most common font number for relevant article
+        main_size (float): most common font size for relevant article
+        skips (iterable): numbers of paragraphs to skip, in processing order
+        verbose (bool): if set to True, merges found are printed to stdout
+        words (GlyphLayer): precomputed glyph attributes for the article
+        features (ParaFeatures): feature table of the paragraphs of the article, updated with every merge
+        trace (MergeTrace): records every merge
 
-            except IndexError:
-                continue
+    Returns:
+        article_tag (_Element): article element containining merged paragraphs
+    """
+    if features is None:
+        features = article_features(article_tag, lang, page_nums, main_font, main_size, words)
 
-            if not para_final.text:
-                continue
+    rows = live_rows(features)
 
-            # ignore paras with fontsize smaller than 8.00
-            elif current_size < 8.00:
-                continue
+    for n_skip in skips:
+
+        distance = n_skip+1
+
+        # mask of the pairs of the current paragraphs
+        mask = features.mask(features.skip, distance, rows)
+
+        # scans as (row list, mask, next index)
+        scans = [[list(rows), bytearray(mask), 0]]
 
-            # ignore paras with font not equal to main size or main font
-            elif current_font != main_font or current_size != main_size:
-            #     "********* Caught with font and size conditions ********"
+        while scans:
+            scan = scans[-1]
+            scan_rows, scan_mask, i = scan
+
+            # ensure there are enough paragraph elements in article
+            if i >= len(scan_mask):
+                scans.pop()
                 continue
 
-            # ignore page numbers
-            elif para_final.text.isdigit():
-                try:
-                    if int(para_final.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
-                        eligible = False
-                        continue
-                    else:
-                        eligible = True
-
-                except ValueError:
-                    continue
-
-            # if the final paragraph char is punctuation, check to see if it's sentence final. If not, paragraph is eligible for merge.
-            elif not para_final.text.isalpha():
-                for char in para_final.text.strip():
-                    if char in final_punctuation:
-                        eligible = False
-                        break
-                    else:
-                        eligible = True
+            scan[2] = i+1
 
-            else:
-                eligible = True
+            if not scan_mask[i]:
+                continue
 
-            if eligible == True:
+            r1, r2 = scan_rows[i], scan_rows[i+distance]
 
-                # check the initial word of following paragraph for fontsize. If matches, merge
-                para_initial, fol_font, fol_size = inspect_next_para(paras[i+(n_skip+1)])
+            # merge matching paragraphs
+            if verbose:
+                print("{}-skip merge found in {}, '{}', p. {}:".format(n_skip, article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"]), features.final[r1].text, features.initial[r2].text)
+            if trace.enabled:
+                trace.record(RULE_SKIP.format(n_skip), article_tag, [features.final[r1], features.initial[r2]], features.words)
 
-                if para_initial is None: # if the following paragraph is not good, no merge
-                    continue
+            merge_rows(features, r1, r2)
 
-                # if the following paragraph starts with a potential page number, don't merge
-                elif para_initial.text.isdigit():
-                    try:
-                        if int(para_initial.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
-                            eligible = False
-                            continue
-                        else:
-                            eligible = True
-                    except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
-                        continue
+            r2_index = rows.index(r2)
+            del rows[r2_index]
 
-                # Special handling for contents page: don't merge paras if following paragraph starts with an assumed page number
-                elif article_tag.attrib['title'] == "Inhalt/Sommaire/Contents" and para_initial.text.isdigit():
-                    continue
+            # pairs after the removed paragraph move up, pairs spanning it and the pair of the merged paragraph change
+            del mask[r2_index:r2_index+1]
+            del mask[max(0, len(rows)-distance):]
+            for j in range(max(0, r2_index-distance), min(r2_index, len(mask))):
+                mask[j] = features.skip(rows[j], rows[j+distance])
+            update_mask(features, rows, mask, distance, r1)
 
-                # avoid catching titles where words are capitalised in English and French.
-                elif lang != "de" and para_final.text[0].isupper() and para_initial.text[0].isupper():
-                    continue
+            # the interrupted scans keep their paragraphs, only the entries of the merged paragraphs change
+            for scan_rows, scan_mask, _ in scans:
+                update_mask(features, scan_rows, scan_mask, distance, r1, r2)
 
-                # avoid consecutive merges is initial word is capitalised in EN and FR '• A rapist The general' --> No merge. But "L ' Aucun" --> merge.
-                elif lang != 'de' and (para_final.text.isalpha() or para_final.text.isdigit()) and para_initial.text[0].isupper():
-                    # print("******************", para_final.text, para_initial.text, article_tag.attrib["article_id"])
-                    continue
+            scans.append([list(rows), bytearray(mask), max(0, r2_index-distance)])
 
-                # Special handling for DE: if the final word of a paragraph is in list of pre_noun_words (common articles and prepositions) a marge is permitted.
-                elif lang == "de" and para_initial.text[0].isupper() and  para_final.text.lower() not in pre_noun_words:
-                    continue
+    return article_tag
 
-                else:
-                    eligible = True
+def update_mask(features, rows, mask, distance, *changed):
+    """
+    Recomputes the skip mask entries of the pairs of rows starting or ending at one of the changed rows.
 
-                if eligible == True:
-                    if current_font == fol_font and current_size == fol_size:
+    Args:
+        features (ParaFeatures): feature table of the paragraphs of the article
+        rows (list): rows in document order, the rows of the mask
+        mask (bytearray): mask[i] is 1 if rows[i] is to be merged with rows[i+distance]
+        distance (int): distance between the rows of a pair
+        changed (int): rows whose features changed
+    """
+    for r in changed:
+        i = bisect.bisect_left(rows, r)
+        if i == len(rows) or rows[i] != r:
+            continue
+        for j in (i, i-distance):
+            if 0 <= j < len(mask):
+                mask[j] = features.skip(rows[j], rows[j+distance])
+
+def article_features(article_tag, lang, page_nums, main_font, main_size, words=None, folios=None):
+    """
+    Builds the feature table of the paragraphs of an article.
 
-                        # merge matching paragraphs
-                        if verbose:
-                            print("{}-skip merge found in {}, '{}', p. {}:".format(n_skip, article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"]), para_final.text, para_initial.text)
+    Args:
+        article_tag (_Element): article element
+        lang (string): language code of relevant article, e.g. de, en or fr
+        page_nums (set): set of relevant page numbers for the article which will be ignored when merging
+        main_font (int): most common font number for relevant article
+        main_size (float): most common font size for relevant article
+        words (GlyphLayer): precomputed glyph attributes for the article
+        folios (PageNumberMap): printed page numbers of the document
 
-                        p1 = para_final.getparent().getparent()
-                        p2 = para_initial.getparent().getparent()
-                        merged = merge_para_elems(p1, p2)
-                        p1.getparent().replace(p1, merged)
-                        p2.getparent().remove(p2)
+    Returns:
+        features (ParaFeatures): feature table with a row for every paragraph of the article
+    """
+    if words is None:
+        words = GlyphLayer(article_tag)
+    return ParaFeatures(article_tag.xpath(".//Para"), lang, page_nums, article_tag.attrib["title"], main_font, main_size, words, folios)
 
-                        if verbose:
-                            skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=True)
-                        else:
-                            skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=False)
+def live_rows(features):
+    """
+    Returns the rows of the paragraphs which are still part of the article, in document order.
+    """
+    return [r for r, para in enumerate(features.paras) if para.getparent() is not None]
 
-                    else:
-                        continue
+def merge_rows(features, r1, r2):
+    """
+    Appends the paragraph of row r2 to the paragraph of row r1, removes it and updates the feature table.
+    The paragraph of r1 is merged in place; replacing it with itself would move its whole subtree on every merge.
+    """
+    p1 = features.final[r1].getparent().getparent()
+    p2 = features.initial[r2].getparent().getparent()
+    merge_para_elems(p1, p2)
+    p2.getparent().remove(p2)
 
-        else:
-            return article_tag
+    features.merge(r1, r2)
 
 def count_font_styles(elem):
     """
@@ -480,6 +498,79 @@ def collect_page_numbers(elem):
     # print(buffered_nums)
     return buffered_nums
 
+class ArticlePrepass(object):
+    """
+    Collects everything the correction steps need to know about an article in a single traversal:
+    main font and size (as count_font_styles), buffered page numbers (as collect_page_numbers),
+    glyph attributes of all words, paragraphs consisting of a single dropcap and the tokens to denoise.
+
+    Args:
+        article_tag (_Element): article element
+
+    Attributes:
+        main_font (int): most common font number for article element
+        main_size (float): most common font size for article element
+        page_nums (set): set of likely page numbers belonging to the article
+        words (GlyphLayer): glyph attributes of all words of the article
+        paras (list): paragraph elements in document order
+        dropcap_paras (list): indices into paras of paragraphs consisting of a single dropcap glyph
+        noise_tokens (list): Text elements in paragraphs with font size smaller than 8.00 or hidden text, in document order
+        refreshed (list): Text elements whose glyph attributes changed after the prepass, e.g. by merging a dropcap
+    """
+
+    def __init__(self, article_tag):
+        self.words = GlyphLayer()
+        self.page_nums = set()
+        self.paras = []
+        self.dropcap_paras = []
+        self.noise_tokens = []
+        self.refreshed = []
+
+        fonts_counter = Counter()
+        sizes_counter = Counter()
+
+        para = None
+        para_glyphs = 0
+        para_dropcap = False
+
+        for elem in article_tag.iter("Page", "Para", "Glyph", "Text"):
+            tag = elem.tag
+
+            if tag == "Glyph":
+                if "font" in elem.attrib:
+                    fonts_counter[elem.attrib["font"]] += 1
+                if "size" in elem.attrib:
+                    sizes_counter[elem.attrib["size"]] += 1
+                if para is not None:
+                    para_glyphs += 1
+                    if para_glyphs == 1:
+                        para_dropcap = elem.get("dropcap") == "true"
+
+            elif tag == "Text":
+                word_info = self.words.add(elem)
+                if para is not None and (word_info.size < 8.00 or word_info.hidden):
+                    self.noise_tokens.append(elem)
+
+            elif tag == "Para":
+                self._end_para(para, para_glyphs, para_dropcap)
+                para = elem
+                para_glyphs = 0
+                para_dropcap = False
+                self.paras.append(elem)
+
+            elif elem.getparent() is article_tag and "number" in elem.attrib: # Page
+                num = int(elem.attrib["number"])
+                self.page_nums.update((num, num+1, num-1))
+
+        self._end_para(para, para_glyphs, para_dropcap)
+
+        self.main_font = int(fonts_counter.most_common(1)[0][0][1:])
+        self.main_size = float(sizes_counter.most_common(1)[0][0])
+
+    def _end_para(self, para, para_glyphs, para_dropcap):
+        if para is not None and para_glyphs == 1 and para_dropcap:
+            self.dropcap_paras.append(len(self.paras)-1)
+
 def write_and_format_outfile(xml_file, out_tree, outpath):
     """Write and format output xml file
 
@@ -493,77 +584,251 @@ def write_and_format_outfile(xml_file, out_tree, outpath):
     """
     output_xml = os.path.join(outpath, "_".join(xml_file.split("/")[-1][:-4].split("_")[:4]) + "_corrected.xml")
 
-    out_tree.write(output_xml, pretty_print=True, encoding="utf-8")
-
-    call(["xmllint", "--format",output_xml,"--output", output_xml[:-3]+"format.xml","--encode","utf-8"])
-    call(["mv",output_xml[:-3]+"format.xml",output_xml])
+    # formatted as by xmllint --format and written atomically
+    write_xml(out_tree, output_xml)
 
 ###############################################################################
 
-def correct_xml(xml_file, outpath, verbose=True):
+def correct_article(article, lang, verbose=False, trace=NULL_TRACE, folios=None):
+    """
+    Processes a single article for corrections. Articles are independent of each other.
+
+    Args:
+        article (_Element): article element for processing
+        lang (string): language code of the article, e.g. de, en or fr
+        verbose (bool): if set to True, processing steps are printed to stdout
+        trace (MergeTrace): records the decisions taken
+        folios (PageNumberMap): printed page numbers of the document, computed from the pages of the article if not given
+
+    Returns:
+        merged_article (_Element): corrected article element
+    """
+
+    article.attrib["potential_errors"] = "false"
+
+    if folios is None:
+        folios = PageNumberMap(article.iter("Page"))
+
+    # main font and size, page numbers, glyph attributes, dropcaps and noise in one traversal
+    prepass = ArticlePrepass(article)
+
+    main_font, main_size = prepass.main_font, prepass.main_size
+
+    page_nums = prepass.page_nums
+
+    words = prepass.words
+
+    article = merge_dropcaps(article, words, verbose, prepass=prepass, trace=trace)
+
+    article = denoise(article, words, prepass=prepass, trace=trace)
+
+    # article = shift_dropcap_para(article) # attempt to fix first paragraph incorrectly extracted by tet
+
+    features = article_features(article, lang, page_nums, main_font, main_size, words, folios)
+
+    merged_article = consecutive_merger(article, lang, page_nums, main_font, main_size, verbose, words=words, features=features, trace=trace)
+
+    merged_article = multi_skip_merger(article, lang, page_nums, main_font, main_size, range(1, 8), verbose, words=words, features=features, trace=trace)
+
+    merged_article = check_for_odd_dropcaps(merged_article, features, trace)
+
+    return merged_article
+
+def _article_worker(task):
+    """
+    Corrects one serialised article in a worker process.
+
+    Returns:
+        (bytes, string, list): serialised corrected article, its captured stdout and its trace records
+    """
+    article_xml, lang, verbose, issue, traced, folio_offset = task
+    article = etree.fromstring(article_xml)
+    trace = MergeTrace(issue=issue) if traced else NULL_TRACE
+    # the offset of the printed page numbers is taken from the whole document, None if they were not located there
+    folios = PageNumberMap(article.iter("Page"), offset=folio_offset) if folio_offset is not None else PageNumberMap()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        merged_article = correct_article(article, lang, verbose, trace, folios)
+    return etree.tostring(merged_article, encoding="utf-8"), log.getvalue(), trace.records
+
+def correct_xml(xml_file, outpath, verbose=False, pool=None, trace=NULL_TRACE):
     """
     Reads in input xml file and processes for corrections, i.e. merging broken paragraphs
 
     Args:
-        xml_file (fileObject): input xml file for processing
+        xml_file (fileObject): input xml file (or page range file) for processing
         output (string): local file path for output file
         verbose (bool): if set to True, processing steps are printed to stdout
+        pool (Pool): if given, the articles are corrected in its worker processes
+        trace (MergeTrace): records the decisions taken, with the document id as issue
 
     """
-    in_tree = etree.parse(xml_file)
+    in_tree = page_ranges.parse(xml_file)
     root = in_tree.getroot()
 
     lang = re.search(r'(de|fr|en)', xml_file).group(1)
     # print(lang)
 
     # doc_id is expected to be 'horizonte_2005_66_de_NNS_article_boundaries.xml'
-    doc_id = root.attrib["document_id"].split('_')[:4]
+    doc_id = "_".join(root.attrib["document_id"].split('_')[:4])
 
     new_root = etree.Element(root.tag.lower())
     new_root.attrib["document_id"] = doc_id
 
+    if trace.enabled:
+        trace.issue = doc_id
+
     articles = root.xpath(".//Article")
 
-    for article in articles:
+    # printed page numbers, located once for the whole document
+    folios = PageNumberMap(root.iter("Page"))
+    folio_offset = folios.offset if folios.located else None
+
+    if pool is None:
+        for article in articles:
+            new_root.append(correct_article(article, lang, verbose, trace, folios))
+    else:
+        # articles are sent to the workers serialised and reassembled in document order, logs are printed in the same order
+        tasks = ((etree.tostring(article, encoding="utf-8", with_tail=False), lang, verbose, trace.issue, trace.enabled, folio_offset) for article in articles)
+        for article_xml, log, records in pool.imap(_article_worker, tasks, chunksize=1):
+            sys.stdout.write(log)
+            trace.extend(records)
+            new_root.append(etree.fromstring(article_xml))
 
-        article.attrib["potential_errors"] = "false"
+    out_tree = etree.ElementTree(new_root)
 
-        main_font, main_size = count_font_styles(article)
+    write_and_format_outfile(xml_file, out_tree, outpath)
 
-        page_nums = collect_page_numbers(article)
+###############################################################################
+###############################################################################
 
-        article = merge_dropcaps(article)
+def expand_inputs(inputs):
+    """
+    Expands input arguments to a list of input files. Directories are expanded to the xml files they contain, glob patterns to the matching files.
 
-        article = denoise(article)
+    Args:
+        inputs (list): paths to files or directories, or glob patterns
 
-        # article = shift_dropcap_para(article) # attempt to fix first paragraph incorrectly extracted by tet
+    Returns:
+        files (list): paths to input files, without duplicates
+    """
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".xml"))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path)))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
 
-        merged_article = consecutive_merger(article, lang, page_nums, main_font, main_size, verbose)
+def _file_worker(task):
+    """
+    Corrects one file in a worker process. Errors are caught so that they do not stop the other files.
 
-        for i in range(1,8):
-            merged_article = skip_merger(article, lang, page_nums, main_font, main_size, i, verbose)
+    Returns:
+        (string, string, float, string, list): input file, captured stdout, processing time, error message or None and trace records
+    """
+    xml_file, outpath, verbose, traced = task
+    start_time = time.time()
+    trace = MergeTrace() if traced else NULL_TRACE
+    log = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(log):
+        try:
+            correct_xml(xml_file, outpath, verbose, trace=trace)
+        except Exception:
+            error = traceback.format_exc()
+    return xml_file, log.getvalue(), time.time() - start_time, error, trace.records
+
+def process_batch(files, outpath, jobs, verbose=False, trace=NULL_TRACE):
+    """
+    Corrects files in a pool of worker processes, one file per worker, and prints their logs in the order of files.
 
-        merged_article = check_for_odd_dropcaps(merged_article)
+    Returns:
+        failed (list): input files which could not be processed
+    """
+    tasks = [(xml_file, outpath, verbose, trace.enabled) for xml_file in files]
+    failed = []
+
+    with multiprocessing.Pool(jobs) as pool:
+        for xml_file, log, elapsed_time, error, records in pool.imap(_file_worker, tasks, chunksize=1):
+            print("Processing {}".format(xml_file))
+            sys.stdout.write(log)
+            trace.extend(records)
+            if error is None:
+                print("\t{0} processed in {1:.2f} seconds\n".format(os.path.basename(xml_file), elapsed_time))
+            else:
+                print("\t{} FAILED\n{}".format(os.path.basename(xml_file), error))
+                failed.append(xml_file)
 
-        new_root.append(merged_article)
+    print("{} files processed, {} failed.".format(len(files)-len(failed), len(failed)))
 
-    out_tree = etree.ElementTree(new_root)
+    return failed
 
-    write_and_format_outfile(xml_file, out_tree, outpath)
+ap = argparse.ArgumentParser(description="Script for merging broken paragraphs in article boundary xml files for SNF Horizonte corpus.")
 
-###############################################################################
-###############################################################################
+ap.add_argument("files", nargs="*", help="[input xml] [directory path for output], as an alternative to -i and -o")
+
+ap.add_argument("-i", "--input", nargs="+", default=[], help="input xml or page range files, directories containing them or glob patterns")
+
+ap.add_argument("-o", "--outpath", required=False, default=None, help="path to directory for output files")
+
+ap.add_argument("-j", "--jobs", required=False, default=1, type=int, help="number of worker processes")
+
+ap.add_argument("-a", "--articles", required=False, default=False, action="store_true", help="process the articles of each file in the worker processes, instead of one file per worker. Useful for a few large files.")
+
+ap.add_argument("-v", "--verbose", required=False, default=False, action="store_true", help="print the merges to stdout")
 
-def main():
-    xml_file = sys.argv[1]
-    outpath = sys.argv[2]
+ap.add_argument("-t", "--trace", required=False, default=None, nargs="?", const=os.devnull, help="write every decision (merges, dropcaps, denoised words, marked articles) to this JSONL file and print the number of decisions per rule and issue. Without file, only the numbers are printed.")
 
-    print("Processing {}".format(xml_file))
-    correct_xml(xml_file, outpath, verbose=True)
-    print()
+def main(args):
+    inputs = args.input
+    outpath = args.outpath
+
+    # python3 correct_xml.py [input xml] [directory path for output]
+    if args.files:
+        if outpath is None:
+            inputs, outpath = inputs + args.files[:-1], args.files[-1]
+        else:
+            inputs = inputs + args.files
+
+    if not inputs or outpath is None:
+        ap.error("input files and an output directory are required")
+
+    if not os.path.isdir(outpath):
+        os.makedirs(outpath)
+        print("New directory '{}' created.".format(outpath))
+
+    files = expand_inputs(inputs)
+
+    trace_file = open(args.trace, "w", encoding="utf8") if args.trace is not None else None
+    trace = MergeTrace(trace_file) if trace_file is not None else NULL_TRACE
+
+    pool = None
+    try:
+        if args.jobs > 1 and not args.articles and len(files) > 1:
+            process_batch(files, outpath, args.jobs, args.verbose, trace)
+        else:
+            pool = multiprocessing.Pool(args.jobs) if args.jobs > 1 else None
+            for xml_file in files:
+                start_time = time.time()
+                print("Processing {}".format(xml_file))
+                correct_xml(xml_file, outpath, verbose=args.verbose, pool=pool, trace=trace)
+                print("\t{0} processed in {1:.2f} seconds\n".format(os.path.basename(xml_file), time.time() - start_time))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if trace_file is not None:
+            trace_file.close()
+
+    if trace.enabled:
+        print(trace.summary())
 
 if __name__ == "__main__":
-    main()
+    args = ap.parse_args()
+    main(args)
 
 ###############################################################################
 # END CODE
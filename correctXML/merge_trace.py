@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Trace of the decisions taken by correct_xml.py.
+## Every decision is recorded with its rule id, issue, article, page, the tokens involved
+## and their font and size, one JSON object per line, and counted per rule and per issue:
+##     trace = MergeTrace(open("merges.jsonl", "w", encoding="utf8"))
+##     trace.issue = "horizonte_2014_100_de"
+##     if trace.enabled:
+##         trace.record(RULE_CONSECUTIVE, article, [final_token, initial_token], words)
+##     print(trace.summary())
+## NULL_TRACE records nothing. Callers check trace.enabled before collecting anything,
+## so that a disabled trace costs a single attribute lookup per decision.
+###############################################################################
+
+from collections import Counter, defaultdict
+import json
+
+RULE_DROPCAP = "dropcap" # dropcap paragraph merged into the following word
+RULE_DENOISE = "denoise" # small or hidden word removed
+RULE_CONSECUTIVE = "consecutive" # consecutive paragraphs merged
+RULE_SKIP = "skip{}" # paragraphs merged across n skipped paragraphs
+RULE_ODD_DROPCAP = "odd_dropcap" # article marked for a first dropcap after the fifth paragraph
+
+class MergeTrace(object):
+    """
+    Records decisions to a JSONL sink and counts them per rule and per issue.
+
+    Args:
+        sink (file): text file object the records are written to. Without sink, the records are kept in self.records, e.g. in worker processes.
+        issue (string): document id of the issue being processed, can be changed between issues
+    """
+
+    enabled = True
+
+    def __init__(self, sink=None, issue=None):
+        self.sink = sink
+        self.issue = issue
+        self.records = []
+        self.rules = Counter() # rule --> number of decisions
+        self.issues = defaultdict(Counter) # issue --> rule --> number of decisions
+
+    def record(self, rule, article_tag, tokens, words):
+        """
+        Records a decision of rule on the Text elements tokens of an article. The page is the page of the first token.
+
+        Args:
+            rule (string): rule id, one of the RULE_ constants
+            article_tag (_Element): article element
+            tokens (list): Text elements involved, e.g. the final and the initial word of merged paragraphs
+            words (GlyphLayer): glyph attributes of the article
+        """
+        page = next(tokens[0].iterancestors("Page"), None)
+        infos = [words[token] for token in tokens]
+        self._add({
+            "rule": rule,
+            "issue": self.issue,
+            "article": article_tag.get("article_id"),
+            "page": page.get("number") if page is not None else None,
+            "tokens": [token.text for token in tokens],
+            "font": [info.font for info in infos],
+            "size": [info.size for info in infos],
+            })
+
+    def extend(self, records):
+        """
+        Adds records collected by another trace, e.g. in a worker process.
+        """
+        for record in records:
+            self._add(record)
+
+    def _add(self, record):
+        self.rules[record["rule"]] += 1
+        self.issues[record["issue"]][record["rule"]] += 1
+        if self.sink is not None:
+            self.sink.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        else:
+            self.records.append(record)
+
+    def summary(self):
+        """
+        Returns the counters as a tab separated table: rules in the columns, one line per issue and a total.
+        """
+        rules = sorted(self.rules)
+        lines = ["\t".join(["issue"] + rules)]
+        for issue in sorted(self.issues, key=str):
+            lines.append("\t".join([str(issue)] + [str(self.issues[issue][rule]) for rule in rules]))
+        lines.append("\t".join(["total"] + [str(self.rules[rule]) for rule in rules]))
+        return "\n".join(lines)
+
+class NullTrace(object):
+    """
+    Disabled trace, records nothing.
+    """
+
+    enabled = False
+    issue = None
+    records = []
+
+    def record(self, rule, article_tag, tokens, words):
+        pass
+
+    def extend(self, records):
+        pass
+
+    def summary(self):
+        return ""
+
+NULL_TRACE = NullTrace()
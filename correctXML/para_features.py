@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Per-article feature table of paragraphs for the merge rules in correct_xml.py.
+## Every paragraph is a row. The columns hold the attributes of its initial and final
+## word which the merge rules look at, and the rules on a single word are evaluated
+## once per row into boolean columns. The pair rules combine the columns of two rows,
+## for a single pair or for all pairs of rows at a given distance into a boolean mask:
+##     features = ParaFeatures(paras, lang, page_nums, title, main_font, main_size, words)
+##     features.consecutive(row1, row2)   # may row1 be merged with row2?
+##     features.mask(features.consecutive, 1)   # the same for all pairs of neighbouring rows
+## When paragraphs are merged, only the row of the merged paragraph is updated, and the
+## mergers recompute only the mask entries of the merged rows.
+###############################################################################
+
+from pre_noun_words_de import pre_noun_words
+
+final_punctuation = ['.', '?', '!', '…']
+
+CONTENTS_TITLE = "Inhalt/Sommaire/Contents"
+
+class ParaFeatures(object):
+    """
+    Feature table of the paragraphs of an article.
+
+    Args:
+        paras (list): paragraph elements of the article in document order, row i is paras[i]
+        lang (string): language code of relevant article, e.g. de, en or fr
+        page_nums (set): set of relevant page numbers for the article which will be ignored when merging
+        title (string): title of the article
+        main_font (int): most common font number for relevant article
+        main_size (float): most common font size for relevant article
+        words (GlyphLayer): precomputed glyph attributes for the article
+        folios (PageNumberMap): printed page numbers of the document. If they can be located, they replace the page_nums heuristic.
+    """
+
+    def __init__(self, paras, lang, page_nums, title, main_font, main_size, words, folios=None):
+        self.paras = list(paras)
+        self.lang = lang
+        self.page_nums = page_nums
+        self.title = title
+        self.main_font = main_font
+        self.main_size = main_size
+        self.words = words
+        self.folios = folios if folios is not None and folios.located else None
+        self.row = {para: r for r, para in enumerate(self.paras)}
+
+        n = len(self.paras)
+
+        # initial word columns
+        self.initial = [None] * n
+        self.initial_font = [None] * n
+        self.initial_size = [None] * n
+        self.has_initial = bytearray(n)
+        self.initial_digit = bytearray(n)
+        self.initial_blocked = bytearray(n) # potential page number
+        self.initial_upper = bytearray(n)
+        self.initial_dropcap = bytearray(n)
+
+        # final word columns
+        self.final = [None] * n
+        self.final_font = [None] * n
+        self.final_size = [None] * n
+        self.final_consecutive = bytearray(n) # final word allows a consecutive merge
+        self.final_skip = bytearray(n) # final word allows a skip merge
+        self.final_upper = bytearray(n)
+        self.final_alnum = bytearray(n) # alphabetic or digits only
+        self.final_pre_noun = bytearray(n)
+
+        for r, para in enumerate(self.paras):
+            tokens = para.xpath(".//Text")
+            if tokens:
+                self._set_initial(r, tokens[0])
+                self._set_final(r, tokens[-1])
+
+    def __len__(self):
+        return len(self.paras)
+
+    def _is_page_number(self, token):
+        """
+        Returns True if a digit token is to be treated as a page number, i.e. not merged across.
+        """
+        try:
+            value = int(token.text)
+        except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
+            return True
+        if self.title == CONTENTS_TITLE:
+            return True
+        if self.folios is not None:
+            return self.folios.is_folio(token)
+        return value in self.page_nums
+
+    def _set_initial(self, r, token):
+        info = self.words[token]
+        text = token.text or ""
+        self.initial[r] = token
+        self.initial_font[r] = info.font
+        self.initial_size[r] = info.size
+        # without font or size the word is not merged, as in inspect_next_para
+        self.has_initial[r] = info.font is not None and info.size is not None
+        self.initial_digit[r] = text.isdigit()
+        self.initial_blocked[r] = text.isdigit() and self._is_page_number(token)
+        self.initial_upper[r] = text[:1].isupper()
+        self.initial_dropcap[r] = info.dropcap
+
+    def _set_final(self, r, token):
+        info = self.words[token]
+        text = token.text
+        self.final[r] = token
+        self.final_font[r] = info.font
+        self.final_size[r] = info.size
+
+        if not text:
+            self.final_consecutive[r] = self.final_skip[r] = 0
+            self.final_upper[r] = self.final_alnum[r] = self.final_pre_noun[r] = 0
+            return
+
+        # ignore page numbers
+        if text.isdigit():
+            text_ok = not self._is_page_number(token)
+        # if the final paragraph char is punctuation, check to see if it's sentence final. If not, paragraph is eligible for merge.
+        elif not text.isalpha():
+            stripped = text.strip()
+            text_ok = bool(stripped) and not any(char in final_punctuation for char in stripped)
+        else:
+            text_ok = True
+
+        # ignore paras with fontsize smaller than 8.00, or without font or size
+        large_enough = info.font is not None and info.size is not None and info.size >= 8.00
+
+        # 'Vor Ort : Die Stärke...', p. 33: Asmara Addis (Hidden text)
+        self.final_consecutive[r] = large_enough and not info.hidden and text_ok
+        # ignore paras with font not equal to main size or main font
+        self.final_skip[r] = large_enough and info.font == self.main_font and info.size == self.main_size and text_ok
+
+        self.final_upper[r] = text[0].isupper()
+        self.final_alnum[r] = text.isalpha() or text.isdigit()
+        self.final_pre_noun[r] = text.lower() in pre_noun_words
+
+    def merge(self, r1, r2):
+        """
+        Updates the table after paragraph r2 has been appended to paragraph r1: r1 takes over the final word of r2 and r2 is emptied.
+        """
+        for column in (self.final, self.final_font, self.final_size, self.final_consecutive, self.final_skip, self.final_upper, self.final_alnum, self.final_pre_noun):
+            column[r1] = column[r2]
+
+        self.initial[r2] = self.final[r2] = None
+        self.has_initial[r2] = self.initial_dropcap[r2] = 0
+        self.final_consecutive[r2] = self.final_skip[r2] = 0
+
+    def _same_style(self, r1, r2):
+        return self.final_font[r1] == self.initial_font[r2] and self.final_size[r1] == self.initial_size[r2]
+
+    def consecutive(self, r1, r2):
+        """
+        Returns True if paragraph r1 is to be merged with the following paragraph r2.
+        """
+        if not self.final_consecutive[r1] or not self.has_initial[r2]:
+            return False
+
+        # if the following paragraph starts with a potential page number, don't merge
+        if self.initial_digit[r2]:
+            if self.initial_blocked[r2]:
+                return False
+
+        # avoid consecutive merges is initial word is capitalised in EN and FR '• A rapist The general' --> No merge. But "L ' Aucun" --> merge.
+        elif self.lang != 'de' and self.final_alnum[r1] and self.initial_upper[r2]:
+            return False
+
+        return self._same_style(r1, r2)
+
+    def skip(self, r1, r2):
+        """
+        Returns True if paragraph r1 is to be merged with paragraph r2 further down, skipping the paragraphs in between.
+        """
+        if not self.final_skip[r1] or not self.has_initial[r2]:
+            return False
+
+        # if the following paragraph starts with a potential page number, don't merge
+        if self.initial_digit[r2]:
+            if self.initial_blocked[r2]:
+                return False
+
+        # avoid catching titles where words are capitalised in English and French.
+        elif self.lang != "de" and self.final_upper[r1] and self.initial_upper[r2]:
+            return False
+
+        # avoid consecutive merges is initial word is capitalised in EN and FR '• A rapist The general' --> No merge. But "L ' Aucun" --> merge.
+        elif self.lang != 'de' and self.final_alnum[r1] and self.initial_upper[r2]:
+            return False
+
+        # Special handling for DE: if the final word of a paragraph is in list of pre_noun_words (common articles and prepositions) a marge is permitted.
+        elif self.lang == "de" and self.initial_upper[r2] and not self.final_pre_noun[r1]:
+            return False
+
+        return self._same_style(r1, r2)
+
+    def mask(self, rule, distance, rows=None):
+        """
+        Evaluates a pair rule (e.g. self.consecutive or self.skip) for every row and the row distance rows further down.
+        The rules of the table are evaluated on whole columns, other rules pair by pair.
+
+        Args:
+            rule (method): pair rule
+            distance (int): distance between the rows of a pair, 1 for neighbouring rows
+            rows (list): rows in order, defaults to all rows
+
+        Returns:
+            mask (bytearray): mask[i] is 1 if rows[i] is to be merged with rows[i+distance]
+        """
+        if rows is None:
+            rows = range(len(self.paras))
+        firsts, seconds = rows[:max(0, len(rows)-distance)], rows[distance:]
+
+        if rule == self.consecutive:
+            return self._consecutive_mask(firsts, seconds)
+        if rule == self.skip:
+            return self._skip_mask(firsts, seconds)
+        return bytearray(map(rule, firsts, seconds))
+
+    def _consecutive_mask(self, firsts, seconds):
+        other_lang = self.lang != "de"
+        return bytearray(
+            bool(ok and initial and (not blocked if digit else not (other_lang and alnum and upper)) and font == initial_font and size == initial_size)
+            for ok, alnum, font, size, initial, digit, blocked, upper, initial_font, initial_size in zip(
+                _gather(self.final_consecutive, firsts), _gather(self.final_alnum, firsts), _gather(self.final_font, firsts), _gather(self.final_size, firsts),
+                _gather(self.has_initial, seconds), _gather(self.initial_digit, seconds), _gather(self.initial_blocked, seconds), _gather(self.initial_upper, seconds),
+                _gather(self.initial_font, seconds), _gather(self.initial_size, seconds)))
+
+    def _skip_mask(self, firsts, seconds):
+        if self.lang == "de":
+            # an upper case initial word only follows an article or preposition
+            allowed = _gather(self.final_pre_noun, firsts)
+        else:
+            # no upper case initial word after an upper case, alphabetic or numeric final word
+            allowed = [not (final_upper or alnum) for final_upper, alnum in zip(_gather(self.final_upper, firsts), _gather(self.final_alnum, firsts))]
+        return bytearray(
+            bool(ok and initial and (not blocked if digit else allowed_upper or not upper) and font == initial_font and size == initial_size)
+            for ok, allowed_upper, font, size, initial, digit, blocked, upper, initial_font, initial_size in zip(
+                _gather(self.final_skip, firsts), allowed, _gather(self.final_font, firsts), _gather(self.final_size, firsts),
+                _gather(self.has_initial, seconds), _gather(self.initial_digit, seconds), _gather(self.initial_blocked, seconds), _gather(self.initial_upper, seconds),
+                _gather(self.initial_font, seconds), _gather(self.initial_size, seconds)))
+
+def _gather(column, rows):
+    """
+    Returns the values of a column at the given rows.
+    """
+    return [column[r] for r in rows]
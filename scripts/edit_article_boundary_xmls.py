@@ -4,14 +4,17 @@
 from lxml import etree
 import pathlib
 import sys
-from subprocess import call
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tools.xml_writer import format_file
 
 inpath = sys.argv[1]
 outpath = sys.argv[2]
 
 def xml_lint(outfile):
-    call(["xmllint", "--format", outfile, "--output", outfile[:-4]+".tmp.xml", "--encode", "utf-8"])
-    call(["mv", outfile[:-4]+".tmp.xml", outfile])
+    # formatted in place as by xmllint --format
+    format_file(outfile)
 
 if not pathlib.Path(outpath).exists() and not pathlib.Path(outpath).is_dir():
     pathlib.Path(outpath).mkdir(parents=True)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Golden-output equivalence check between two versions of the pipeline.
+## The pipeline stages of a git ref (the reference, e.g. the version in production) and
+## of the working tree are run on the same fixture files. Their outputs are compared
+## article by article, canonicalised so that formatting is ignored, and the speedup of
+## each stage is reported. The exit status is 1 if any output differs.
+## Each stage is given the reference output of the previous stage, so that a difference
+## is attributed to the stage that causes it. With -e, each version runs end to end.
+## The reference is always given explicitly: the working tree is compared with the
+## committed version it is based on, e.g. the production branch or the merge base of a
+## feature branch, never with its own HEAD by default.
+## ToRun: python3 scripts/equivalence_check.py -i <boundary xml files or directory> -r <git ref> [-s correct_xml text_extractor]
+## Fixtures: tests/fixtures holds small article boundary files of the NEW, MID and OLD issue layouts:
+##     python3 scripts/equivalence_check.py -i tests/fixtures -r $(git merge-base HEAD <production branch>)
+###############################################################################
+
+from lxml import etree
+from collections import OrderedDict
+import argparse
+import difflib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# stage --> script, relative to the repository
+STAGES = OrderedDict([
+    ("correct_xml", "correctXML/correct_xml.py"),
+    ("text_extractor", "content_extraction/text_extractor.py"),
+    ("corpusXML", "convertXMLtoCorpusXML/corpusXML.py"),
+    ])
+
+###############################################################################
+
+def export_ref(ref, dest):
+    """
+    Extracts the tree of a git ref into dest.
+    """
+    archive = subprocess.run(["git", "-C", REPO_DIR, "archive", "--format=tar", ref], stdout=subprocess.PIPE, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+
+def stage_input(stage, files, indir):
+    """
+    Copies the input files of a stage into indir, named as the stage expects them.
+    correct_xml writes '<doc_id>_corrected.xml', text_extractor expects '<doc_id>.xml'.
+    """
+    os.makedirs(indir, exist_ok=True)
+    for f in files:
+        name = os.path.basename(f)
+        if stage != "correct_xml":
+            name = name.replace("_corrected.xml", ".xml")
+        shutil.copy(f, os.path.join(indir, name))
+    return sorted(os.path.join(indir, f) for f in os.listdir(indir))
+
+def run_stage(code_dir, stage, files, outdir, log):
+    """
+    Runs a stage of the pipeline version in code_dir on files and returns the wall time.
+    correct_xml is called once per file unless the version accepts several files with -i.
+    """
+    script = os.path.join(code_dir, STAGES[stage])
+    os.makedirs(outdir, exist_ok=True)
+
+    if stage == "correct_xml":
+        with open(script, encoding="utf8") as f:
+            batched = '"--input"' in f.read()
+        if batched:
+            commands = [[sys.executable, script, "-i"] + files + ["-o", outdir]]
+        else:
+            commands = [[sys.executable, script, f, outdir] for f in files]
+    else:
+        commands = [[sys.executable, script, "-i", os.path.dirname(files[0]), "-o", outdir]]
+
+    start_time = time.time()
+    for command in commands:
+        # scripts import their sibling modules, so they are run from their own directory
+        subprocess.run(command, cwd=os.path.dirname(script), stdout=log, stderr=subprocess.STDOUT, check=True)
+    return time.time() - start_time
+
+###############################################################################
+
+def normalise(text):
+    return " ".join(text.split()) if text else ""
+
+def read_articles(path):
+    """
+    Returns the root attributes of an output file and its articles, keyed by article id (or position), with blank text removed.
+    """
+    root = etree.parse(path, etree.XMLParser(remove_blank_text=True, huge_tree=True)).getroot()
+    articles = OrderedDict()
+    for i, article in enumerate(root):
+        key = article.get("article_id") or article.get("id") or str(i)
+        articles[key] = article
+    return dict(root.attrib), articles
+
+def structure(article):
+    """
+    Canonical structure of an article: one line per element with its depth, tag and sorted attributes.
+    """
+    lines = []
+    def walk(elem, depth):
+        if not isinstance(elem.tag, str):
+            return
+        lines.append("{}{} {}".format("  "*depth, elem.tag, sorted(elem.attrib.items())))
+        for child in elem:
+            walk(child, depth+1)
+    walk(article, 0)
+    return lines
+
+def text(article):
+    """
+    Canonical text of an article: one line per element text or tail, with collapsed whitespace.
+    """
+    return [line for line in (normalise(t) for t in article.itertext()) if line]
+
+def compare_files(ref_file, new_file, max_lines):
+    """
+    Compares two output files article by article.
+
+    Returns:
+        n (int): number of articles in the reference file
+        diffs (list): (article key, list of report lines) of the differing articles
+    """
+    ref_attrib, ref_articles = read_articles(ref_file)
+    new_attrib, new_articles = read_articles(new_file)
+    diffs = []
+
+    if ref_attrib != new_attrib:
+        diffs.append(("document", ["attributes: {} != {}".format(ref_attrib, new_attrib)]))
+
+    for key in list(ref_articles) + [key for key in new_articles if key not in ref_articles]:
+        if key not in new_articles:
+            diffs.append((key, ["missing in new output"]))
+            continue
+        if key not in ref_articles:
+            diffs.append((key, ["missing in reference output"]))
+            continue
+        report = []
+        ref_structure, new_structure = structure(ref_articles[key]), structure(new_articles[key])
+        if ref_structure != new_structure:
+            report.append("structure: {} elements in reference, {} in new output".format(len(ref_structure), len(new_structure)))
+            report.extend(list(difflib.unified_diff(ref_structure, new_structure, "reference", "new", n=1, lineterm=""))[:max_lines])
+        ref_text, new_text = text(ref_articles[key]), text(new_articles[key])
+        if ref_text != new_text:
+            report.append("text:")
+            report.extend(list(difflib.unified_diff(ref_text, new_text, "reference", "new", n=1, lineterm=""))[:max_lines])
+        if report:
+            diffs.append((key, report))
+
+    return len(ref_articles), diffs
+
+###############################################################################
+
+ap = argparse.ArgumentParser(description="Runs the pipeline stages of a git ref and of the working tree on the same fixture files and compares their outputs article by article.")
+
+ap.add_argument("-i", "--input", required=True, nargs="+", help="article boundary files (xml or page range files) or directories containing them")
+
+ap.add_argument("-r", "--ref", required=True, help="git ref of the reference version, e.g. the production branch or $(git merge-base HEAD <production branch>)")
+
+ap.add_argument("-s", "--stages", required=False, nargs="+", default=["correct_xml", "text_extractor"], choices=list(STAGES), help="stages to check, in pipeline order (default: correct_xml text_extractor; corpusXML requires the taggers)")
+
+ap.add_argument("-e", "--end_to_end", required=False, default=False, action="store_true", help="give each version its own output of the previous stage instead of the reference output")
+
+ap.add_argument("-w", "--workdir", required=False, default=None, help="directory for the outputs and logs, kept after the check (default: temporary directory)")
+
+ap.add_argument("-m", "--max_lines", required=False, default=20, type=int, help="maximum number of diff lines reported per article")
+
+def main(args):
+    files = []
+    for path in args.input:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".xml"))
+        else:
+            files.append(path)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="equivalence_")
+    ref_dir = os.path.join(workdir, "code_ref")
+    if os.path.isdir(ref_dir):
+        shutil.rmtree(ref_dir)
+    export_ref(args.ref, ref_dir)
+    code = {"ref": ref_dir, "new": REPO_DIR}
+
+    stages = [stage for stage in STAGES if stage in args.stages]
+    inputs = {"ref": files, "new": files}
+    all_equal = True
+    timings = []
+
+    with open(os.path.join(workdir, "stages.log"), "w") as log:
+        for stage in stages:
+            outputs = {}
+            times = {}
+            for side in ("ref", "new"):
+                stage_files = stage_input(stage, inputs[side], os.path.join(workdir, side, stage, "in"))
+                outdir = os.path.join(workdir, side, stage, "out")
+                times[side] = run_stage(code[side], stage, stage_files, outdir, log)
+                outputs[side] = sorted(os.path.join(outdir, f) for f in os.listdir(outdir))
+            timings.append((stage, times["ref"], times["new"]))
+
+            print("\n## {}".format(stage))
+            ref_names = {os.path.basename(f): f for f in outputs["ref"]}
+            new_names = {os.path.basename(f): f for f in outputs["new"]}
+            for name in sorted(set(ref_names) | set(new_names)):
+                if name not in new_names or name not in ref_names:
+                    print("{}\tmissing in {} output".format(name, "new" if name not in new_names else "reference"))
+                    all_equal = False
+                    continue
+                n, diffs = compare_files(ref_names[name], new_names[name], args.max_lines)
+                if not diffs:
+                    print("{}\tidentical ({} articles)".format(name, n))
+                    continue
+                all_equal = False
+                print("{}\t{} of {} articles differ".format(name, len(diffs), n))
+                for key, report in diffs:
+                    print("  {}".format(key))
+                    for line in report:
+                        print("    {}".format(line))
+
+            # the next stage reads the reference output, or each version its own output
+            inputs = {side: outputs["ref" if not args.end_to_end else side] for side in ("ref", "new")}
+
+    print("\n## Timing")
+    print("stage\treference\tnew\tspeedup")
+    for stage, ref_time, new_time in timings:
+        print("{}\t{:.2f}s\t{:.2f}s\t{:.2f}x".format(stage, ref_time, new_time, ref_time / new_time if new_time else float("inf")))
+
+    print("\n{} (outputs and logs in {})".format("EQUIVALENT" if all_equal else "DIFFERENT", workdir))
+    return 0 if all_equal else 1
+
+if __name__ == "__main__":
+    args = ap.parse_args()
+    sys.exit(main(args))
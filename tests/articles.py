@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Random Article elements with the structure of an article boundary file, for
+## comparing the merge rules and mergers of correct_xml with their references.
+###############################################################################
+
+from lxml import etree
+
+WORDS = ["word", "Word", "end.", "3", "12", "4", "x,", "-", "❷", "der", "Der", "und", "la", "La", "«", "etc", "ok?", "a;b", "L", "1.", "Bern"]
+
+def random_article(rng, n_paras, n_pages=2, title=None):
+    """
+    Returns an Article element with n_paras paragraphs of up to four words on n_pages pages. Most words are in
+    font F1 of size 9.50, some are small, in another font, hidden or dropcaps.
+    """
+    article = etree.Element("Article", article_id="a1", title=title or rng.choice(["T", "Inhalt/Sommaire/Contents", "Some title"]))
+    contents = [etree.SubElement(etree.SubElement(article, "Page", number=str(3+k)), "Content") for k in range(n_pages)]
+    for i in range(n_paras):
+        para = etree.SubElement(contents[i * n_pages // max(n_paras, 1)], "Para")
+        for _ in range(rng.randint(0 if rng.random() < 0.03 else 1, 4)):
+            word = etree.SubElement(para, "Word")
+            text = etree.SubElement(word, "Text")
+            text.text = rng.choice(WORDS)
+            box = etree.SubElement(word, "Box", llx="1", lly=str(rng.choice([100, 200, 300])))
+            attrib = {"font": rng.choice(["F1", "F1", "F1", "F2"]), "size": rng.choice(["9.50", "9.50", "9.50", "8.00", "7.00"])}
+            if rng.random() < 0.03:
+                attrib["alpha"] = attrib["beta"] = "0"
+            if rng.random() < 0.03:
+                attrib["dropcap"] = "true"
+            for char in text.text:
+                etree.SubElement(box, "Glyph", attrib).text = char
+    return article
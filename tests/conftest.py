@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## The pipeline scripts import their sibling modules and the tools package, so the
+## repository and the script directories are put on the path, as when running a script.
+## ToRun: python3 -m pytest tests
+###############################################################################
+
+import os
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+for path in (REPO_DIR, os.path.join(REPO_DIR, "correctXML"), os.path.join(REPO_DIR, "content_extraction"), os.path.join(REPO_DIR, "convertTETMLtoXML")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
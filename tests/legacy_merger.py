@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## The paragraph mergers of correct_xml.py before they were rewritten as single
+## passes over the feature table of an article, kept unchanged as the reference
+## the rewrites are tested against. They recurse from the first paragraph after
+## every merge, so long articles need a raised recursion limit.
+###############################################################################
+
+from pre_noun_words_de import pre_noun_words
+
+final_punctuation = ['.', '?', '!', '…']
+
+def inspect_next_para(p):
+    """
+    Performs a lookahead opertaion on given p argument
+
+    Args:
+        p (_Element): paragraph node
+
+    Returns:
+        para_initial (string): first word of paragraph
+        font (int): font number of first letter of paragraph
+        size (float): font size of first letter of paragraph
+    """
+    try:
+        para_initial = p.xpath(".//Text")[0]
+        font = int(para_initial.getnext().xpath("Glyph/@font")[0][1:])
+        size = float(para_initial.getnext().xpath("Glyph/@size")[0])
+        return para_initial, font, size
+    except IndexError:
+        return None, None, None
+
+def merge_para_elems(elem1, elem2):
+    """
+    Merges two nodes by appending all children nodes of elem2 to elem1
+
+    Args:
+        elem1 (_Element): paragraph element 1
+        elem2 (_Element): paragraph element 2
+
+    Returns:
+        elem1 (_Element): paragraph element 1 with appended nodes
+    """
+    for e in elem2:
+        elem1.append(e)
+    return elem1
+
+def consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=False):
+    """
+    Performs consecutive paragraph merging.
+
+    Args:
+        article_tag (_Element): article element for processing
+        lang (string): language code of relevant article, e.g. de, en or fr
+        page_nums (set): set of relevant page numbers for the article which will be ignored when merging
+        main_font (int): most common font number for relevant article
+        main_size (float): most common font size for relevant article
+        verbose (bool): if set to True, merges found are printed to stdout
+
+    Returns:
+        article_tag (_Element): article element containining merged paragraphs
+    """
+    paras = article_tag.xpath(".//Para")
+
+    for i, para in enumerate(paras):
+
+        eligible = False
+
+        if i != len(paras)-1:
+
+            try:
+                para_final = para.xpath(".//Text")[-1] # get final word of para
+                para_final_token = para_final.text
+                current_font = int(para_final.getnext().xpath("Glyph/@font")[0][1:]) # get font style of final word (as integer)
+                current_size = float(para_final.getnext().xpath("Glyph/@size")[0]) # get size of final word
+            except IndexError:
+                continue
+
+            # ignore None values
+            if not para_final.text:
+                # print(para_final.text)
+                continue
+
+            # ignore paras with fontsize smaller than 8.00
+            elif current_size < 8.00:
+                continue
+
+            # 'Vor Ort : Die Stärke...', p. 33: Asmara Addis (Hidden text)
+            elif "alpha" in para_final.getnext().xpath('./Glyph')[0].attrib and "beta" in para_final.getnext().xpath('./Glyph')[0].attrib:
+                continue
+
+            # ignore page numbers
+            # ignore page numbers
+            elif para_final.text.isdigit():
+                try:
+                    if int(para_final.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
+                        eligible = False
+                        continue
+                    else:
+                        eligible = True
+
+                except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
+                    continue
+
+            # if the final paragraph char is punctuation, check to see if it's sentence final. If not, paragraph is eligible for merge.
+            elif not para_final.text.isalpha():
+                for char in para_final.text.strip():
+                    if char in final_punctuation:
+                        eligible = False
+                        break
+                    else:
+                        eligible = True
+
+            else:
+                eligible = True
+
+            if eligible == True:
+
+                eligible = False
+
+                # check the initial word of following paragraph for font size and style.
+                para_initial, fol_font, fol_size = inspect_next_para(paras[i+1])
+
+                # if the following paragraph is no good, don't merge
+                if para_initial is None:
+                    continue
+
+                # if the following paragraph starts with a potential page number, don't merge
+                elif para_initial.text.isdigit():
+                    try:
+                        if int(para_initial.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
+                            eligible = False
+                            continue
+                        else:
+                            eligible = True
+                    except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
+                        continue
+
+                # avoid consecutive merges is initial word is capitalised in EN and FR '• A rapist The general' --> No merge. But "L ' Aucun" --> merge.
+                elif lang != 'de' and (para_final.text.isalpha() or para_final.text.isdigit()) and para_initial.text[0].isupper():
+                    # print("******************", para_final.text, para_initial.text, article_tag.attrib["article_id"])
+                    continue
+
+                # otherwise, perform merge and call the function again
+                else:
+                    eligible = True
+
+                if eligible == True:
+                    if current_font == fol_font and current_size == fol_size:
+
+                        # merge matching paragraphs
+                        if verbose:
+                            print("Consecutive merge found in {}, '{}', p. {}:".format(article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"]), para_final.text, para_initial.text)
+
+                        p1 = para_final.getparent().getparent()
+                        p2 = para_initial.getparent().getparent()
+                        merged = merge_para_elems(p1, p2)
+                        p1.getparent().replace(p1, merged)
+                        p2.getparent().remove(p2)
+
+                        if verbose:
+                            consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=True)
+                        else:
+                            consecutive_merger(article_tag, lang, page_nums, main_font, main_size, verbose=False)
+                    else:
+                        continue
+            # else:
+            #     continue
+
+        # if no more merges are to be performed, return the updated article elem
+        else:
+            return article_tag
+
+def skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=False):
+    """
+    Performs skip paragraph merging.
+
+    Args:
+        article_tag (_Element): article element for processing
+        lang (string): language code of relevant article, e.g. de, en or fr
+        main_font (int): most common font number for relevant article
+        main_size (float): most common font size for relevant article
+        n_skip (int): number of paragraphs to skip
+        page_nums (set): set of relevant page numbers for the article which will be ignored when merging
+        verbose (bool): if set to True, merges found are printed to stdout
+
+    Returns:
+        article_tag (_Element): article element containining merged paragraphs
+    """
+
+    paras = article_tag.xpath(".//Para")
+
+    for i, para in enumerate(paras):
+
+        eligible = False
+
+        # ensure there are enough paragraph elements in article
+        if i != len(paras)-(n_skip+1) and len(paras) > n_skip:
+            try:
+                para_final = para.xpath(".//Text")[-1] # get final word of para
+                current_font = int(para_final.getnext().xpath("Glyph/@font")[0][1:]) # get font style of final word (as integer)
+                current_size = float(para_final.getnext().xpath("Glyph/@size")[0]) # get size of final word
+
+            except IndexError:
+                continue
+
+            if not para_final.text:
+                continue
+
+            # ignore paras with fontsize smaller than 8.00
+            elif current_size < 8.00:
+                continue
+
+            # ignore paras with font not equal to main size or main font
+            elif current_font != main_font or current_size != main_size:
+            #     "********* Caught with font and size conditions ********"
+                continue
+
+            # ignore page numbers
+            elif para_final.text.isdigit():
+                try:
+                    if int(para_final.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
+                        eligible = False
+                        continue
+                    else:
+                        eligible = True
+
+                except ValueError:
+                    continue
+
+            # if the final paragraph char is punctuation, check to see if it's sentence final. If not, paragraph is eligible for merge.
+            elif not para_final.text.isalpha():
+                for char in para_final.text.strip():
+                    if char in final_punctuation:
+                        eligible = False
+                        break
+                    else:
+                        eligible = True
+
+            else:
+                eligible = True
+
+            if eligible == True:
+
+                # check the initial word of following paragraph for fontsize. If matches, merge
+                para_initial, fol_font, fol_size = inspect_next_para(paras[i+(n_skip+1)])
+
+                if para_initial is None: # if the following paragraph is not good, no merge
+                    continue
+
+                # if the following paragraph starts with a potential page number, don't merge
+                elif para_initial.text.isdigit():
+                    try:
+                        if int(para_initial.text) in page_nums or article_tag.attrib["title"] == "Inhalt/Sommaire/Contents":
+                            eligible = False
+                            continue
+                        else:
+                            eligible = True
+                    except ValueError: # e.g. ValueError: invalid literal for int() with base 10: '❷'
+                        continue
+
+                # Special handling for contents page: don't merge paras if following paragraph starts with an assumed page number
+                elif article_tag.attrib['title'] == "Inhalt/Sommaire/Contents" and para_initial.text.isdigit():
+                    continue
+
+                # avoid catching titles where words are capitalised in English and French.
+                elif lang != "de" and para_final.text[0].isupper() and para_initial.text[0].isupper():
+                    continue
+
+                # avoid consecutive merges is initial word is capitalised in EN and FR '• A rapist The general' --> No merge. But "L ' Aucun" --> merge.
+                elif lang != 'de' and (para_final.text.isalpha() or para_final.text.isdigit()) and para_initial.text[0].isupper():
+                    # print("******************", para_final.text, para_initial.text, article_tag.attrib["article_id"])
+                    continue
+
+                # Special handling for DE: if the final word of a paragraph is in list of pre_noun_words (common articles and prepositions) a marge is permitted.
+                elif lang == "de" and para_initial.text[0].isupper() and  para_final.text.lower() not in pre_noun_words:
+                    continue
+
+                else:
+                    eligible = True
+
+                if eligible == True:
+                    if current_font == fol_font and current_size == fol_size:
+
+                        # merge matching paragraphs
+                        if verbose:
+                            print("{}-skip merge found in {}, '{}', p. {}:".format(n_skip, article_tag.attrib["article_id"], article_tag.attrib["title"][:20]+"...", article_tag.xpath("./Page")[0].attrib["number"]), para_final.text, para_initial.text)
+
+                        p1 = para_final.getparent().getparent()
+                        p2 = para_initial.getparent().getparent()
+                        merged = merge_para_elems(p1, p2)
+                        p1.getparent().replace(p1, merged)
+                        p2.getparent().remove(p2)
+
+                        if verbose:
+                            skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=True)
+                        else:
+                            skip_merger(article_tag, lang, page_nums, main_font, main_size, n_skip, verbose=False)
+
+                    else:
+                        continue
+
+        else:
+            return article_tag
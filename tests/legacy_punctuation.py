@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## The punctuation rules of text_extractor.py before they were rewritten as the
+## table-driven content_extraction/punctuation.py, kept unchanged as the reference
+## the rewrite is tested against.
+###############################################################################
+
+# normal punctuation -- should be appended to previous word
+punctuation = ['!', '"', '#', '$', '%', ')', '*', ',', '-', '.', '»',
+ ':', ';', '=', '>', '?', '@', '\\', ']', '^', '_', '}', '~', '°', '…', '”', '’', '’']
+# punctuation that opens new sentence -- should be appended to following word
+opening = ['(', '<', '[','{','«','“','‘', '‹']
+closing = ['’', '”', '›']
+# punctuation that is between two words -- should be concatenated with previous and following word
+both = ['`', '|', '&', '+', '\'', '/','’']
+
+contractions = ['ll','re','s','t','ve','d','m']
+# special = ['html', 'com', 'ch']
+fr_contractions = ['c','l','d','j','m','n','s','qu','lorsqu','aujourd','jusqu']
+
+def restore_punctuation(text):
+
+    if isinstance(text, str): # processing a title, convert to list and treat as normal
+        text = text.split()
+
+    # TODO: In the 1930s and’ 50s --> In the 1930s and ’50s
+    # 3R­-Grundsätze --> 3R­Grundsätze but should remain 3R­-Grundsätze !!
+
+    # fixed
+    # ‹ aufgezogen ›, --> ‹aufgezogen›
+    # 660’ 000 --> 660’000, 13’ 807 --> 13’807
+    # It’ s our future – now we’re talking’. --> ‘It’s our future – now we’re talking’.
+    # ‘Crimes and Punishments ’ --> ‘Crimes and Punishments’ HACK
+
+    found = False
+    current=[]
+
+    for index in range(0,len(text)):
+        word = text[index]
+
+        try:
+
+            if word == None:
+                continue
+
+            # concat between word and prev./follow. punctuation (usually quotation) -> ' good ' glued together as 'good'
+            elif text[index-1] in opening and text[index+1][0] in closing: #1
+                # look ahead to see if pattern is followed by a contraction character that also needs to be appended. e.g. “ It ’ s ... ” -> “It’s ...”
+                if text[index+2] in contractions:
+                    # print("RULE 1.2:", text[index-1], word, text[index+1], text[index+2])
+
+                    del current[-1]
+                    word = text[index-1]+word[1:]+text[index+1]+text[index+2]
+                    current.append(word)
+                    found = True
+                    continue
+
+                else:
+                    # print("RULE 1.1:", text[index-1], word[1:], text[index+1])
+                    del current[-1]
+                    word = text[index-1]+word[1:]+text[index+1]
+                    text[index+1] = word
+                    current.append(word)
+                    found = True # next word was already appended
+                    continue
+
+            # concat between punctuation with prev. and follow. word -> she ' ll glued together as she'll / 600 ' 000 -> 600'000
+            elif (word in both or word.encode('utf-8') == '\xe2\x80\x99') and (text[index+1] in contractions or (text[index+1].isdigit() and text[index-1].isdigit())):
+                # print("RULE 2:", text[index-1], word, text[index+1])
+                del current[-1]
+                word = text[index-1]+word+text[index+1]
+                text[index+1] = word
+                current.append(word)
+                found = True # next word was already appended
+                continue
+
+            # append other punctuation to previous word -> house . as house.
+            elif word in punctuation:
+                # print("RULE 3:", text[index-1], word)
+                del current[-1]
+                word = text[index-1]+word
+                text[index] = word
+                current.append(word)
+                continue
+
+            # append sentence opening punctuation to following word -> << She said as <<She said
+            elif word in opening:
+                # print("RULE 4:", word, text[index+1])
+                word = word+text[index+1]
+                text[index+1] = word
+                current.append(word)
+                found = True # next word was already appended
+                continue
+
+            # append other punctuation to previous word -> house . as house.
+            elif word[0] in punctuation:
+                # print("RULE 5:", text[index-1], word)
+                # print(word)
+                del current[-1]
+                word = text[index-1]+word
+                text[index] = word
+                current.append(word)
+                continue
+
+        except IndexError:
+            pass
+
+
+        # if the current word was already apended move on
+        if found:
+            # print("FOUND")
+            # print(word)
+            # print(current)
+            found = False
+            continue
+
+        # append all other words as they are
+        if word:
+            current.append(word)
+            # print(current)
+    # if we somehow left out content e.g. - - + use original
+    if current == []:
+        current = text
+
+    # Hack to ensure that nothing is missed: e.g. <div>'Crime and Punishments '<\div> -> <div>'Crime and Punishments'<\div>
+    try:
+        if current[-1] in punctuation:
+            current[-2] = current[-2] + current[-1]
+            del current[-1]
+    except IndexError:
+        pass
+
+    return ' '.join(current)
+
+def restore_french_punctuation(text):
+
+    if isinstance(text, str): # processing a title, convert to list and treat as normal
+        text = text.split()
+
+    found = False
+    current=[]
+    for index in range(0,len(text)):
+        word = text[index]
+        try:
+            # concat between word and prev./follow. punctuation (usually quotation) -> ' good ' glued together as 'good'
+            if text[index-1] in opening and text[index+1][0] in closing :
+                    del current[-1]
+                    word = text[index-1]+word[1:]+text[index+1]
+                    text[index+1] = word
+                    current.append(word)
+                    found = True # next word was already appended
+                    continue
+            # concat between punctuation with prev. and follow. word -> l ' amour glued together as l'amour
+            elif word and (word in both or word.encode('utf-8') == '\xe2\x80\x99') and text[index-1].lower() in fr_contractions:
+                del current[-1]
+                word = text[index-1]+word+text[index+1]
+                text[index+1] = word
+                current.append(word)
+                found = True # next word was already appended
+                continue
+            # append other punctuation to previous word -> house . as house.
+            elif word in punctuation:
+                del current[-1]
+                word = text[index-1]+word
+                text[index] = word
+                current.append(word)
+                continue
+            # append sentence opening punctuation to following word -> << She said as <<She said
+            elif word in opening:
+                word = word+text[index+1]
+                text[index+1] = word
+                current.append(word)
+                found = True # next word was already appended
+                continue
+            # append other punctuation to previous word -> house . as house.
+            elif word and word[0] in punctuation:
+                del current[-1]
+                word = text[index-1]+word
+                text[index] = word
+                current.append(word)
+                continue
+        except IndexError:
+            pass
+
+        # if the current word was already apended move on
+        if found:
+            found = False
+            continue
+
+        # append all other words as they are
+        if word:
+            current.append(word)
+
+    # if we somehow left out content e.g. - - + use original
+    if current == []:
+        current = text
+
+
+    return ' '.join(current)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+from Wordplus_Parser import TetmlFile
+from contents_control import PageNgramIndex, ValidationJournal, auto_validate
+
+def _page(number, *words):
+    page = etree.Element("Page", number=str(number))
+    para = etree.SubElement(etree.SubElement(page, "Content"), "Para")
+    for text in words:
+        etree.SubElement(etree.SubElement(para, "Word"), "Text").text = text
+    return page
+
+def _index():
+    tetml = TetmlFile.__new__(TetmlFile)
+    tetml.pages = []
+    tetml.page_index = {}
+    for page in (_page(2, "Liebe", "Leserinnen", "Editorial"), _page(6, "Die", "GLETSCHER", "schmelzen"), _page(8, "Bienen", None, "summen")):
+        tetml._add_page(page)
+    return PageNgramIndex(tetml)
+
+def test_ngrams():
+    index = _index()
+    assert index.ngrams("  Ab\tCd ") == {"ab ", "b c", " cd"}
+    assert index.ngrams("ab") == set()
+
+def test_score():
+    index = _index()
+    assert index.score("Gletscher schmelzen", 6) == 1.0
+    assert index.score("Gletscher schmelzen", 8) == 0.0
+    assert index.score("Gletscher schmelzen", 99) == 0.0
+    # 'bie', 'ien', 'ene', 'nen', 'en ' and 'n s' of 12 n-grams, words without text are skipped
+    assert index.score("Bienen sterben", 8) == 0.5
+    # the best part of a multilingual title
+    assert index.score("Éditorial/Editorial", 2) == 1.0
+    assert index.score("", 2) == 0.0
+
+def test_auto_validate():
+    index = _index()
+    contents = [(2, "Editorial/Editorial/Éditorial"), (6, "Gletscher schmelzen"), (7, "Bienen sterben"), (8, "Bienen sterben")]
+    assert auto_validate(contents, index) == (contents[:2], contents[2:])
+    assert auto_validate(contents, index, threshold=0.5) == (contents[:2] + contents[3:], contents[2:3])
+    assert auto_validate(contents, index, threshold=1.01) == ([], contents)
+
+def test_journal_replay(tmp_path):
+    path = str(tmp_path / "horizonte_2012_92_de.journal.jsonl")
+    journal = ValidationJournal(path, "hash")
+    journal.record("accept", 6, "Gletscher schmelzen")
+    journal.record("fix", 8, "Bienen strben", true_page=9, true_title="Bienen sterben")
+    journal.record("delete", 10, "Impressum")
+    journal.record("accept", 10, "Agenda")
+    journal.record("delete", 10, "Agenda") # the latest decision counts
+    journal.record("add", 12, "Bücher")
+    journal.record("final")
+
+    for replayed in (journal, ValidationJournal(path, "hash")):
+        assert replayed.replay(6, "Gletscher schmelzen") == (6, "Gletscher schmelzen")
+        assert replayed.replay(8, "Bienen strben") == (9, "Bienen sterben")
+        assert replayed.replay(10, "Impressum") is None
+        assert replayed.replay(10, "Agenda") is None
+        assert replayed.replay(7, "Gletscher schmelzen") is False
+        assert replayed.additions == [(12, "Bücher")]
+        assert replayed.finalised
+
+def test_journal_ignores_other_tetml_versions(tmp_path):
+    path = str(tmp_path / "horizonte_2012_92_de.journal.jsonl")
+    ValidationJournal(path, "old").record("accept", 6, "Gletscher schmelzen")
+    journal = ValidationJournal(path, "new")
+    assert journal.replay(6, "Gletscher schmelzen") is False
+    assert not journal.finalised
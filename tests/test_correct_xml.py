@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import itertools
+import os
+import random
+from copy import deepcopy
+
+import pytest
+from lxml import etree
+
+import correct_xml
+import legacy_merger as legacy
+from articles import random_article
+from correct_xml import ArticlePrepass, article_features, check_for_odd_dropcaps, collect_page_numbers, consecutive_merger, count_font_styles, denoise, dropcap_paras, merge_dropcaps, multi_skip_merger, skip_merger
+from tools.glyph_layer import GlyphLayer, WordInfo
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = sorted(f for f in os.listdir(FIXTURES_DIR) if f.endswith("_article_boundaries.xml"))
+# written by correct_xml.py before the mergers were rewritten
+CORRECTED_DIR = os.path.join(FIXTURES_DIR, "corrected")
+
+PAGE_NUMS = {2, 3, 4, 5}
+
+def _corrected_name(fixture):
+    return "_".join(fixture.split("_")[:4]) + "_corrected.xml"
+
+def _article(*paras):
+    """
+    Returns an Article element on one page with a paragraph of words in font F1 of size 9.50 for each list of words.
+    """
+    article = etree.Element("Article", article_id="a1", title="Dossier")
+    content = etree.SubElement(etree.SubElement(article, "Page", number="3"), "Content")
+    for words in paras:
+        para = etree.SubElement(content, "Para")
+        for text in words:
+            word = etree.SubElement(para, "Word")
+            etree.SubElement(word, "Text").text = text
+            box = etree.SubElement(word, "Box", llx="1", lly="100")
+            for char in text:
+                etree.SubElement(box, "Glyph", font="F1", size="9.50").text = char
+    return article
+
+def _paras(article):
+    return [[text.text for text in para.iter("Text")] for para in article.iter("Para")]
+
+def _merged(merger, article, lang, *args):
+    """
+    Returns the merged article serialised and the merges printed by merger.
+    """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        merger(article, lang, PAGE_NUMS, 1, 9.5, *args, verbose=True)
+    return etree.tostring(article), log.getvalue()
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_correct_xml_output(fixture, tmp_path):
+    correct_xml.correct_xml(os.path.join(FIXTURES_DIR, fixture), str(tmp_path))
+    with open(os.path.join(CORRECTED_DIR, _corrected_name(fixture)), "rb") as f:
+        assert (tmp_path / _corrected_name(fixture)).read_bytes() == f.read()
+
+@pytest.mark.parametrize("lang", ["de", "en", "fr"])
+def test_consecutive_merger_same_as_legacy(lang):
+    for seed in range(300):
+        rng = random.Random(seed)
+        article = random_article(rng, rng.randint(0, 60))
+        assert _merged(consecutive_merger, deepcopy(article), lang) == _merged(legacy.consecutive_merger, article, lang)
+
+def test_consecutive_merger_on_long_articles():
+    # every paragraph ends without punctuation and the next one starts in lower case, so all of them are merged
+    article = _article(*[["wort"]] * 5000)
+    consecutive_merger(article, "de", PAGE_NUMS, 1, 9.5)
+    assert len(article.xpath(".//Para")) == 1
+    assert len(article.xpath(".//Word")) == 5000
+
+def test_skip_merger_resumes_on_the_stale_paragraphs():
+    # after merging 'wort' and 'ende.', the scan of the new paragraphs finds nothing and the interrupted scan
+    # resumes on the old paragraph list, where 'baum' is still one paragraph after the next one of 'haus'
+    article = _article(["wort"], ["haus"], ["ende."], ["baum"], ["Zelle"])
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        skip_merger(article, "de", PAGE_NUMS, 1, 9.5, 1, verbose=True)
+    assert _paras(article) == [["wort", "ende."], ["haus", "baum"], ["Zelle"]]
+    assert log.getvalue().count("1-skip merge found") == 2
+
+@pytest.mark.parametrize("n_skip", range(1, 8))
+def test_skip_merger_same_as_legacy(n_skip):
+    for seed in range(100):
+        rng = random.Random(seed)
+        article = random_article(rng, rng.randint(0, 60))
+        lang = rng.choice(["de", "en", "fr"])
+        assert _merged(skip_merger, deepcopy(article), lang, n_skip) == _merged(legacy.skip_merger, article, lang, n_skip)
+
+def _legacy_skip_merges(article, lang, page_nums, main_font, main_size, verbose=False):
+    for n_skip in range(1, 8):
+        legacy.skip_merger(article, lang, page_nums, main_font, main_size, n_skip, verbose)
+
+@pytest.mark.parametrize("lang", ["de", "en", "fr"])
+def test_multi_skip_merger_same_as_legacy(lang):
+    for seed in range(200):
+        rng = random.Random(seed)
+        article = random_article(rng, rng.randint(0, 60))
+        assert _merged(multi_skip_merger, deepcopy(article), lang) == _merged(_legacy_skip_merges, article, lang)
+
+def _fixture_articles():
+    for fixture in FIXTURES:
+        yield from etree.parse(os.path.join(FIXTURES_DIR, fixture)).getroot().iter("Article")
+
+def _random_articles(n):
+    for seed in range(n):
+        rng = random.Random(seed)
+        yield random_article(rng, rng.randint(1, 60))
+
+def test_prepass_same_as_separate_traversals():
+    for article in itertools.chain(_fixture_articles(), _random_articles(300)):
+        if article.find(".//Glyph") is None:
+            continue
+        prepass = ArticlePrepass(article)
+        paras = article.xpath(".//Para")
+        words = GlyphLayer(article)
+        assert (prepass.main_font, prepass.main_size) == count_font_styles(article)
+        assert prepass.page_nums == collect_page_numbers(article)
+        assert prepass.paras == paras
+        assert prepass.dropcap_paras == dropcap_paras(paras)
+        assert prepass.noise_tokens == [token for para in paras for token in para.xpath(".//Text") if words[token].size < 8.00 or words[token].hidden]
+        for token in article.iter("Text"):
+            assert [getattr(prepass.words[token], a) for a in WordInfo.__slots__] == [getattr(words[token], a) for a in WordInfo.__slots__]
+
+def _dropcaps_and_noise(article, prepass):
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        merge_dropcaps(article, verbose=True, prepass=prepass, words=prepass.words if prepass else None)
+        denoise(article, prepass=prepass, words=prepass.words if prepass else None)
+    return etree.tostring(article), log.getvalue()
+
+def test_dropcaps_and_noise_with_prepass_same_as_without():
+    merged = 0
+    for article in itertools.chain(_fixture_articles(), _random_articles(300)):
+        if article.find(".//Glyph") is None:
+            continue
+        with_prepass = deepcopy(article)
+        expected = _dropcaps_and_noise(article, None)
+        assert _dropcaps_and_noise(with_prepass, ArticlePrepass(with_prepass)) == expected
+        merged += expected[1].count("Dropcap merged")
+    assert merged > 0
+
+def test_odd_dropcaps_from_features_same_as_from_paragraphs():
+    marked = 0
+    for article in _random_articles(300):
+        # as in correct_article, empty paragraphs are removed by denoise before
+        denoise(article)
+        from_features = deepcopy(article)
+        check_for_odd_dropcaps(from_features, article_features(from_features, "de", PAGE_NUMS, 1, 9.5))
+        check_for_odd_dropcaps(article)
+        assert from_features.get("potential_errors") == article.get("potential_errors")
+        marked += article.get("potential_errors") == "true"
+    assert marked > 0
+
+def _run_main(capsys, *argv):
+    correct_xml.main(correct_xml.ap.parse_args(list(argv)))
+    return capsys.readouterr().out
+
+def _outputs(outdir):
+    return {name: (outdir / name).read_bytes() for name in sorted(os.listdir(outdir))}
+
+def _merge_lines(log):
+    return [line for line in log.splitlines() if "found in" in line or "merged in" in line]
+
+@pytest.mark.parametrize("pool_args", [["-j", "2"], ["-j", "2", "-a"]])
+def test_pool_same_as_serial(tmp_path, capsys, pool_args):
+    serial_log = _run_main(capsys, "-v", "-i", FIXTURES_DIR, "-o", str(tmp_path / "serial"))
+    pool_log = _run_main(capsys, "-v", "-i", FIXTURES_DIR, "-o", str(tmp_path / "pool"), *pool_args)
+    assert len(_outputs(tmp_path / "serial")) == len(FIXTURES)
+    assert _outputs(tmp_path / "pool") == _outputs(tmp_path / "serial")
+    # logs are printed in the order of the files and articles
+    assert _merge_lines(serial_log)
+    assert _merge_lines(pool_log) == _merge_lines(serial_log)
+
+def test_single_file_call(tmp_path, capsys):
+    _run_main(capsys, os.path.join(FIXTURES_DIR, FIXTURES[0]), str(tmp_path))
+    assert list(_outputs(tmp_path)) == [_corrected_name(FIXTURES[0])]
+
+def test_expand_inputs(tmp_path):
+    for name in ("b.xml", "a.xml", "c.txt"):
+        (tmp_path / name).write_text("")
+    a, b = str(tmp_path / "a.xml"), str(tmp_path / "b.xml")
+    assert correct_xml.expand_inputs([str(tmp_path)]) == [a, b]
+    assert correct_xml.expand_inputs([str(tmp_path / "*.xml"), b]) == [a, b]
+    assert correct_xml.expand_inputs([b, str(tmp_path)]) == [b, a]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+from insert_article_boundaries import assign_pages
+
+def _pages(*numbers):
+    pages = [etree.Element("Page", number=str(num)) for num in numbers]
+    pages.append(etree.Element("Page")) # page without number
+    return pages
+
+def _assigned(pages, starts):
+    return [(i, int(page.attrib["number"])) for i, page in assign_pages(pages, starts)]
+
+def test_assign_pages():
+    # article 0 covers pages 2-3, article 1 pages 4-7, the last article only its first page 8
+    assert _assigned(_pages(*range(1, 11)), [2, 4, 8]) == [(0, 2), (0, 3), (1, 4), (1, 5), (1, 6), (1, 7), (2, 8)]
+
+def test_assign_pages_to_articles_starting_on_the_same_page():
+    # article 1 has no pages of its own, the pages go to the last article starting on them
+    assert _assigned(_pages(*range(1, 8)), [2, 4, 4, 6]) == [(0, 2), (0, 3), (2, 4), (2, 5), (3, 6)]
+
+def test_assign_pages_with_missing_pages():
+    assert _assigned(_pages(2, 5, 9), [2, 4, 9]) == [(0, 2), (1, 5), (2, 9)]
+    assert _assigned(_pages(1, 2, 3), []) == []
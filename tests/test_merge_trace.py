@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import re
+
+import pytest
+from lxml import etree
+
+import correct_xml
+from merge_trace import MergeTrace, NULL_TRACE, RULE_CONSECUTIVE, RULE_DROPCAP, RULE_SKIP
+from tools.glyph_layer import GlyphLayer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# verbose lines of correct_xml.py for the merges, e.g. "1-skip merge found in a2, 'Inhalt/Sommaire/Cont...', p. 3: energie mit"
+MERGE_LINE = re.compile(r"^(?:(Consecutive)|(\d)-skip) merge found in (\S+), '.*', p\. \S+: (\S+) (\S+)$")
+DROPCAP_LINE = re.compile(r"^Dropcap merged in (\S+), ")
+
+def _traced_run(capsys, tmp_path, name, *argv):
+    trace_file = str(tmp_path / name)
+    correct_xml.main(correct_xml.ap.parse_args(["-v", "-t", trace_file, "-i", FIXTURES_DIR, "-o", str(tmp_path / "out"), *argv]))
+    with open(trace_file, encoding="utf8") as f:
+        return [json.loads(line) for line in f], capsys.readouterr().out
+
+def _logged_merges(log):
+    """
+    Returns (rule, article, tokens) of the merges printed by correct_xml.py in verbose mode, tokens only for paragraph merges.
+    """
+    merges = []
+    for line in log.splitlines():
+        match = MERGE_LINE.match(line)
+        if match:
+            rule = RULE_CONSECUTIVE if match.group(1) else RULE_SKIP.format(match.group(2))
+            merges.append((rule, match.group(3), [match.group(4), match.group(5)]))
+        match = DROPCAP_LINE.match(line)
+        if match:
+            merges.append((RULE_DROPCAP, match.group(1), None))
+    return merges
+
+def test_one_record_per_merge(tmp_path, capsys):
+    records, log = _traced_run(capsys, tmp_path, "trace.jsonl")
+    merges = [(r["rule"], r["article"], None if r["rule"] == RULE_DROPCAP else r["tokens"]) for r in records if r["rule"] == RULE_CONSECUTIVE or r["rule"] == RULE_DROPCAP or r["rule"].startswith("skip")]
+    assert merges
+    assert merges == _logged_merges(log)
+    # dropcaps are recorded with the word that received them
+    assert all(len(r["tokens"]) == 1 for r in records if r["rule"] == RULE_DROPCAP)
+    assert {r["issue"] for r in records} == {"horizonte_2006_69_de", "horizonte_2012_92_de", "horizonte_2014_100_de"}
+
+@pytest.mark.parametrize("pool_args", [["-j", "2"], ["-j", "2", "-a"]])
+def test_pool_records_same_as_serial(tmp_path, capsys, pool_args):
+    serial, _ = _traced_run(capsys, tmp_path, "serial.jsonl")
+    pool, log = _traced_run(capsys, tmp_path, "pool.jsonl", *pool_args)
+    assert pool == serial
+    # the summary is printed after the last file, with a line per issue and a total
+    summary = log.splitlines()[-5:]
+    assert summary[0].split("\t")[0] == "issue"
+    assert summary[-1].split("\t")[1:] == [str(sum(r["rule"] == rule for r in serial)) for rule in summary[0].split("\t")[1:]]
+
+def _article():
+    article = etree.fromstring('<Article article_id="a2" title="T"><Page number="4"><Content><Para>'
+                               '<Word><Text>haus</Text><Box><Glyph font="F3" size="9.50">h</Glyph></Box></Word>'
+                               '<Word><Text>baum</Text><Box><Glyph font="F1" size="8.00">b</Glyph></Box></Word>'
+                               '</Para></Content></Page></Article>')
+    return article, article.xpath(".//Text")
+
+def test_record():
+    article, tokens = _article()
+    trace = MergeTrace(issue="horizonte_2014_100_de")
+    trace.record(RULE_CONSECUTIVE, article, tokens, GlyphLayer(article))
+    trace.issue = "horizonte_2012_92_de"
+    trace.record(RULE_SKIP.format(2), article, tokens[1:], GlyphLayer(article))
+    assert trace.records[0] == {"rule": "consecutive", "issue": "horizonte_2014_100_de", "article": "a2", "page": "4",
+                                "tokens": ["haus", "baum"], "font": [3, 1], "size": [9.5, 8.0]}
+    assert trace.summary().splitlines() == ["issue\tconsecutive\tskip2", "horizonte_2012_92_de\t0\t1", "horizonte_2014_100_de\t1\t0", "total\t1\t1"]
+
+def test_extend_writes_to_the_sink(tmp_path):
+    article, tokens = _article()
+    worker = MergeTrace(issue="horizonte_2014_100_de")
+    worker.record(RULE_CONSECUTIVE, article, tokens, GlyphLayer(article))
+    with open(tmp_path / "trace.jsonl", "w", encoding="utf8") as sink:
+        trace = MergeTrace(sink)
+        trace.extend(worker.records)
+    assert trace.records == []
+    assert trace.rules == {"consecutive": 1}
+    assert [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text(encoding="utf8").splitlines()] == worker.records
+
+def test_disabled_trace_records_nothing(tmp_path, capsys):
+    correct_xml.main(correct_xml.ap.parse_args(["-i", FIXTURES_DIR, "-o", str(tmp_path)]))
+    assert NULL_TRACE.records == []
+    assert "issue\t" not in capsys.readouterr().out
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+from tools.page_lines import PageLines
+
+def _page(*words):
+    """
+    Returns a Page element with a Word for each (text, llx, lly), without Box if lly is None.
+    """
+    page = etree.Element("Page", number="3")
+    para = etree.SubElement(etree.SubElement(page, "Content"), "Para")
+    for text, llx, lly in words:
+        word = etree.SubElement(para, "Word")
+        etree.SubElement(word, "Text").text = text
+        if lly is not None:
+            box = etree.SubElement(word, "Box", llx=str(llx), lly=str(lly))
+            etree.SubElement(box, "Glyph", font="F1", size="9.50").text = text[0]
+    return page
+
+def _texts(text_elems):
+    return [text_elem.text for text_elem in text_elems]
+
+def _text(page, text):
+    return next(text_elem for text_elem in page.iter("Text") if text_elem.text == text)
+
+def test_lines_at_the_tolerance_boundary():
+    # a line starts at its lowest word and takes the words up to exactly the tolerance above it
+    page = _page(("oben", 10, 102.5), ("rechts", 50, 101.0), ("links", 10, 100.0), ("neu", 30, 101.5))
+    lines = PageLines(page)
+    assert len(lines) == 2
+    assert _texts(lines.words(0)) == ["links", "rechts"]
+    assert _texts(lines.words(1)) == ["oben", "neu"]
+    assert lines.heights == [100.0, 101.5]
+
+def test_tolerance():
+    page = _page(("a", 10, 100.0), ("b", 20, 101.0), ("c", 30, 103.0))
+    assert len(PageLines(page, tolerance=0.5)) == 3
+    assert len(PageLines(page, tolerance=3.0)) == 1
+
+def test_empty_page():
+    lines = PageLines(etree.Element("Page", number="3"))
+    assert len(lines) == 0
+    assert lines.line_at(100.0) == []
+
+def test_words_without_position():
+    page = _page(("ohne", 0, None))
+    lines = PageLines(page)
+    assert len(lines) == 0
+    unplaced = _text(page, "ohne")
+    assert lines.line_of(unplaced) is None
+    assert lines.same_line(unplaced) == lines.line_below(unplaced) == lines.line_above(unplaced) == []
+
+def test_neighbouring_lines():
+    page = _page(("titel", 10, 700.0), ("erste", 10, 500.0), ("zeile", 60, 500.5), ("fuss", 10, 40.0))
+    lines = PageLines(page)
+    assert [lines.line_of(_text(page, text)) for text in ("fuss", "erste", "zeile", "titel")] == [0, 1, 1, 2]
+    assert _texts(lines.same_line(_text(page, "zeile"))) == ["erste", "zeile"]
+    assert _texts(lines.line_below(_text(page, "erste"))) == ["fuss"]
+    assert _texts(lines.line_above(_text(page, "erste"))) == ["titel"]
+    assert lines.line_below(_text(page, "fuss")) == []
+    assert lines.line_above(_text(page, "titel")) == []
+
+def test_line_at_between_lines():
+    page = _page(("unten", 10, 100.0), ("oben", 10, 200.0))
+    lines = PageLines(page)
+    assert _texts(lines.line_at(100.0)) == ["unten"]
+    assert _texts(lines.line_at(101.0)) == ["unten"]
+    assert lines.line_at(101.5) == []
+    assert lines.line_at(150.0) == []
+    assert lines.line_at(99.5) == []
+    assert _texts(lines.line_at(200.5)) == ["oben"]
+    assert lines.line_at(300.0) == []
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+from tools.page_numbers import PageNumberMap
+
+def _page(number, *words):
+    """
+    Page of height 800 with the given (text, lly) words.
+    """
+    page = etree.Element("Page", number=str(number), height="800")
+    para = etree.SubElement(etree.SubElement(page, "Content"), "Para")
+    for text, lly in words:
+        word = etree.SubElement(para, "Word")
+        etree.SubElement(word, "Text").text = text
+        etree.SubElement(word, "Box", lly=str(lly), ury=str(lly+9))
+    return page
+
+def _pages(numbers, offset=2):
+    # printed page number in the footer, a number in the body text
+    return [_page(num, (str(num+offset), 30), ("1990", 400)) for num in numbers]
+
+def test_offset_and_folios():
+    pages = _pages(range(3, 9))
+    folios = PageNumberMap(pages)
+    assert folios.offset == 2
+    assert folios.located
+    footer, body = pages[0].iter("Text")
+    assert folios.folio(footer) == 5
+    assert not folios.is_folio(body)
+
+def test_offset_of_most_pages():
+    pages = _pages(range(3, 9)) + _pages(range(9, 11), offset=0)
+    folios = PageNumberMap(pages)
+    assert folios.offset == 2
+    assert not folios.is_folio(next(pages[-1].iter("Text")))
+
+def test_offset_ties_go_to_the_smallest_offset():
+    folios = PageNumberMap(_pages(range(3, 6), offset=-1) + _pages(range(6, 9), offset=1))
+    assert folios.offset == -1
+
+def test_not_located_on_a_single_page():
+    folios = PageNumberMap(_pages([4]))
+    assert folios.offset == 2
+    assert not folios.located
+
+def test_not_located_without_agreement():
+    folios = PageNumberMap(_pages(range(3, 6)) + _pages(range(6, 9), offset=-1) + _pages(range(9, 12), offset=4))
+    assert folios.offset == -1
+    assert not folios.located
+
+def test_not_located_without_candidates():
+    folios = PageNumberMap([_page(3, ("12", 400))])
+    assert folios.offset is None
+    assert not folios.located
+
+def test_given_offset():
+    pages = _pages([4], offset=-1)
+    folios = PageNumberMap(pages, offset=-1)
+    assert folios.located
+    assert folios.folio(next(pages[0].iter("Text"))) == 3
+    folios = PageNumberMap(offset=2)
+    folios.add_page(pages[0])
+    assert not folios.is_folio(next(pages[0].iter("Text")))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+from tools import page_ranges
+from Wordplus_Parser import TetmlFile
+from insert_article_boundaries import add_article_boundaries, add_page_ranges
+
+PAGE = """<Page number="{}" width="595.28" height="841.89">
+<Options>x</Options>
+<Content granularity="word">
+<Para>
+<Word>
+<Text>Seite</Text>
+<Box llx="50.00" lly="780.00" urx="70.00" ury="789.00">
+<Glyph font="F1" size="9.50" x="50.00" y="780.00" width="5.00">S</Glyph>
+</Box>
+</Word>
+</Para>
+</Content>
+</Page>
+"""
+
+def _write_tetml(path, n_pages):
+    with open(path, "w", encoding="utf8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<TET xmlns="http://www.pdflib.com/XML/TET3/TET-3.0" version="3.0">\n<!-- c -->\n<Document filename="x.pdf">\n<Pages>\n')
+        for num in range(1, n_pages+1):
+            f.write(PAGE.format(num))
+        f.write("</Pages>\n</Document>\n</TET>\n")
+
+def _items(root):
+    return [(str(e.tag), e.items(), e.text, e.tail) for e in root.iter()]
+
+def _boundaries(tmp_path, monkeypatch):
+    """
+    Writes the materialised and the page range article boundary file of the same TETML and contents.
+    """
+    tetml_file = str(tmp_path / "horizonte_2014_100_de.tetml")
+    _write_tetml(tetml_file, 8)
+    contents = [(2, "Editorial"), (4, "Inhalt"), (4, "Kurz"), (5, "Gletscher"), (8, "Letzte Seite")]
+    for name, write in (("materialised", add_article_boundaries), ("ranges", lambda tetml, contents: add_page_ranges(tetml, contents, tetml_file))):
+        (tmp_path / name).mkdir()
+        monkeypatch.chdir(tmp_path / name)
+        write(TetmlFile(tetml_file), contents)
+    outfile = "horizonte_2014_100_de_NNS_article_boundaries.xml"
+    return str(tmp_path / "materialised" / outfile), str(tmp_path / "ranges" / outfile)
+
+def test_page_ranges_parse_like_materialised_file(tmp_path, monkeypatch):
+    materialised, ranges = _boundaries(tmp_path, monkeypatch)
+    assert page_ranges.is_page_ranges(ranges)
+    assert not page_ranges.is_page_ranges(materialised)
+    assert _items(page_ranges.parse(ranges).getroot()) == _items(etree.parse(materialised).getroot())
+    assert [_items(article) for article in page_ranges.iter_articles(ranges)] == [_items(article) for article in etree.parse(materialised).getroot()]
+
+def test_emptied_content_is_written_alike(tmp_path, monkeypatch):
+    outputs = []
+    for tree in (etree.parse(path) for path in _boundaries(tmp_path, monkeypatch)):
+        if page_ranges.is_page_ranges(tree.docinfo.URL):
+            tree = page_ranges.parse(tree.docinfo.URL)
+        for para in tree.getroot().iter("Para"):
+            para.getparent().remove(para)
+        outputs.append(etree.tostring(tree, pretty_print=True))
+    assert outputs[0] == outputs[1]
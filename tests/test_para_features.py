@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+from lxml import etree
+
+from articles import random_article
+from correct_xml import article_features, consecutive_merger, multi_skip_merger
+from tools.glyph_layer import GlyphLayer
+
+def _features(seed, lang):
+    rng = random.Random(seed)
+    article = random_article(rng, rng.randint(0, 40))
+    return article, article_features(article, lang, {2, 3, 4, 5}, 1, 9.5)
+
+@pytest.mark.parametrize("lang", ["de", "en", "fr"])
+def test_mask_same_as_pair_rules(lang):
+    for seed in range(200):
+        _, features = _features(seed, lang)
+        rng = random.Random(seed)
+        rows = sorted(rng.sample(range(len(features)), rng.randint(0, len(features))))
+        for rule in (features.consecutive, features.skip):
+            for distance in (1, 2, 8):
+                for subset in (None, rows):
+                    checked = range(len(features)) if subset is None else subset
+                    expected = bytearray(rule(checked[i], checked[i+distance]) for i in range(len(checked)-distance))
+                    assert features.mask(rule, distance, subset) == expected
+
+def test_mask_of_other_rules():
+    _, features = _features(1, "de")
+    same_font = lambda r1, r2: features.final_font[r1] == features.initial_font[r2]
+    assert features.mask(same_font, 1) == bytearray(same_font(r, r+1) for r in range(len(features)-1))
+
+def test_mask_after_merges():
+    article, features = _features(3, "de")
+    consecutive_merger(article, "de", {2, 3, 4, 5}, 1, 9.5, features=features)
+    multi_skip_merger(article, "de", {2, 3, 4, 5}, 1, 9.5, features=features)
+    rows = [r for r, para in enumerate(features.paras) if para.getparent() is not None]
+    assert len(rows) < len(features)
+    assert features.mask(features.skip, 2, rows) == bytearray(features.skip(rows[i], rows[i+2]) for i in range(len(rows)-2))
+    # no merges are left after the mergers
+    assert not any(features.mask(features.consecutive, 1, rows))
+
+def test_words_without_font_or_size_are_not_merged():
+    article = etree.fromstring("""<Article article_id="a1" title="T"><Page number="3"><Content>
+        <Para><Word><Text>der</Text><Box><Glyph font="F1">d</Glyph></Box></Word></Para>
+        <Para><Word><Text>haus</Text><Box><Glyph font="F1" size="9.50">h</Glyph></Box></Word><Word><Text>und</Text><Box><Glyph size="9.50">u</Glyph></Box></Word></Para>
+        <Para><Word><Text>weiter</Text><Box><Glyph font="F1" size="9.50">w</Glyph></Box></Word></Para>
+        </Content></Page></Article>""")
+    features = article_features(article, "de", set(), 1, 9.5, GlyphLayer(article))
+    assert list(features.has_initial) == [0, 1, 1]
+    assert list(features.final_consecutive) == list(features.final_skip) == [0, 0, 1]
+    assert not any(features.mask(features.consecutive, 1)) and not any(features.mask(features.skip, 1))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import legacy_punctuation as legacy
+from punctuation import restore_punctuation
+
+LEGACY = {"de": legacy.restore_punctuation, "en": legacy.restore_punctuation, "fr": legacy.restore_french_punctuation}
+
+VOCABULARY = legacy.punctuation + legacy.opening + legacy.closing + legacy.both + legacy.contractions + legacy.fr_contractions + \
+    ["L", "Qu", "D", "word", "Haus", "12", "000", "7", "", "“x", ".”", ")x", "’s", "a", "(b"]
+
+@pytest.mark.parametrize("words, lang, expected", [
+    (["“", "It", "’", "s", "a", "house", ".", "”"], "en", "“It’s a house.”"),
+    (["she", "'", "ll", "come", "(", "soon", ")"], "en", "she'll come (soon)"),
+    (["600", "’", "000", "Franken"], "de", "600’000 Franken"),
+    (["‹", "aufgezogen", "›", ","], "de", "‹aufgezogen›,"),
+    (["l", "'", "amour", "«", "fou", "»", "!"], "fr", "l'amour «fou»!"),
+    ("Crimes and Punishments ’", "en", "Crimes and Punishments’"),
+    (["-", "-"], "de", "--"),
+    ([], "de", ""),
+])
+def test_examples(words, lang, expected):
+    assert restore_punctuation(words, lang) == expected
+
+def _legacy(words, lang):
+    try:
+        return LEGACY[lang](list(words))
+    except (TypeError, AttributeError): # e.g. missing words, which the old rules did not handle everywhere
+        return None
+
+@pytest.mark.parametrize("lang", ["de", "en", "fr"])
+def test_same_as_legacy_rules(lang):
+    rng = random.Random(lang)
+    compared = 0
+    for _ in range(20000):
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(0, 9))]
+        if words and rng.random() < 0.05:
+            words[rng.randrange(len(words))] = None
+        expected = _legacy(words, lang)
+        if expected is None:
+            continue
+        assert restore_punctuation(list(words), lang) == expected, words
+        compared += 1
+    assert compared > 15000
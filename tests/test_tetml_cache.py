@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+from lxml import etree
+
+from tools import tetml_cache
+from tools.tetml_cache import TetmlCache, content_hash
+from Wordplus_Parser import TetmlFile
+
+TETML = """<?xml version="1.0" encoding="UTF-8"?>
+<TET xmlns="http://www.pdflib.com/XML/TET3/TET-3.0" version="5.1">
+<Document filename="horizonte_2014_100_de.pdf">
+<Pages>
+{}
+</Pages>
+</Document>
+</TET>
+"""
+
+def _write_tetml(path, *pages):
+    page_elems = "\n".join('<Page number="{}"><Content><Para><Word><Text>{}</Text><Box llx="1" lly="2" urx="3" ury="4"/></Word></Para></Content></Page>'.format(num, text) for num, text in pages)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(TETML.format(page_elems))
+    return str(path)
+
+@pytest.fixture
+def tetml_file(tmp_path):
+    return _write_tetml(tmp_path / "horizonte_2014_100_de.tetml", (1, "editorial"), (2, "inhalt"), (3, "Bienen"), (5, "Gletscher"))
+
+def _serialised(pages):
+    return [etree.tostring(page) for page in pages]
+
+def test_key_changes_with_content_and_version(tmp_path, tetml_file, monkeypatch):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    other_file = _write_tetml(tmp_path / "other.tetml", (1, "editorial"))
+    key = cache.key(tetml_file)
+    assert key == cache.key(tetml_file)
+    assert key != cache.key(other_file)
+    monkeypatch.setattr(tetml_cache, "PARSER_VERSION", tetml_cache.PARSER_VERSION + 1)
+    assert key != cache.key(tetml_file)
+
+def test_key_with_digest_does_not_hash(tmp_path, tetml_file, monkeypatch):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    key = cache.key(tetml_file)
+    digest = content_hash(tetml_file)
+    monkeypatch.setattr(tetml_cache, "content_hash", None)
+    assert cache.key(tetml_file, digest) == key
+    TetmlFile(tetml_file, cache, digest)
+
+def test_miss_then_hit(tmp_path, tetml_file, monkeypatch):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    assert cache.load(cache.key(tetml_file)) is None
+
+    parsed = TetmlFile(tetml_file, cache)
+    expected = _serialised(TetmlFile(tetml_file).pages)
+    assert _serialised(parsed.pages) == expected
+
+    # a hit never parses the TETML file
+    monkeypatch.setattr(TetmlFile, "_parse_NNS", None)
+    cached = TetmlFile(tetml_file, cache)
+    assert cached.num_of_pages == 4
+    assert cached.tetml.tag == "Document"
+    assert cached.get_page(5).xpath(".//Text")[0].text == "Gletscher"
+    assert cached.get_page(4) is None
+    assert _serialised(cached.get_page_range(2, 6)) == expected[1:]
+    assert sorted(cached.page_index) == [1, 2, 3, 5]
+    assert _serialised(cached.pages[1:3]) == expected[1:3]
+    assert _serialised(cached.pages) == expected
+
+def test_version_change_is_a_miss(tmp_path, tetml_file, monkeypatch):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    TetmlFile(tetml_file, cache)
+    assert cache.load(cache.key(tetml_file)) is not None
+    monkeypatch.setattr(tetml_cache, "PARSER_VERSION", tetml_cache.PARSER_VERSION + 1)
+    assert cache.load(cache.key(tetml_file)) is None
+
+def test_incomplete_entry_is_a_miss(tmp_path, tetml_file):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    TetmlFile(tetml_file, cache)
+    key = cache.key(tetml_file)
+    path = cache._path(key)
+    with open(path, "rb") as f:
+        entry = f.read()
+    with open(path, "wb") as f:
+        f.write(entry[:len(entry)//2])
+    assert cache.load(key) is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    files = [_write_tetml(tmp_path / "{}.tetml".format(i), (1, "Wort{}".format(i))) for i in range(4)]
+    keys = [cache.key(f) for f in files]
+    for i, f in enumerate(files[:3]):
+        TetmlFile(f, cache)
+        os.utime(cache._path(keys[i]), (1000+i, 1000+i))
+    sizes = [os.path.getsize(cache._path(key)) for key in keys[:3]]
+
+    # loading marks the oldest entry as recently used
+    assert cache.load(keys[0]) is not None
+    cache.max_bytes = sum(sizes) - 1
+    TetmlFile(files[3], cache)
+
+    assert [os.path.exists(cache._path(key)) for key in keys] == [True, False, False, True]
+
+def test_evict_under_the_cap_keeps_everything(tmp_path, tetml_file):
+    cache = TetmlCache(str(tmp_path / "cache"))
+    TetmlFile(tetml_file, cache)
+    cache.max_bytes = os.path.getsize(cache._path(cache.key(tetml_file)))
+    cache.evict()
+    assert cache.load(cache.key(tetml_file)) is not None
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import os
+from collections import Counter
+
+import pytest
+from lxml import etree
+
+import correct_xml
+import text_extractor
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = sorted(f for f in os.listdir(FIXTURES_DIR) if f.endswith("_article_boundaries.xml"))
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_extract_and_restore_same_as_separate_passes(fixture, tmp_path, capsys):
+    correct_xml.correct_xml(os.path.join(FIXTURES_DIR, fixture), str(tmp_path))
+    doc_id = "_".join(fixture.split("_")[:4])
+    corrected = str(tmp_path / (doc_id + "_corrected.xml"))
+
+    streamed, separate = str(tmp_path / "streamed.xml"), str(tmp_path / "separate.xml")
+    text_extractor.extract_and_restore(corrected, streamed, "de")
+    text_extractor.write_output(text_extractor.restore_xml_tree(corrected, text_extractor.extract_text(corrected, "de"), "de"), separate)
+
+    with open(streamed, "rb") as f1, open(separate, "rb") as f2:
+        output = f1.read()
+        assert output == f2.read()
+    assert output.count(b"<div>") > 10
+
+def test_extract_and_restore_reads_the_input_once(tmp_path, monkeypatch):
+    fixture = os.path.join(FIXTURES_DIR, FIXTURES[0])
+    opened = []
+    iterparse = text_extractor.etree.iterparse
+    def counting_iterparse(source, *args, **kwargs):
+        opened.append(source)
+        return iterparse(source, *args, **kwargs)
+    monkeypatch.setattr(text_extractor.etree, "iterparse", counting_iterparse)
+    monkeypatch.setattr(text_extractor.page_ranges, "is_page_ranges", None)
+    text_extractor.extract_and_restore(fixture, str(tmp_path / "out.xml"), "de")
+    assert opened == [fixture]
+
+def _article(*pages):
+    article = etree.Element("Article")
+    for num, folio in pages:
+        word = etree.SubElement(etree.SubElement(etree.SubElement(etree.SubElement(article, "Page", number=str(num), height="800"), "Content"), "Para"), "Word")
+        etree.SubElement(word, "Text").text = str(folio)
+        etree.SubElement(word, "Box", lly="30", ury="39")
+    return article
+
+def test_locate_folios_on_the_first_pages():
+    articles = [_article((3, 5), (4, 6)), _article((5, 7), (6, 8)), _article((7, 1), (8, 1)), _article((9, 1))]
+    read = []
+    def iter_read():
+        for article in articles:
+            read.append(article)
+            yield article
+    located = text_extractor.locate_folios(iter_read(), n_pages=4)
+    article, folios = next(located)
+    # the offset is decided after the first four pages with numbers in their footer
+    assert read == articles[:2]
+    assert folios.offset == 2
+    assert [article for article, _ in located] == articles[1:]
+
+def test_locate_folios_without_agreement():
+    articles = [_article((3, 5)), _article((4, 1), (5, 7))]
+    assert [folios for _, folios in text_extractor.locate_folios(articles)] == [None, None]
+    assert list(text_extractor.locate_folios([])) == []
+
+@pytest.mark.parametrize("text, expected", [
+    # contact boxes
+    ("www. snf. ch", "www.snf.ch"),
+    ("Kontakt: info@ snf. ch, www. snf. ch", "Kontakt: info@snf.ch, www.snf.ch"),
+    ("www. bfs. admin. ch / bfs / portal / de / index. html", "www.bfs.admin.ch/bfs/portal/de/index.html"),
+    # several addresses per paragraph
+    ("www. snf. ch und www. ethz. ch / en sowie presse@ snf. ch oder a. b@ unibe. ch",
+     "www.snf.ch und www.ethz.ch/en sowie presse@snf.ch oder a. b@unibe.ch"),
+    # trailing sentence punctuation stays outside the address
+    ("Siehe www. snf. ch.", "Siehe www.snf.ch."),
+    ("Siehe www. snf. ch / de / index. html. Danach", "Siehe www.snf.ch/de/index.html. Danach"),
+    ("Fragen an info@ snf. ch?", "Fragen an info@snf.ch?"),
+    ("(www. snf. ch)", "(www.snf.ch)"),
+    # a spaced slash before a capitalised word or a function word is prose
+    ("Siehe www. snf. ch / Forschung / und mehr", "Siehe www.snf.ch / Forschung / und mehr"),
+    ("www. snf. ch / de / und so", "www.snf.ch/de / und so"),
+    ("www. snf. ch/Forschung", "www.snf.ch/Forschung"),
+    ("Lehre / Forschung", "Lehre / Forschung"),
+])
+def test_fix_urls_emails(text, expected):
+    assert text_extractor.fix_urls_emails(text) == expected
+
+@pytest.mark.parametrize("text, lang, expected", [
+    ("z. B. im Labor", "de", "z.B. im Labor"),
+    ("Z. B. im Labor", "de", "Z.B. im Labor"),
+    ("das heisst, d. h. nichts", "de", "das heisst, d.h. nichts"),
+    ("i. e. the lab", "en", "i.e. the lab"),
+    ("I. e. the lab", "en", "I.e. the lab"),
+    # the abbreviations of all languages are restored, as before they were kept per language
+    ("e. g. im Labor", "de", "e.g. im Labor"),
+    ("z. B. dans le labo", "fr", "z.B. dans le labo"),
+    # no match inside a word
+    ("Netz. B. Müller", "de", "Netz. B. Müller"),
+    ("Bi. e. ", "en", "Bi. e. "),
+])
+def test_restore_abbreviations(text, lang, expected):
+    assert text_extractor.restore_abbreviations(text, lang) == expected
+
+@pytest.fixture
+def abbreviations(monkeypatch):
+    monkeypatch.setattr(text_extractor, "abbr_patterns", {})
+    monkeypatch.setattr(text_extractor, "abbr", {
+        "de": {"u. a.": "u.a.", "u. a. m.": "u.a.m.", "s. o.": "s.o."},
+        "en": {"s. o.": "s.o.!"},
+        "fr": {},
+        })
+
+def test_restore_abbreviations_longest_match(abbreviations):
+    assert text_extractor.restore_abbreviations("Bienen u. a. m. und u. a. Wespen", "de") == "Bienen u.a.m. und u.a. Wespen"
+    assert text_extractor.restore_abbreviations("U. a. m.", "de") == "U.a.m."
+
+def test_restore_abbreviations_of_the_language_take_precedence(abbreviations):
+    assert text_extractor.restore_abbreviations("s. o.", "de") == "s.o."
+    assert text_extractor.restore_abbreviations("s. o.", "en") == "s.o.!"
+
+def test_restore_abbreviations_counts(abbreviations):
+    counts = Counter()
+    text_extractor.restore_abbreviations("u. a. m. und U. a. und u. a.", "de", counts)
+    assert counts == {"u. a. m.": 1, "u. a.": 2}
+
+def test_extract_and_restore_counts_per_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_extractor, "abbr_patterns", {})
+    monkeypatch.setattr(text_extractor, "abbr", {"de": {"der": "der"}})
+    fixture = os.path.join(FIXTURES_DIR, FIXTURES[0])
+    counts = text_extractor.extract_and_restore(fixture, str(tmp_path / "out.xml"), "de")
+    assert counts["der"] > 0
+    assert text_extractor.extract_and_restore(fixture, str(tmp_path / "out.xml"), "de") == counts
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+from Wordplus_Parser import TetmlFile
+
+def _page(number, *words):
+    page = etree.Element("Page", number=str(number))
+    para = etree.SubElement(etree.SubElement(page, "Content"), "Para")
+    for text in words:
+        etree.SubElement(etree.SubElement(para, "Word"), "Text").text = text
+    return page
+
+def _tetml(*pages):
+    tetml = TetmlFile.__new__(TetmlFile)
+    tetml.filename = "horizonte_2012_92_de"
+    tetml.pages = []
+    tetml.page_index = {}
+    for page in pages:
+        tetml._add_page(page)
+    return tetml
+
+CONTENTS = {10: "Bienen sterben", 12: "Gletscher schmelzen"}
+
+def test_detect_offset_breaks_ties_toward_zero():
+    # every title is found both one page before and on the page it points to
+    tetml = _tetml(_page(9, "Bienen", "sterben"), _page(10, "Bienen", "sterben"), _page(11, "Gletscher", "schmelzen"), _page(12, "Gletscher", "schmelzen"))
+    assert tetml._detect_offset(CONTENTS) == (0, 1.0, 1.0)
+
+def test_detect_offset_breaks_ties_toward_zero_without_matches():
+    assert _tetml()._detect_offset(CONTENTS) == (0, 0.0, 0.0)
+
+def test_detect_offset():
+    tetml = _tetml(_page(11, "Bienen", "sterben"), _page(13, "Gletscher", "schmelzen"))
+    assert tetml._detect_offset(CONTENTS) == (1, 1.0, 0.0)
+
+def test_choose_offset_without_confidence_falls_back_to_no_offset(capsys):
+    tetml = _tetml(_page(9, "Bienen", "sterben"), _page(10, "Bienen", "sterben"))
+    assert tetml._choose_offset(CONTENTS, -1, interactive=False) == 0
+    assert "horizonte_2012_92_de" in capsys.readouterr().out
+
+def test_choose_offset_asks_without_confidence(monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda prompt: "y")
+    assert _tetml()._choose_offset(CONTENTS, -1, interactive=True) == -1
+
+def test_choose_offset_confident():
+    tetml = _tetml(_page(9, "Bienen", "sterben"), _page(11, "Gletscher", "schmelzen"))
+    assert tetml._choose_offset(CONTENTS, +1, interactive=False) == -1
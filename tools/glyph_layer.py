@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Precomputed glyph attributes for the Word elements of a (part of a) TETML tree.
+## Replaces per-token XPath lookups such as
+## float(token.getnext().xpath("./Glyph/@size")[0]) with a dictionary lookup:
+##     words = GlyphLayer(article_tag)
+##     words[token].size
+###############################################################################
+
+class WordInfo(object):
+    """
+    Glyph attributes of a single Word element, read from its Text, Box and first Glyph.
+
+    Attributes:
+        text (string): text of the word
+        font (int): font number of the first glyph, e.g. 'F3' --> 3
+        size (float): font size of the first glyph
+        lly (float): lower y coordinate of the word box
+        dropcap (bool): True if the first glyph is a dropcap
+        hidden (bool): True if the first glyph carries both 'alpha' and 'beta' (hidden text)
+    """
+    __slots__ = ("text", "font", "size", "lly", "dropcap", "hidden")
+
+    def __init__(self, text_elem):
+        self.text = text_elem.text
+        self.font = None
+        self.size = None
+        self.lly = None
+        self.dropcap = False
+        self.hidden = False
+
+        box = text_elem.getnext()
+        if box is None:
+            return
+
+        if "lly" in box.attrib:
+            self.lly = float(box.attrib["lly"])
+
+        glyph = box.find("Glyph")
+        if glyph is None:
+            return
+
+        try:
+            self.font = int(glyph.attrib["font"][1:])
+        except (KeyError, ValueError):
+            pass
+        try:
+            self.size = float(glyph.attrib["size"])
+        except KeyError:
+            pass
+        self.dropcap = glyph.get("dropcap") == "true"
+        self.hidden = "alpha" in glyph.attrib and "beta" in glyph.attrib
+
+class GlyphLayer(object):
+    """
+    Computes the WordInfo of every Text element below elem in a single pass.
+    Lookups are keyed by Text element. Text elements outside elem are computed on first access.
+    Without elem, the layer starts empty and is filled with add, e.g. during a traversal of its own.
+    """
+
+    def __init__(self, elem=None):
+        self._words = {}
+        if elem is not None:
+            for text_elem in elem.iter("Text"):
+                self._words[text_elem] = WordInfo(text_elem)
+
+    def __getitem__(self, text_elem):
+        try:
+            return self._words[text_elem]
+        except KeyError:
+            info = self._words[text_elem] = WordInfo(text_elem)
+            return info
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, text_elem):
+        """
+        Computes and stores the attributes of a word, returns its WordInfo.
+        """
+        info = self._words[text_elem] = WordInfo(text_elem)
+        return info
+
+    def refresh(self, text_elem):
+        """
+        Recomputes the attributes of a word after its Text or Glyph elements have been modified, e.g. when a dropcap is merged into it.
+        """
+        info = self._words[text_elem] = WordInfo(text_elem)
+        return info
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Spatial index over the words of a TETML page.
+## Words are bucketed into lines by the lly of their Box, with a tolerance, and
+## sorted by llx within a line:
+##     lines = PageLines(page)
+##     lines.same_line(text_elem)   # all words on the line of text_elem, left to right
+##     lines.line_below(text_elem)  # the words of the next line below
+##     lines.line_at(y)             # the words of the line at height y
+## Lines are kept in ascending order of lly (PDF coordinates, i.e. bottom to top),
+## so that lookups by height are binary searches.
+###############################################################################
+
+import bisect
+
+from tools.glyph_layer import GlyphLayer
+
+class PageLines(object):
+    """
+    Lines of words of a page (or any element containing Word elements), keyed by Text element.
+
+    Args:
+        page (_Element): Page element
+        words (GlyphLayer): optional glyph layer of page, computed if not given
+        tolerance (float): maximum difference in lly between the lowest word of a line and any other word of the same line
+    """
+
+    def __init__(self, page, words=None, tolerance=1.0):
+        if words is None:
+            words = GlyphLayer(page)
+        self.tolerance = tolerance
+
+        positioned = []
+        for text_elem in page.iter("Text"):
+            info = words[text_elem]
+            if info.lly is None:
+                continue
+            box = text_elem.getnext()
+            llx = float(box.get("llx", 0))
+            positioned.append((info.lly, llx, text_elem))
+
+        # ascending lly, a line starts at its lowest word
+        positioned.sort(key=lambda item: (item[0], item[1]))
+
+        self.lines = [] # list of lists of (llx, Text element), sorted by llx
+        self.heights = [] # lly of the lowest word of each line
+        self._line_of = {} # Text element --> line index
+
+        for lly, llx, text_elem in positioned:
+            if not self.heights or lly - self.heights[-1] > tolerance:
+                self.heights.append(lly)
+                self.lines.append([])
+            self.lines[-1].append((llx, text_elem))
+            self._line_of[text_elem] = len(self.lines)-1
+
+        for line in self.lines:
+            line.sort(key=lambda item: item[0])
+
+    def __len__(self):
+        return len(self.lines)
+
+    def line_of(self, text_elem):
+        """
+        Returns the index of the line of text_elem, or None if the word has no position.
+        """
+        return self._line_of.get(text_elem)
+
+    def words(self, index):
+        """
+        Returns the Text elements of line index from left to right.
+        """
+        return [text_elem for _, text_elem in self.lines[index]]
+
+    def same_line(self, text_elem):
+        """
+        Returns the Text elements on the same line as text_elem from left to right, text_elem included.
+        """
+        index = self.line_of(text_elem)
+        if index is None:
+            return []
+        return self.words(index)
+
+    def line_below(self, text_elem):
+        """
+        Returns the Text elements of the next line below text_elem from left to right, or an empty list.
+        """
+        index = self.line_of(text_elem)
+        if index is None or index == 0:
+            return []
+        return self.words(index-1)
+
+    def line_above(self, text_elem):
+        """
+        Returns the Text elements of the next line above text_elem from left to right, or an empty list.
+        """
+        index = self.line_of(text_elem)
+        if index is None or index == len(self.lines)-1:
+            return []
+        return self.words(index+1)
+
+    def line_at(self, y):
+        """
+        Returns the Text elements of the line at height y from left to right, or an empty list if no line is within the tolerance.
+        """
+        index = bisect.bisect_right(self.heights, y)-1
+        if index < 0 or y - self.heights[index] > self.tolerance:
+            return []
+        return self.words(index)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## Map of the printed page numbers (folios) of a document, keyed by Text element.
+## A word is a folio if it is a number in the header or footer band of its page and
+## agrees with the number attribute of its Page up to the offset between printed and
+## PDF page numbers, which is the most common one of the whole document:
+##     folios = PageNumberMap(root.iter("Page"))
+##     folios.located               # enough pages agree on the offset
+##     folios.is_folio(text_elem)
+##     folios.folio(text_elem)      # printed page number or None
+## Page numbers are located if at least MIN_PAGES pages, and at least MIN_SHARE of the
+## pages with numbers in their bands, agree on the offset. With a given offset, e.g. decided
+## on the first pages of a document, the map is located and only the geometry is
+## checked, pages can then be added one at a time while streaming articles:
+##     folios = PageNumberMap(offset=PageNumberMap(first_pages).offset)
+###############################################################################
+
+from collections import Counter
+
+# share of the page height at the top and at the bottom of a page where page numbers are printed
+BAND = 0.1
+# pages, and share of the pages with numbers in their bands, that must agree on the offset
+MIN_PAGES = 3
+MIN_SHARE = 0.5
+
+class PageNumberMap(object):
+    """
+    Printed page numbers of a document.
+
+    Args:
+        pages (iterable): Page elements
+        band (float): share of the page height forming the header and the footer band
+        offset (int): difference between printed and PDF page numbers, estimated from the pages if None
+        min_pages (int): number of pages that must agree on the estimated offset
+        min_share (float): share of the pages with candidates that must agree on the estimated offset
+    """
+
+    def __init__(self, pages=(), band=BAND, offset=None, min_pages=MIN_PAGES, min_share=MIN_SHARE):
+        self.band = band
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self._offset = offset
+        self._candidates = {} # Text element --> (printed number, PDF page number)
+        self._offsets = Counter() # offset --> number of pages with a candidate at this offset
+        self.candidate_pages = 0 # number of pages with candidates
+        for page in pages:
+            self.add_page(page)
+
+    def add_page(self, page):
+        """
+        Collects the numbers in the header and footer band of a page.
+        """
+        try:
+            num = int(page.attrib["number"])
+        except (KeyError, ValueError):
+            return
+
+        numbers = []
+        top = 0.0
+        for text_elem in page.iter("Text"):
+            text = text_elem.text
+            box = text_elem.getnext()
+            if box is None or "lly" not in box.attrib:
+                continue
+            ury = float(box.get("ury", box.attrib["lly"]))
+            top = max(top, ury)
+            if text and text.isdigit():
+                try:
+                    numbers.append((text_elem, int(text), float(box.attrib["lly"]), ury))
+                except ValueError: # e.g. '❷'
+                    continue
+
+        if not numbers:
+            return
+
+        # without page height, the band is measured from the highest word of the page
+        height = float(page.get("height", top))
+        offsets = set()
+        for text_elem, value, lly, ury in numbers:
+            if lly <= self.band * height or ury >= (1-self.band) * height:
+                self._candidates[text_elem] = (value, num)
+                offsets.add(value - num)
+
+        if offsets:
+            self._offsets.update(offsets)
+            self.candidate_pages += 1
+
+    @property
+    def offset(self):
+        """
+        Offset between printed and PDF page numbers, the one of most pages with candidates (ties go to the smallest offset), or None if there are no candidates.
+        """
+        if self._offset is not None:
+            return self._offset
+        if not self._offsets:
+            return None
+        return max(self._offsets.items(), key=lambda item: (item[1], -abs(item[0])))[0]
+
+    @property
+    def located(self):
+        """
+        True if page numbers can be told apart by position, i.e. if the offset is given or enough pages agree on it.
+        """
+        if self._offset is not None:
+            return True
+        offset = self.offset
+        if offset is None:
+            return False
+        agreeing = self._offsets[offset]
+        return agreeing >= self.min_pages and agreeing >= self.min_share * self.candidate_pages
+
+    def folio(self, text_elem):
+        """
+        Returns the printed page number of text_elem, or None if it is no page number.
+        """
+        candidate = self._candidates.get(text_elem)
+        if candidate is None:
+            return None
+        value, num = candidate
+        return value if value - num == self.offset else None
+
+    def is_folio(self, text_elem):
+        """
+        Returns True if text_elem is a printed page number.
+        """
+        return self.folio(text_elem) is not None
+
+    def __contains__(self, text_elem):
+        return self.is_folio(text_elem)
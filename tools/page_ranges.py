@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## "Virtual" article boundary files that reference the TETML instead of copying its pages.
+## A page range file stores only article ids, titles and page ranges:
+##
+##     <Document document_id="horizonte_2014_100_de_NNS_article_boundaries.xml" tetml="horizonte_2014_100_de.tetml">
+##       <Article article_id="a1" title="Editorial" first_page="2" last_page="3"/>
+##       <Article article_id="a2" title="Inhalt" first_page="4" last_page="4"/>
+##     </Document>
+##
+## The tetml path is relative to the page range file. Readers resolve the pages lazily
+## by streaming the TETML, so that an article is complete as soon as its last page has
+## been read. Articles without pages of their own carry no range attributes.
+###############################################################################
+
+from lxml import etree
+import bisect
+import os
+
+from tools.tetml import iter_pages
+
+TETML_ATTRIB = "tetml"
+FIRST_PAGE = "first_page"
+LAST_PAGE = "last_page"
+
+###############################################################################
+
+def write_page_ranges(outfile, tetml_file, document_id, articles):
+    """
+    Writes a page range file.
+
+    Args:
+        outfile (string): path to page range output file
+        tetml_file (string): path to the TETML file the pages are read from
+        document_id (string): document_id attribute of the Document element
+        articles (list): (attrib, first page, last page) tuples in page order, first and last page are None for articles without pages
+    """
+    tetml_path = os.path.relpath(os.path.abspath(tetml_file), os.path.dirname(os.path.abspath(outfile)))
+
+    root = etree.Element("Document", attrib={"document_id": document_id, TETML_ATTRIB: tetml_path})
+    for attrib, first, last in articles:
+        article = etree.SubElement(root, "Article", attrib=attrib)
+        if first is not None:
+            article.set(FIRST_PAGE, str(first))
+            article.set(LAST_PAGE, str(last))
+
+    etree.ElementTree(root).write(outfile, pretty_print=True, xml_declaration=True, encoding="utf-8")
+
+def is_page_ranges(path):
+    """
+    Returns True if path is a page range file, i.e. an xml file whose root element references a TETML file.
+    """
+    for _, elem in etree.iterparse(path, events=("start",)):
+        return TETML_ATTRIB in elem.attrib
+    return False
+
+def _read(path):
+    """
+    Reads a page range file and returns its root element and the path of the referenced TETML file.
+    """
+    root = etree.parse(path).getroot()
+    tetml_file = os.path.join(os.path.dirname(os.path.abspath(path)), root.attrib[TETML_ATTRIB])
+    return root, tetml_file
+
+def _indent(article):
+    """
+    Indents the pages of an article as in a pretty printed article boundary file, so that the blank text
+    between the elements is the same as when the materialised file is parsed.
+    """
+    etree.indent(article, space="  ", level=1)
+    return article
+
+def iter_articles(path):
+    """
+    Yields the Article elements of a page range file one at a time, with their Page elements read from the TETML.
+    The range attributes are removed, so that the articles look like those of a materialised article boundary file.
+    """
+    root, tetml_file = _read(path)
+    articles = list(root)
+
+    # page ranges in page order: (first page, last page, article index)
+    ranges = []
+    for i, article in enumerate(articles):
+        if FIRST_PAGE in article.attrib:
+            ranges.append((int(article.attrib.pop(FIRST_PAGE)), int(article.attrib.pop(LAST_PAGE)), i))
+    ranges.sort()
+    firsts = [first for first, _, _ in ranges]
+
+    next_article = 0 # articles before next_article have been yielded
+
+    if ranges:
+        for page in iter_pages(tetml_file):
+            try:
+                num = int(page.attrib["number"])
+            except KeyError: # page has no attrib "number"
+                continue
+            if num > ranges[-1][1]:
+                break
+
+            r = bisect.bisect_right(firsts, num)-1
+            if r < 0 or num > ranges[r][1]: # page outside of all articles
+                page.clear()
+                continue
+            i = ranges[r][2]
+
+            # all articles before i are complete
+            while next_article < i:
+                yield _indent(articles[next_article])
+                next_article += 1
+
+            # moves the page from the TETML tree into the article
+            articles[i].append(page)
+
+    while next_article < len(articles):
+        yield _indent(articles[next_article])
+        next_article += 1
+
+def parse(path):
+    """
+    Drop-in for etree.parse: returns the xml tree of a page range file with all pages resolved,
+    or the tree of an xml file.
+    """
+    if not is_page_ranges(path):
+        return etree.parse(path)
+
+    root, _ = _read(path)
+    document = etree.Element(root.tag, attrib={"document_id": root.attrib["document_id"]})
+    document.text = root.text
+    for article in iter_articles(path):
+        document.append(article)
+    return etree.ElementTree(document)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from lxml import etree
+
+def localname(tag):
+    """
+    Returns the tag name without its namespace, e.g. '{http://www.pdflib.com/XML/TET3/TET-3.0}Page' --> 'Page'.
+    """
+    return tag.rsplit("}", 1)[-1]
+
+def iter_pages(tetml_file, document=None):
+    """
+    Streams a tetml file with iterparse, stripping the TET namespace as it goes, and yields Page elements one at a time.
+
+    Args:
+        tetml_file (string): path to tetml file
+        document (list): optional list, the namespace-free Document element is appended to it as soon as it is opened
+
+    Yields:
+        page (_Element): fully parsed Page element without namespace
+    """
+    context = etree.iterparse(tetml_file, events=("start", "end"), remove_blank_text=True, huge_tree=True)
+
+    for event, elem in context:
+        if event == "start":
+            # the Document element is needed by callers before any of its pages are complete
+            if document is not None and localname(elem.tag) == "Document":
+                elem.tag = "Document"
+                document.append(elem)
+            continue
+
+        if not isinstance(elem.tag, str): # comments and processing instructions
+            continue
+
+        elem.tag = localname(elem.tag)
+
+        if elem.tag == "Page":
+            yield elem
+
+    del context
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## On-disk cache of parsed TETML files.
+## Entries are keyed by the sha1 of the TETML file's content and the parser version. An
+## entry is a pickle of the page numbers and of each namespace-free Page element
+## serialised on its own, next to the Document element without its pages. Loading an
+## entry reads the pickle only; a page is parsed the first time it is accessed, so
+## heuristics that look at a few pages of an issue never parse the others.
+## The least recently used entries are evicted when the cache grows beyond its size cap.
+##     cache = TetmlCache()                 # $HORIZONTE_TETML_CACHE or ~/.cache/horizonte_tetml
+##     key = cache.key(tetml_file)          # or cache.key(tetml_file, digest) with a known content_hash
+##     pages = cache.load(key)              # CachedPages, or None on a miss
+##     cache.store(key, document, pages)
+###############################################################################
+
+from collections.abc import Mapping, Sequence
+from lxml import etree
+import hashlib
+import os
+import pickle
+import tempfile
+
+# increase whenever the parsed structure or the entry format changes, so that old entries are no longer used
+PARSER_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.environ.get("HORIZONTE_TETML_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "horizonte_tetml"))
+DEFAULT_MAX_BYTES = 4 * 1024**3
+
+SUFFIX = ".pickle"
+
+PARSER = etree.XMLParser(huge_tree=True)
+
+###############################################################################
+
+def content_hash(path, chunk_size=1024**2):
+    """
+    Returns the sha1 hex digest of the content of the file at path, read in chunks.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def page_number(page):
+    """
+    Returns the number attribute of a Page element as int, or None if it has none.
+    """
+    try:
+        return int(page.attrib["number"])
+    except KeyError:
+        return None
+
+def _without_pages(elem):
+    """
+    Returns a copy of elem without its Page elements, comments and processing instructions.
+    """
+    copy = etree.Element(elem.tag, elem.attrib)
+    copy.text, copy.tail = elem.text, elem.tail
+    for child in elem:
+        if isinstance(child.tag, str) and child.tag != "Page":
+            copy.append(_without_pages(child))
+    return copy
+
+class CachedPages(Sequence):
+    """
+    Page elements of a cache entry in page order, each parsed on first access.
+    Pages are not attached to the Document element of the entry.
+
+    Args:
+        document (bytes): serialised Document element without its pages
+        numbers (list): page number of each page, None for pages without one
+        pages (list): serialised Page elements
+    """
+
+    def __init__(self, document, numbers, pages):
+        self._document = document
+        self.numbers = numbers
+        self._serialised = pages
+        self._parsed = [None] * len(pages)
+
+    @property
+    def document(self):
+        """
+        The Document element without its pages.
+        """
+        return etree.fromstring(self._document, PARSER)
+
+    def __len__(self):
+        return len(self._parsed)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        page = self._parsed[i]
+        if page is None:
+            page = self._parsed[i] = etree.fromstring(self._serialised[i], PARSER)
+            self._serialised[i] = None
+        return page
+
+class PageIndex(Mapping):
+    """
+    Maps page numbers to the Page elements of CachedPages without parsing them. Later pages win for duplicate numbers, as in a dict.
+    """
+
+    def __init__(self, pages):
+        self._pages = pages
+        self._positions = {num: i for i, num in enumerate(pages.numbers) if num is not None}
+
+    def __getitem__(self, num):
+        return self._pages[self._positions[num]]
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+class TetmlCache(object):
+    """
+    Cache of parsed TETML pages in cache_dir, holding at most max_bytes.
+
+    Args:
+        cache_dir (string): cache directory, created if necessary
+        max_bytes (int): size cap of the cache directory
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, tetml_file, digest=None):
+        """
+        Returns the cache key of a TETML file. The file is only hashed if its content_hash is not given as digest.
+        """
+        if digest is None:
+            digest = content_hash(tetml_file)
+        return "{}_v{}".format(digest, PARSER_VERSION)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + SUFFIX)
+
+    def load(self, key):
+        """
+        Returns the CachedPages for key, or None if there is no entry.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                document, numbers, pages = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError): # missing or incomplete entry
+            return None
+
+        # mark entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return CachedPages(document, numbers, pages)
+
+    def store(self, key, document, pages):
+        """
+        Stores the Page elements of a Document element under key and evicts the least recently used entries if the cache is too large.
+        The entry is written to a temporary file first, so that concurrent readers never see an incomplete entry.
+        """
+        entry = (etree.tostring(_without_pages(document), encoding="utf-8", with_tail=False),
+                 [page_number(page) for page in pages],
+                 [etree.tostring(page, encoding="utf-8", with_tail=False) for page in pages])
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache holds at most max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError: # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+###############################################################################
+## In-process replacement for
+##     tree.write(outfile); xmllint --format outfile --output tmp --encode utf-8; mv tmp outfile
+## Blank text is removed as xmllint's parser does (libxml2 keepBlanks=0) and the tree is
+## pretty-printed by libxml2 while it is serialised, so the output is byte-identical to the
+## xmllint formatted file. The file is written to a temporary file next to the output file
+## and renamed into place, so that readers never see an incomplete file:
+##     write_xml(tree, outfile)
+##     format_file(path)            # xmllint --format path in place
+## Large documents can be written one top-level element at a time, with the same formatting:
+##     with XmlStreamWriter(outfile, "document", {"document_id": doc_id}) as writer:
+##         writer.write(article)
+###############################################################################
+
+from lxml import etree
+import contextlib
+import os
+import re
+import tempfile
+
+DECLARATION = b'<?xml version="1.0" encoding="utf-8"?>\n'
+
+# carriage returns are serialised as character references, which the parser doesn't treat as blank
+BLANK_CHARS = " \t\n"
+
+###############################################################################
+
+def _is_blank(text):
+    return text is not None and not text.strip(BLANK_CHARS)
+
+def _keeps_blanks(text):
+    """
+    Returns True if libxml2 keeps the following blank text of an element after reading text, i.e. if a chunk of text starts with a blank or is not plain ASCII.
+    The parser reads text in chunks split at character references, which the serialiser writes for &, < and >.
+    """
+    if any(ord(char) > 0x7F or char == "\r" for char in text):
+        return True
+    chunks = re.split("[&<>]", text)
+    return any(chunk[:1] in BLANK_CHARS and chunk for chunk in chunks) or len(chunks) > 1 and not chunks[-1]
+
+def strip_blank_text(elem):
+    """
+    Removes whitespace-only text in place, as libxml2's parser without keepBlanks does (the parser of xmllint --format, up to libxml2 2.13):
+    blank text is removed between elements, unless it is the only content of its element, the element starts with non-blank text
+    or non-blank text of the element read before switches the parser to keeping blanks.
+    """
+    for e in elem.iter():
+        # empty text is serialised as a text node, e.g. <a></a> instead of <a/>
+        if e.tail == "":
+            e.tail = None
+        # comments and processing instructions have no text children
+        if not isinstance(e.tag, str):
+            continue
+        if e.text == "" or len(e) and _is_blank(e.text):
+            e.text = None
+        if len(e) == 0:
+            continue
+        mixed = bool(e.text) # first child is text
+        keep = bool(e.text) and _keeps_blanks(e.text)
+        for child in e:
+            if not child.tail:
+                continue
+            if _is_blank(child.tail):
+                if mixed or keep:
+                    keep = True
+                else:
+                    child.tail = None
+            elif not keep:
+                keep = _keeps_blanks(child.tail)
+
+def format_element(elem, level=0):
+    """
+    Sets the whitespace of elem in place as libxml2's pretty printer would for an element at depth level:
+    every child on a line of its own, indented by two spaces per level, unless the element contains text,
+    in which case neither it nor anything below it is formatted. Blank text must have been removed before.
+    """
+    if len(elem) == 0 or elem.text or any(child.tail for child in elem):
+        return
+    indent = "\n" + "  " * (level+1)
+    elem.text = indent
+    for child in elem:
+        child.tail = indent
+        if isinstance(child.tag, str):
+            format_element(child, level+1)
+    child.tail = "\n" + "  " * level
+
+@contextlib.contextmanager
+def atomic_open(outfile):
+    """
+    Opens a temporary binary file next to outfile, which replaces outfile when the block is left without error and is removed otherwise.
+    """
+    outdir = os.path.dirname(os.path.abspath(outfile))
+    fd, tmp_path = tempfile.mkstemp(dir=outdir, prefix=os.path.basename(outfile), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        # mkstemp creates the file readable by its owner only
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, outfile)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_xml(tree, outfile):
+    """
+    Writes a tree pretty-printed with a utf-8 declaration, as xmllint --format --encode utf-8 does, and atomically replaces outfile.
+    Blank text of the tree is removed in place.
+
+    Args:
+        tree (_ElementTree): tree to write, or its root element
+        outfile (string): path to output file
+    """
+    if not isinstance(tree, etree._ElementTree):
+        tree = etree.ElementTree(tree)
+
+    strip_blank_text(tree.getroot())
+
+    with atomic_open(outfile) as f:
+        f.write(DECLARATION)
+        tree.write(f, pretty_print=True, encoding="utf-8", xml_declaration=False)
+
+def format_file(path):
+    """
+    Pretty-prints an xml file in place, as xmllint --format path --output path --encode utf-8 does.
+    """
+    tree = etree.parse(path, etree.XMLParser(huge_tree=True))
+    write_xml(tree, path)
+
+class XmlStreamWriter(object):
+    """
+    Writes a document one top-level element at a time with etree.xmlfile, formatted as write_xml formats the whole document.
+    The document is written to a temporary file, which replaces outfile when the writer is closed without error.
+
+    Args:
+        outfile (string): path to output file
+        tag (string): tag of the root element
+        attrib (dict): attributes of the root element
+    """
+
+    def __init__(self, outfile, tag, attrib=None):
+        self.outfile = outfile
+        self.tag = tag
+        self.attrib = dict(attrib or {})
+        self.count = 0
+        self._root = None
+
+    def __enter__(self):
+        self._stack = contextlib.ExitStack()
+        try:
+            self._file = self._stack.enter_context(atomic_open(self.outfile))
+            self._file.write(DECLARATION)
+            self._xf = self._stack.enter_context(etree.xmlfile(self._file, encoding="utf-8"))
+        except BaseException:
+            self._stack.close()
+            raise
+        return self
+
+    def write(self, elem):
+        """
+        Writes a child of the root element. Blank text of elem is removed in place.
+        """
+        if self._root is None:
+            self._root = self._xf.element(self.tag, self.attrib)
+            self._root.__enter__()
+            self._xf.write("\n")
+        strip_blank_text(elem)
+        format_element(elem, 1)
+        self._xf.write("  ")
+        self._xf.write(elem)
+        self._xf.write("\n")
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            if self._root is None:
+                # empty root element
+                self._xf.write(etree.Element(self.tag, self.attrib))
+            else:
+                self._root.__exit__(None, None, None)
+            self._xf.flush()
+            self._file.write(b"\n")
+        return self._stack.__exit__(exc_type, exc_value, tb)